@@ -0,0 +1,80 @@
+"""
+Benchmark: Chunker vs the previous per-character buffering loop, on long replies.
+
+Reports CPU time per reply and how many message_chunk frames each flush policy yields.
+
+    uv run python benchmarks/bench_chunker.py [--chars 1000 8000 32000] [--repeat 20]
+"""
+
+import argparse
+import re
+import timeit
+
+from bmo_brain.chunker import Chunker, FlushPolicy
+
+CHUNK_BOUNDARIES = frozenset(".,;:!?\n")
+SAMPLE = (
+    "Bueno, déjame pensar en eso un momento. Hay varias formas de verlo, y cada una "
+    "tiene sus ventajas; por ejemplo, podríamos empezar por lo más simple: dibujar un "
+    "plan, revisar los pasos y luego decidir juntos. ¿Te parece bien? "
+)
+POLICIES = {
+    "default": FlushPolicy(),
+    "min_chars=40": FlushPolicy(min_chars=40),
+    "sentence_only": FlushPolicy(sentence_only=True),
+}
+
+
+def make_tokens(chars: int) -> list[str]:
+    text = (SAMPLE * (chars // len(SAMPLE) + 1))[:chars]
+    return re.findall(r"\s*\S{1,4}", text)
+
+
+def run_legacy(tokens: list[str]) -> list[str]:
+    """The loop run_on_input used before the Chunker."""
+    chunks = []
+    buffer = ""
+    full_reply = ""
+    for part in tokens:
+        full_reply += part
+        for char in part:
+            buffer += char
+            if char in CHUNK_BOUNDARIES and buffer:
+                chunks.append(buffer)
+                buffer = ""
+    if buffer:
+        chunks.append(buffer)
+    return chunks
+
+
+def run_chunker(tokens: list[str], policy: FlushPolicy) -> list[str]:
+    chunker = Chunker(policy)
+    chunks = []
+    for part in tokens:
+        chunks.extend(chunker.feed(part))
+    rest = chunker.flush()
+    if rest:
+        chunks.append(rest)
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chars", type=int, nargs="+", default=[1000, 8000, 32000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'chars':>7} {'variant':>14} {'ms':>9} {'frames':>7} {'avg chars':>10}")
+    for chars in args.chars:
+        tokens = make_tokens(chars)
+        variants = [("legacy", lambda: run_legacy(tokens))]
+        variants += [(name, lambda p=policy: run_chunker(tokens, p)) for name, policy in POLICIES.items()]
+        for name, fn in variants:
+            chunks = fn()
+            assert "".join(chunks) == "".join(tokens)
+            best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+            print(f"{chars:>7} {name:>14} {best * 1000:>9.3f} {len(chunks):>7} {chars / len(chunks):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
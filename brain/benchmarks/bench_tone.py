@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: incremental ToneTracker vs the previous substring-scan classifier.
+
+Simulates the runner's streaming loop: the legacy path re-classifies the whole growing
+reply at every chunk boundary; the tracker is fed only each new token.
+
+    uv run python benchmarks/bench_tone.py [--chars 4000] [--repeat 20]
+"""
+
+import argparse
+import re
+import timeit
+
+from bmo_brain.tone import ToneTracker
+
+CHUNK_BOUNDARIES = frozenset(".,;:!?\n")
+SAMPLE = (
+    "Bueno, déjame pensar en eso un momento. Hay varias formas de verlo, y cada una "
+    "tiene sus ventajas; por ejemplo, podríamos empezar por lo más simple: dibujar un "
+    "plan, revisar los pasos y luego decidir juntos. ¿Te parece bien? "
+)
+
+
+def legacy_infer(reply_text: str) -> str:
+    """The classifier nodes.infer_response_tone_expression used before the tone engine."""
+    lower = reply_text.lower().strip()
+    if not lower:
+        return "neutral"
+    if any(w in lower for w in ("jaja", "jajaja", "😂", "🤣", "genial", "me encanta", "feliz")):
+        return "happy"
+    if any(w in lower for w in ("lo siento", "perdón", "lament", "triste")):
+        return "sad"
+    if any(w in lower for w in ("ojo", "cuidado", "error", "no deberías", "no deberia")):
+        return "angry"
+    if any(
+        w in lower
+        for w in ("wow", "sorprendente", "increíble", "increible", "no puede ser", "qué loco", "que loco")
+    ):
+        return "surprised"
+    if "?" in lower:
+        return "thinking"
+    return "neutral"
+
+
+def make_tokens(chars: int) -> list[str]:
+    text = (SAMPLE * (chars // len(SAMPLE) + 1))[:chars]
+    return re.findall(r"\s*\S{1,4}", text)
+
+
+def run_legacy(tokens: list[str]) -> str:
+    full_reply = ""
+    result = "neutral"
+    for part in tokens:
+        full_reply += part
+        if any(c in CHUNK_BOUNDARIES for c in part):
+            result = legacy_infer(full_reply)
+    return result
+
+
+def run_tracker(tokens: list[str]) -> str:
+    tracker = ToneTracker()
+    result = "neutral"
+    for part in tokens:
+        tracker.feed(part)
+        if any(c in CHUNK_BOUNDARIES for c in part):
+            result = tracker.expression()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chars", type=int, nargs="+", default=[250, 1000, 4000, 16000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'chars':>8} {'legacy ms':>11} {'tracker ms':>11} {'speedup':>8}")
+    for chars in args.chars:
+        tokens = make_tokens(chars)
+        assert run_legacy(tokens) == run_tracker(tokens)
+        legacy = min(timeit.repeat(lambda: run_legacy(tokens), number=1, repeat=args.repeat))
+        tracker = min(timeit.repeat(lambda: run_tracker(tokens), number=1, repeat=args.repeat))
+        print(f"{chars:>8} {legacy * 1000:>11.3f} {tracker * 1000:>11.3f} {legacy / tracker:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
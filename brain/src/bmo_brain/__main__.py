@@ -1,4 +1,13 @@
 """Run the BMO brain WebSocket server (default: 0.0.0.0:8765)."""
+import sys
+
+from bmo_brain import startup
+
+# Before anything heavy is imported, so every import is timed
+if "--startup-profile" in sys.argv:
+    startup.enable()
+
+import argparse
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -6,8 +15,27 @@ from dotenv import load_dotenv
 # Load brain/.env so OPENAI_API_KEY and OPENAI_MODEL are set before any config use
 _load_env = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(_load_env)
+startup.mark("env loaded")
 
+from bmo_brain.config import WORKERS
 from bmo_brain.server import run
 
+startup.mark("server imported")
+
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(prog="bmo_brain", description="BMO brain WebSocket server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="server processes sharing the port (SO_REUSEPORT) and a local broadcast bus",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="log import timings and startup milestones once the server is warm",
+    )
+    args = parser.parse_args()
+    run(host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,187 @@
+"""
+Admission control for turns: rate limits and an estimated-token budget.
+
+Before a turn runs it must be admitted by three token buckets:
+- the face's own bucket (BMO_RATE_PER_FACE turns/s, burst BMO_RATE_PER_FACE_BURST)
+- the process-wide bucket (BMO_RATE_GLOBAL turns/s, burst BMO_RATE_GLOBAL_BURST)
+- the token budget (BMO_TOKENS_PER_MINUTE estimated model tokens, refilled continuously;
+  the estimate counts the conversation history sent with the prompt, and a turn costs at
+  most the whole budget)
+
+A turn that would be admitted within BMO_ADMISSION_MAX_WAIT_MS waits for it (cancelling
+the turn, e.g. when a newer input supersedes it, gives up the wait); one that would wait
+longer is rejected right away, so the face gets a busy answer instead of a late reply.
+Nothing is taken from any bucket until all of them have room.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import monotonic
+from typing import Callable
+
+from bmo_brain.config import (
+    ADMISSION_MAX_WAIT_MS,
+    EXPECTED_REPLY_TOKENS,
+    RATE_GLOBAL,
+    RATE_GLOBAL_BURST,
+    RATE_PER_FACE,
+    RATE_PER_FACE_BURST,
+    TOKENS_PER_MINUTE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Holds up to `burst` tokens, refilled at `rate` per second. A rate of 0 means unlimited."""
+
+    def __init__(self, rate: float, burst: float, *, clock: Callable[[], float] = monotonic) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0) if rate > 0 else 0.0
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self._tokens
+
+    def available(self) -> float:
+        """Tokens in the bucket now."""
+        return self._refill()
+
+    def wait_time(self, n: float = 1.0) -> float:
+        """Seconds until n tokens are available (0 if they are now; inf if n exceeds the burst)."""
+        if self.unlimited:
+            return 0.0
+        if n > self.burst:
+            return float("inf")
+        missing = n - self._refill()
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, n: float = 1.0) -> None:
+        """Remove n tokens (call after wait_time(n) returned 0)."""
+        if not self.unlimited:
+            self._refill()
+            self._tokens -= n
+
+
+class Rejected(Exception):
+    """The turn was not admitted. reason: face_rate | global_rate | token_budget."""
+
+    def __init__(self, reason: str, retry_after_s: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+def estimate_turn_tokens(user_text: str, history_tokens: int = 0) -> int:
+    """
+    Model tokens a turn is expected to use: the conversation history sent with the prompt,
+    the input (~4 chars per token) and a typical reply.
+    """
+    return history_tokens + (len(user_text) + 3) // 4 + EXPECTED_REPLY_TOKENS
+
+
+class AdmissionController:
+    """Global buckets, per-face bucket factory and admission counters."""
+
+    def __init__(
+        self,
+        *,
+        rate_per_face: float = RATE_PER_FACE,
+        burst_per_face: float = RATE_PER_FACE_BURST,
+        rate_global: float = RATE_GLOBAL,
+        burst_global: float = RATE_GLOBAL_BURST,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+        max_wait_ms: float = ADMISSION_MAX_WAIT_MS,
+    ) -> None:
+        self.rate_per_face = rate_per_face
+        self.burst_per_face = burst_per_face
+        self.global_bucket = TokenBucket(rate_global, burst_global)
+        self.token_budget = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_wait = max_wait_ms / 1000.0
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.waiting = 0
+        self.rejected: dict[str, int] = {}
+        self.wait_total = 0.0
+
+    def face_bucket(self) -> TokenBucket:
+        """A new bucket for one face connection."""
+        return TokenBucket(self.rate_per_face, self.burst_per_face)
+
+    def _blocking(self, face: TokenBucket | None, tokens: int) -> tuple[str, float] | None:
+        """The bucket that is short (reason, seconds to wait) with the longest wait, or None."""
+        waits = [
+            ("global_rate", self.global_bucket.wait_time()),
+            ("token_budget", self.token_budget.wait_time(tokens)),
+        ]
+        if face is not None:
+            waits.append(("face_rate", face.wait_time()))
+        reason, wait = max(waits, key=lambda item: item[1])
+        return (reason, wait) if wait > 0 else None
+
+    async def admit(self, user_text: str, face: TokenBucket | None = None, *, history_tokens: int = 0) -> None:
+        """Wait until the turn fits every bucket and take from them, or raise Rejected."""
+        tokens = estimate_turn_tokens(user_text, history_tokens)
+        if not self.token_budget.unlimited:
+            # A turn bigger than the whole budget waits for a full bucket instead of never fitting
+            tokens = min(tokens, self.token_budget.burst)
+        start = monotonic()
+        deadline = start + self.max_wait
+        waited = False
+        self.waiting += 1
+        try:
+            while True:
+                blocking = self._blocking(face, tokens)
+                if blocking is None:
+                    break
+                reason, wait = blocking
+                if monotonic() + wait > deadline:
+                    self.rejected[reason] = self.rejected.get(reason, 0) + 1
+                    logger.info("Turn not admitted (%s); retry in %.1fs", reason, wait)
+                    raise Rejected(reason, wait)
+                waited = True
+                await asyncio.sleep(wait)
+        finally:
+            self.waiting -= 1
+        self.global_bucket.take()
+        self.token_budget.take(tokens)
+        if face is not None:
+            face.take()
+        self.admitted += 1
+        if waited:
+            self.admitted_after_wait += 1
+            self.wait_total += monotonic() - start
+
+    def stats(self) -> dict:
+        """Admission counters (exported as bmo_admission_* gauges)."""
+        return {
+            "admitted": self.admitted,
+            "admitted_after_wait": self.admitted_after_wait,
+            "waiting": self.waiting,
+            "rejected": sum(self.rejected.values()),
+            **{f"rejected_{reason}": n for reason, n in sorted(self.rejected.items())},
+            "wait_avg_ms": (self.wait_total / self.admitted_after_wait * 1000) if self.admitted_after_wait else 0.0,
+            "token_budget_available": None if self.token_budget.unlimited else self.token_budget.available(),
+        }
+
+
+_controller: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    """Return the process-wide admission controller."""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
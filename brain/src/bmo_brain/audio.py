@@ -0,0 +1,347 @@
+"""
+Audio input: PCM frames from the face -> energy VAD -> speech-to-text -> turn.
+
+With BMO_AUDIO_INGEST=1 a face may stream microphone audio as binary WebSocket frames on
+its normal connection: 16-bit little-endian mono PCM at BMO_AUDIO_SAMPLE_RATE, each
+message one or more whole frames of BMO_AUDIO_FRAME_MS. Per session:
+
+- the receive loop copies frames into a fixed PcmRing (the only copy); the consumer
+  reads them back as memoryviews of the ring, so VAD and speech-to-text never copy audio
+- an energy VAD marks speech once BMO_VAD_MIN_SPEECH_MS of frames are above
+  BMO_VAD_THRESHOLD_DB (state "listening", and barge-in on a running turn) and its end
+  after BMO_VAD_HANGOVER_MS of quiet frames. Speech longer than BMO_AUDIO_MAX_SEGMENT_MS
+  is cut there
+- the segment (with BMO_VAD_PREROLL_MS of audio before the speech start) goes to the
+  transcriber in the inbound thread pool and the text is submitted to the session
+  directly, so the turn starts as soon as speech ends, without a round trip to the face
+- the ring keeps the segment being transcribed. When the consumer lags and the ring is
+  full, the receive loop waits up to BMO_AUDIO_BACKPRESSURE_MS for room (the socket stops
+  reading, so TCP pushes back on the face), then drops the incoming frames
+
+The transcriber is picked by BMO_STT: "stub" (a local stand-in that reports how much
+speech it heard) or "module:function", a callable taking (segments, sample_rate) where
+segments is a list of memoryviews of PCM, returning the text. set_transcriber() installs
+one programmatically.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import math
+import operator
+import sys
+from array import array
+from time import monotonic
+from typing import Any, Callable
+
+from bmo_brain import inbound
+from bmo_brain.broadcaster import reply_route
+from bmo_brain.config import (
+    AUDIO_BACKPRESSURE_MS,
+    AUDIO_FRAME_MS,
+    AUDIO_MAX_SEGMENT_MS,
+    AUDIO_SAMPLE_RATE,
+    STT_BACKEND,
+    SUPERSEDE_TURNS,
+    VAD_HANGOVER_MS,
+    VAD_MIN_SPEECH_MS,
+    VAD_PREROLL_MS,
+    VAD_THRESHOLD_DB,
+)
+from bmo_brain.metrics import AUDIO_SEGMENTS, STT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Bytes per 16-bit sample
+SAMPLE_BYTES = 2
+# Audio the ring holds beyond the longest segment and its pre-roll, for consumer lag (ms)
+_RING_SLACK_MS = 2_000
+
+Transcriber = Callable[[list[memoryview], int], str]
+
+_sumprod = getattr(math, "sumprod", None)
+
+
+def frame_db(frame: memoryview) -> float:
+    """Level of a PCM16LE frame in dBFS (-inf for digital silence)."""
+    if sys.byteorder == "little":
+        samples: Any = frame.cast("h")
+    else:
+        samples = array("h", frame)
+        samples.byteswap()
+    n = len(samples)
+    if not n:
+        return -math.inf
+    energy = _sumprod(samples, samples) if _sumprod else sum(map(operator.mul, samples, samples))
+    if not energy:
+        return -math.inf
+    return 10 * math.log10(energy / n / (32768.0 * 32768.0))
+
+
+class PcmRing:
+    """
+    Fixed ring of PCM bytes addressed by absolute stream position. The consumer releases
+    what it no longer needs; write() only overwrites released bytes.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._view = memoryview(bytearray(capacity))
+        self.written = 0
+        self.kept_from = 0
+
+    @property
+    def free(self) -> int:
+        return self.capacity - (self.written - self.kept_from)
+
+    def write(self, data: bytes) -> None:
+        """Append data (call with len(data) <= free)."""
+        n = len(data)
+        at = self.written % self.capacity
+        head = min(n, self.capacity - at)
+        self._view[at : at + head] = data[:head]
+        if head < n:
+            self._view[: n - head] = data[head:]
+        self.written += n
+
+    def views(self, start: int, end: int) -> list[memoryview]:
+        """Zero-copy views of [start, end): one, or two when the range wraps."""
+        a, b = start % self.capacity, end % self.capacity
+        if end - start <= 0:
+            return []
+        if a < b:
+            return [self._view[a:b]]
+        return [self._view[a:], self._view[:b]] if b else [self._view[a:]]
+
+    def release(self, position: int) -> None:
+        """Let bytes before position be overwritten."""
+        if position > self.kept_from:
+            self.kept_from = min(position, self.written)
+
+
+def _stub_transcriber(segments: list[memoryview], sample_rate: int) -> str:
+    seconds = sum(len(s) for s in segments) / SAMPLE_BYTES / sample_rate
+    return f"(heard {seconds:.1f} seconds of speech)"
+
+
+def _load_transcriber(spec: str) -> Transcriber:
+    if spec == "stub":
+        return _stub_transcriber
+    module, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"BMO_STT must be 'stub' or 'module:function', got {spec!r}")
+    return getattr(importlib.import_module(module), attr)
+
+
+_transcriber: Transcriber | None = None
+
+
+def get_transcriber() -> Transcriber:
+    """The BMO_STT transcriber (loaded on first use) or the one set with set_transcriber()."""
+    global _transcriber
+    if _transcriber is None:
+        _transcriber = _load_transcriber(STT_BACKEND)
+    return _transcriber
+
+
+def set_transcriber(transcriber: Transcriber) -> None:
+    """Transcribe speech segments with transcriber (a blocking callable, run off the loop)."""
+    global _transcriber
+    _transcriber = transcriber
+
+
+class AudioIngest:
+    """One session's ring, VAD and transcription loop."""
+
+    def __init__(self, session: Any, *, sample_rate: int = AUDIO_SAMPLE_RATE, frame_ms: int = AUDIO_FRAME_MS) -> None:
+        self.session = session
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * frame_ms // 1000 * SAMPLE_BYTES
+
+        def frames(ms: float) -> int:
+            return max(1, math.ceil(ms / frame_ms))
+
+        self._min_speech = frames(VAD_MIN_SPEECH_MS)
+        self._hangover = frames(VAD_HANGOVER_MS)
+        self._max_segment = frames(AUDIO_MAX_SEGMENT_MS)
+        self._preroll_bytes = frames(VAD_PREROLL_MS) * self.frame_bytes
+        ring_frames = self._max_segment + frames(VAD_PREROLL_MS) + frames(_RING_SLACK_MS)
+        # Whole frames only, so a frame never wraps around the end of the ring
+        self.ring = PcmRing(ring_frames * self.frame_bytes)
+        self._consumed = 0
+        self._loud_run = 0
+        self._quiet_run = 0
+        self._speech_start: int | None = None
+        self._speech_end = 0
+        self._data = asyncio.Event()
+        self._space = asyncio.Event()
+        self.frames_in = 0
+        self.frames_dropped = 0
+        self.backpressure_waits = 0
+        self.backpressure_s = 0.0
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def in_speech(self) -> bool:
+        return self._speech_start is not None
+
+    @property
+    def lag_bytes(self) -> int:
+        return self.ring.written - self._consumed
+
+    async def feed(self, data: bytes) -> bool:
+        """Queue PCM from the face; waits (bounded) for ring space. Return False if dropped."""
+        n = len(data)
+        if n % self.frame_bytes or n > self.ring.capacity:
+            raise inbound.InvalidFrame(f"audio frame must be whole {self.frame_bytes}-byte PCM frames, got {n} bytes")
+        if self.ring.free < n:
+            self.backpressure_waits += 1
+            start = monotonic()
+            deadline = start + AUDIO_BACKPRESSURE_MS / 1000.0
+            while self.ring.free < n and (left := deadline - monotonic()) > 0:
+                self._space.clear()
+                try:
+                    await asyncio.wait_for(self._space.wait(), left)
+                except asyncio.TimeoutError:
+                    break
+            self.backpressure_s += monotonic() - start
+            if self.ring.free < n:
+                self.frames_dropped += n // self.frame_bytes
+                return False
+        self.ring.write(data)
+        self.frames_in += n // self.frame_bytes
+        self._data.set()
+        return True
+
+    def _release(self) -> None:
+        """Keep the current speech (or the pre-roll before the next one) and free the rest."""
+        if self._speech_start is not None:
+            self.ring.release(self._speech_start)
+        else:
+            # The loud frames not yet counted as speech, and the pre-roll before them
+            self.ring.release(self._consumed - self._loud_run * self.frame_bytes - self._preroll_bytes)
+        self._space.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._data.wait()
+            self._data.clear()
+            while self.ring.written - self._consumed >= self.frame_bytes:
+                end = self._consumed + self.frame_bytes
+                (frame,) = self.ring.views(self._consumed, end)
+                loud = frame_db(frame) >= VAD_THRESHOLD_DB
+                self._consumed = end
+                try:
+                    await self._step(loud, end)
+                except Exception:
+                    # One failed frame must not stop the consumer (the ring would then fill up)
+                    logger.exception("Audio ingest step failed for session %s", self.session.id[:8])
+                self._release()
+
+    async def _step(self, loud: bool, position: int) -> None:
+        """Advance the VAD by one frame ending at position."""
+        if self._speech_start is None:
+            self._loud_run = self._loud_run + 1 if loud else 0
+            if self._loud_run >= self._min_speech:
+                first = position - self._loud_run * self.frame_bytes
+                self._speech_start = max(first - self._preroll_bytes, self.ring.kept_from)
+                self._speech_end = position
+                self._quiet_run = 0
+                await self._speech_started()
+            return
+        if loud:
+            self._quiet_run = 0
+            self._speech_end = position
+        else:
+            self._quiet_run += 1
+        frames = (position - self._speech_start) // self.frame_bytes
+        if self._quiet_run >= self._hangover or frames >= self._max_segment:
+            start, end = self._speech_start, self._speech_end if self._quiet_run else position
+            try:
+                await self._speech_ended(start, end)
+            finally:
+                self._speech_start = None
+                self._loud_run = 0
+
+    async def _speech_started(self) -> None:
+        from bmo_brain.face_adapter import send_state
+
+        logger.debug("Session %s: speech started", self.session.id[:8])
+        # The face stops talking when the user does; a turn is superseded anyway once the speech ends
+        if SUPERSEDE_TURNS:
+            self.session.interrupt()
+        reply_route.set(self.session.route)
+        await send_state("listening")
+
+    async def _speech_ended(self, start: int, end: int) -> None:
+        """Transcribe [start, end) from the ring and start a turn with the text."""
+        from bmo_brain.face_adapter import send_state
+
+        segments = self.ring.views(start, end)
+        t0 = monotonic()
+        try:
+            text = (await inbound.offload(get_transcriber(), segments, self.sample_rate) or "").strip()
+        except Exception:
+            logger.exception("Speech-to-text failed for session %s", self.session.id[:8])
+            AUDIO_SEGMENTS.labels("failed").inc()
+            text = ""
+        else:
+            STT_SECONDS.observe(monotonic() - t0)
+            AUDIO_SEGMENTS.labels("transcribed" if text else "empty").inc()
+        logger.info(
+            "Session %s: %d ms of speech -> %r",
+            self.session.id[:8],
+            (end - start) * 1000 // (SAMPLE_BYTES * self.sample_rate),
+            inbound.preview(text),
+        )
+        if text:
+            self.session.submit(text)
+        else:
+            reply_route.set(self.session.route)
+            await send_state("idle")
+
+    def stats(self) -> dict:
+        return {
+            "frames_in": self.frames_in,
+            "frames_dropped": self.frames_dropped,
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_s": self.backpressure_s,
+            "lag_bytes": self.lag_bytes,
+            "in_speech": self.in_speech,
+        }
+
+    def close(self) -> None:
+        """Stop the consumer (session closed) and keep the counters in the process totals."""
+        self._task.cancel()
+        if self in _ingests:
+            _ingests.discard(self)
+            for key in _closed_totals:
+                _closed_totals[key] += self.stats()[key]
+
+
+# Counters of closed sessions' ingests, added to audio_stats() totals
+_closed_totals = {"frames_in": 0, "frames_dropped": 0, "backpressure_waits": 0, "backpressure_s": 0.0}
+_ingests: set[AudioIngest] = set()
+
+
+async def ingest_frame(data: bytes, session: Any, channel: Any) -> None:
+    """Binary frame handler (inbound.set_binary_handler): feed the session's audio ingest."""
+    ingest = session.audio
+    if ingest is None:
+        ingest = session.audio = AudioIngest(session)
+        _ingests.add(ingest)
+    await ingest.feed(data)
+
+
+def audio_stats() -> dict:
+    """Audio ingest totals (exported as bmo_audio_* gauges)."""
+    totals = dict(_closed_totals)
+    for ingest in _ingests:
+        for key in totals:
+            totals[key] += ingest.stats()[key]
+    totals["sessions"] = len(_ingests)
+    totals["in_speech"] = sum(ingest.in_speech for ingest in _ingests)
+    totals["lag_bytes_max"] = max((ingest.lag_bytes for ingest in _ingests), default=0)
+    return totals
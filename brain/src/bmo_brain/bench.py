@@ -0,0 +1,324 @@
+"""
+Load generator: drive the WebSocket server with simulated faces and report latency.
+
+    uv run python -m bmo_brain.bench --faces 500 --rate 0.2 --duration 20 [--output report.json]
+
+By default the server runs in this process on the fake LLM backend (BMO_LLM_BACKEND=fake
+unless set), and the faces run in separate client processes so they do not share its
+event loop. With --url an already running brain is targeted instead (server memory and
+loop lag are then not reported).
+
+Each face sends `input` frames at --rate per second (Poisson arrivals). The fake backend
+echoes the input, so the first message_chunk of a reply starts with the nonce the face
+sent and time-to-first-chunk is measured per face. Every face also counts all frames and
+bytes it receives (only its own replies, unless the server runs with BMO_REPLY_ROUTING=all).
+
+The report is one JSON object on stdout (or --output): p50/p95/p99 time-to-first-chunk,
+frames/s, bytes/s, server memory per connection and event-loop lag.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+DEFAULT_TEXT = "hola BMO, ¿cómo estás hoy? Cuéntame algo bonito sobre las nubes."
+
+
+def _raise_fd_limit() -> None:
+    """Thousands of sockets need more than the usual 1024 descriptors."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentiles(samples: list[float], points: tuple[int, ...] = (50, 95, 99)) -> dict:
+    """Nearest-rank percentiles in ms (None when there are no samples)."""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    out = {}
+    for p in points:
+        rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+        out[f"p{p}"] = round(ordered[rank] * 1000, 3)
+    return out
+
+
+# --- client side (runs in the client processes) ---
+
+
+class _FaceStats:
+    def __init__(self) -> None:
+        self.ttfc: list[float] = []
+        self.inputs_sent = 0
+        self.frames = 0
+        self.bytes = 0
+        self.errors = 0
+
+
+def _chunk_text(msg: str | bytes) -> str | None:
+    """Text of a message_chunk frame (JSON or compact), None for other frames."""
+    if isinstance(msg, bytes):
+        # compact layout: 0x02, u32 stream id, u32 index, UTF-8 text
+        return msg[9:].decode("utf-8", "replace") if msg[:1] == b"\x02" else None
+    if '"message_chunk"' not in msg:
+        return None
+    return json.loads(msg).get("text")
+
+
+async def _face(ws, face_id: int, args: argparse.Namespace, stats: _FaceStats, stop_at: float) -> None:
+    """One simulated face: send inputs at the configured rate, time the first chunk of each reply."""
+    pending: dict[str, float] = {}
+    rng = random.Random(args.seed * 100_003 + face_id)
+
+    async def read() -> None:
+        try:
+            async for msg in ws:
+                stats.frames += 1
+                stats.bytes += len(msg)
+                text = _chunk_text(msg)
+                if text is None:
+                    continue
+                sent_at = pending.pop(text.split(",", 1)[0].strip(), None)
+                if sent_at is not None:
+                    stats.ttfc.append(time.perf_counter() - sent_at)
+        except Exception:
+            stats.errors += 1
+
+    reader = asyncio.create_task(read())
+    n = 0
+    try:
+        while True:
+            delay = rng.expovariate(args.rate)
+            if time.perf_counter() + delay >= stop_at:
+                break
+            await asyncio.sleep(delay)
+            n += 1
+            nonce = f"f{face_id}q{n}"
+            pending[nonce] = time.perf_counter()
+            await ws.send(json.dumps({"type": "input", "text": f"{nonce}, {args.text}"}))
+            stats.inputs_sent += 1
+        await asyncio.sleep(args.drain)
+    except Exception:
+        stats.errors += 1
+    finally:
+        reader.cancel()
+
+
+async def _run_clients(url: str, face_ids: list[int], args: argparse.Namespace, events) -> dict:
+    from websockets.asyncio.client import connect
+
+    stats = _FaceStats()
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    async def open_one():
+        async with gate:
+            try:
+                ws = await connect(url, max_size=None, open_timeout=30)
+            except Exception:
+                stats.errors += 1
+                return None
+            if args.encoding != "json":
+                await ws.send(json.dumps({"type": "hello", "encoding": args.encoding, "batch": False}))
+            return ws
+
+    sockets = [ws for ws in await asyncio.gather(*(open_one() for _ in face_ids)) if ws is not None]
+    events.put(("connected", len(sockets)))
+    await asyncio.to_thread(args.go.wait)
+
+    start = time.perf_counter()
+    stop_at = start + args.duration
+    await asyncio.gather(*(_face(ws, fid, args, stats, stop_at) for ws, fid in zip(sockets, face_ids)))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+    return {
+        "connected": len(sockets),
+        "ttfc": stats.ttfc,
+        "inputs_sent": stats.inputs_sent,
+        "frames": stats.frames,
+        "bytes": stats.bytes,
+        "errors": stats.errors,
+        "elapsed_s": elapsed,
+    }
+
+
+def _client_main(url: str, face_ids: list[int], args: argparse.Namespace, events) -> None:
+    """Entry point of one client process."""
+    _raise_fd_limit()
+    events.put(("done", asyncio.run(_run_clients(url, face_ids, args, events))))
+
+
+# --- driver ---
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a short sleep."""
+
+    def __init__(self, interval_s: float = 0.01) -> None:
+        self.interval = interval_s
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> dict:
+        if self._task is not None:
+            self._task.cancel()
+        summary = percentiles(self.samples)
+        summary["max"] = round(max(self.samples) * 1000, 3) if self.samples else None
+        return summary
+
+
+async def _wait_for_server(url: str, timeout: float = 30.0) -> None:
+    from websockets.asyncio.client import connect
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            ws = await connect(url)
+            await ws.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def _collect(events, procs: int, kind: str) -> list:
+    results = []
+    while len(results) < procs:
+        got_kind, value = await asyncio.to_thread(events.get)
+        if got_kind == kind:
+            results.append(value)
+    return results
+
+
+async def run_bench(args: argparse.Namespace) -> dict:
+    """Start the server (unless --url), run the client processes and build the report."""
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue()
+    args.go = ctx.Event()
+
+    server_task = None
+    url = args.url
+    if url is None:
+        from bmo_brain.server import run_server
+
+        server_task = asyncio.create_task(run_server("127.0.0.1", args.port))
+        url = f"ws://127.0.0.1:{args.port}"
+        await _wait_for_server(url)
+    rss_before = _rss_bytes()
+
+    face_ids = list(range(args.faces))
+    procs = [
+        ctx.Process(target=_client_main, args=(url, face_ids[i :: args.client_procs], args, events))
+        for i in range(args.client_procs)
+    ]
+    for proc in procs:
+        proc.start()
+    connected = sum(await _collect(events, len(procs), "connected"))
+    # Let the server settle (contract_info sent, sessions created) before measuring memory
+    await asyncio.sleep(0.5)
+    rss_connected = _rss_bytes()
+
+    lag = LoopLagMonitor()
+    lag.start()
+    args.go.set()
+    results = await _collect(events, len(procs), "done")
+    lag_summary = lag.stop()
+    for proc in procs:
+        proc.join()
+
+    scheduler_stats = None
+    if server_task is not None:
+        from bmo_brain.scheduler import get_scheduler
+
+        scheduler_stats = get_scheduler().stats()
+        server_task.cancel()
+        await asyncio.gather(server_task, return_exceptions=True)
+
+    ttfc = [t for r in results for t in r["ttfc"]]
+    elapsed = max(r["elapsed_s"] for r in results)
+    frames = sum(r["frames"] for r in results)
+    total_bytes = sum(r["bytes"] for r in results)
+    inputs = sum(r["inputs_sent"] for r in results)
+    local = server_task is not None
+    return {
+        "config": {
+            "faces": args.faces,
+            "rate_per_face": args.rate,
+            "duration_s": args.duration,
+            "encoding": args.encoding,
+            "client_procs": args.client_procs,
+            "url": args.url,
+            "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith("BMO_")},
+        },
+        "connected": connected,
+        "errors": sum(r["errors"] for r in results),
+        "inputs_sent": inputs,
+        "replies_timed": len(ttfc),
+        "ttfc_ms": percentiles(ttfc),
+        "frames_per_s": round(frames / elapsed, 1),
+        "bytes_per_s": round(total_bytes / elapsed, 1),
+        "elapsed_s": round(elapsed, 3),
+        "memory_per_connection_bytes": (
+            round((rss_connected - rss_before) / connected) if local and connected else None
+        ),
+        "loop_lag_ms": lag_summary if local else None,
+        "scheduler": scheduler_stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="bmo_brain.bench", description=__doc__.splitlines()[1])
+    parser.add_argument("--faces", type=int, default=100, help="simulated face connections")
+    parser.add_argument("--rate", type=float, default=0.2, help="inputs per second per face")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for replies after the load")
+    parser.add_argument("--text", default=DEFAULT_TEXT, help="input text (echoed by the fake backend)")
+    parser.add_argument("--encoding", choices=["json", "compact"], default="json")
+    parser.add_argument("--url", help="target a running brain instead of an in-process one")
+    parser.add_argument("--port", type=int, default=8877, help="port of the in-process server")
+    parser.add_argument("--client-procs", type=int, default=1, help="processes running the faces")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # The in-process server reads its config at import time
+    os.environ.setdefault("BMO_LLM_BACKEND", "fake")
+    _raise_fd_limit()
+    report = asyncio.run(run_bench(args))
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Fan-out engine for brain -> face frames.
+
+Each frame is encoded once per wire encoding (see wire.py) and offered to the faces it is
+routed to. Every connection owns a ClientChannel: a bounded outbound queue drained by its
+own writer task, so a slow display only delays itself (never run_on_input or other faces).
+
+Routing: connections are indexed by session id and optional room (set from the face's
+hello). A Route names a session and/or a room; publishing to it reaches the union of both
+groups, publishing with no route reaches every face. The turn running in a task carries
+its Route in `reply_route`, so replies go to the session that asked (and its room). Each
+channel may also subscribe to a subset of frame types.
+
+A face that enabled resume (resume.py) keeps a ReplayRing of the frames queued for it,
+numbered in order. When it disconnects its channel is parked: it stays routable and keeps
+recording, so a reconnecting face can be sent what it missed.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from time import monotonic
+from typing import Iterable, Literal, NamedTuple, get_args
+
+from bmo_brain.config import BROADCAST_QUEUE_SIZE, BROADCAST_SLOW_POLICY
+from bmo_brain.metrics import SEND_SECONDS
+from bmo_brain.wire import BatchFrame, Encoding, Frame
+
+logger = logging.getLogger(__name__)
+
+# What to do when a face's outbound queue is full:
+# - close: disconnect the face (it reconnects and gets a fresh contract_info)
+# - drop_oldest: discard the oldest queued frame to make room
+# - drop_newest: discard the frame being offered
+SlowPolicy = Literal["close", "drop_oldest", "drop_newest"]
+SLOW_POLICIES: tuple[SlowPolicy, ...] = get_args(SlowPolicy)
+
+if BROADCAST_SLOW_POLICY not in SLOW_POLICIES:
+    logger.warning(
+        "Unknown BMO_BROADCAST_SLOW_POLICY %r (expected one of %s); using close",
+        BROADCAST_SLOW_POLICY,
+        ", ".join(SLOW_POLICIES),
+    )
+_slow_policy: SlowPolicy = BROADCAST_SLOW_POLICY if BROADCAST_SLOW_POLICY in SLOW_POLICIES else "close"
+
+# WebSocket close code 1013: "try again later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Frame types only sent to faces that enabled them in their hello ("tts": audio)
+OPT_IN_TYPES = frozenset({"audio"})
+
+
+class Route(NamedTuple):
+    """Where a frame goes: the faces of a session, of a room, or both (None = not that group)."""
+
+    session: str | None = None
+    room: str | None = None
+
+
+# Route of the turn running in this task (None: every face)
+reply_route: ContextVar[Route | None] = ContextVar("bmo_reply_route", default=None)
+
+
+class ReplayRing:
+    """
+    The last `size` frames queued for one face, with sequence numbers from 1. Frames are
+    kept (not their bytes) so a resuming face can get them in the encoding it asks for.
+    """
+
+    __slots__ = ("token", "seq", "_frames")
+
+    def __init__(self, token: str, size: int) -> None:
+        self.token = token
+        self.seq = 0
+        self._frames: deque[tuple[int, Frame]] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def append(self, frame: Frame) -> None:
+        self.seq += 1
+        self._frames.append((self.seq, frame))
+
+    def since(self, seq: int) -> tuple[list[tuple[int, Frame]], bool]:
+        """Frames after seq, and whether that is all of them (False if older ones were evicted)."""
+        if seq > self.seq:
+            return [], False
+        frames = [item for item in self._frames if item[0] > seq]
+        return frames, seq >= self.seq - len(self._frames)
+
+
+class ClientChannel:
+    """Outbound queue + writer task for one face connection."""
+
+    def __init__(self, ws, *, maxsize: int, policy: SlowPolicy) -> None:
+        self.ws = ws
+        self.policy = policy
+        # Negotiated with {"type": "hello", "encoding": ...}; JSON until then
+        self.encoding: Encoding = "json"
+        # Face understands {"type": "batch"} frames (negotiated with hello)
+        self.batch = False
+        # Routing keys and frame types this face wants (None: all types), set by join()
+        self.session: str | None = None
+        self.room: str | None = None
+        self.subscriptions: frozenset[str] | None = None
+        # Opt-in frame types this face enabled in its hello (see OPT_IN_TYPES)
+        self.opted_in: frozenset[str] = frozenset()
+        self.frames_filtered = 0
+        # Frames kept for a reconnect (resume.py), and whether the face is gone meanwhile
+        self.replay: ReplayRing | None = None
+        self.parked = False
+        self.closed = False
+        self._queue: asyncio.Queue[tuple[bytes, bool, float]] = asyncio.Queue(maxsize)
+        # Counters (exported via stats())
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.max_queue_depth = 0
+        self.send_latency_total = 0.0
+        self.send_latency_max = 0.0
+        self._writer = asyncio.create_task(self._drain())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def wants(self, frame: Frame) -> bool:
+        """Whether this face subscribed to the frame's type (and opted in to it, if it must)."""
+        msg_type = frame.payload.get("type")
+        if msg_type in OPT_IN_TYPES and msg_type not in self.opted_in:
+            return False
+        subscriptions = self.subscriptions
+        return subscriptions is None or msg_type in subscriptions
+
+    def offer(self, frame: Frame, *, record: bool = True) -> bool:
+        """
+        Queue one frame (in this face's encoding) without blocking. Return False if not queued.
+        With record, the frame also goes to the replay ring (a parked channel only records).
+        """
+        if self.closed and not self.parked:
+            return False
+        if not self.wants(frame):
+            self.frames_filtered += 1
+            return True
+        if record and self.replay is not None:
+            self.replay.append(frame)
+        if self.parked:
+            return True
+        return self.enqueue(*frame.encoded(self.encoding))
+
+    def enqueue(self, data: bytes, text: bool) -> bool:
+        """Queue encoded bytes as they are (no filtering or recording), applying the slow-face policy."""
+        if self.closed:
+            return False
+        item = (data, text, monotonic())
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.policy == "drop_newest":
+                self.frames_dropped += 1
+                return False
+            if self.policy == "drop_oldest":
+                self._queue.get_nowait()
+                self.frames_dropped += 1
+                self._queue.put_nowait(item)
+            else:
+                logger.warning("Face outbound queue full (%d frames); closing slow consumer", self._queue.maxsize)
+                self.close(SLOW_CONSUMER_CLOSE_CODE, "slow consumer")
+                return False
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return True
+
+    def offer_batch(self, batch: BatchFrame) -> bool:
+        """Queue a batch as one frame, or frame by frame if this face did not opt in."""
+        if self.subscriptions is not None:
+            wanted = [frame for frame in batch.frames if self.wants(frame)]
+            self.frames_filtered += len(batch.frames) - len(wanted)
+            if not wanted:
+                return True
+            if len(wanted) < len(batch.frames):
+                # This face's own batch (re-encoded; inner frames keep their shared bytes)
+                batch = BatchFrame(wanted)
+        if self.batch:
+            return self.offer(batch)
+        accepted = True
+        for frame in batch.frames:
+            accepted = self.offer(frame) and accepted
+        return accepted
+
+    async def _drain(self) -> None:
+        """Writer task: send queued frames in order, recording send latency."""
+        try:
+            while True:
+                data, text, enqueued_at = await self._queue.get()
+                await self.ws.send(data, text=text)
+                latency = monotonic() - enqueued_at
+                self.frames_sent += 1
+                self.bytes_sent += len(data)
+                self.send_latency_total += latency
+                SEND_SECONDS.observe(latency)
+                if latency > self.send_latency_max:
+                    self.send_latency_max = latency
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Send failed for a client: %s", e)
+            self.closed = True
+
+    def close(self, code: int = 1000, reason: str = "") -> None:
+        """Stop the writer and close the WebSocket in the background."""
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        asyncio.create_task(self.ws.close(code, reason))
+
+    def stop(self) -> None:
+        """Stop the writer without touching the socket (used on disconnect)."""
+        self.closed = True
+        self._writer.cancel()
+
+    def park(self) -> None:
+        """The face disconnected but may resume: stop sending, keep routing and recording."""
+        self.stop()
+        self.parked = True
+
+    def stats(self) -> dict:
+        """Per-client queue-depth and send-latency counters."""
+        sent = self.frames_sent
+        return {
+            "remote": str(getattr(self.ws, "remote_address", "?")),
+            "encoding": self.encoding,
+            "batch": self.batch,
+            "session": self.session,
+            "room": self.room,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "frames_sent": sent,
+            "frames_dropped": self.frames_dropped,
+            "frames_filtered": self.frames_filtered,
+            "bytes_sent": self.bytes_sent,
+            "send_latency_avg_ms": (self.send_latency_total / sent * 1000) if sent else 0.0,
+            "send_latency_max_ms": self.send_latency_max * 1000,
+        }
+
+
+# One channel per connected WebSocket, and the routing indexes over them
+_channels: dict[object, ClientChannel] = {}
+_by_session: dict[str, set[ClientChannel]] = {}
+_by_room: dict[str, set[ClientChannel]] = {}
+
+
+def _index_remove(index: dict[str, set[ClientChannel]], key: str | None, channel: ClientChannel) -> None:
+    if key is None:
+        return
+    members = index.get(key)
+    if members is not None:
+        members.discard(channel)
+        if not members:
+            del index[key]
+
+
+def join(
+    channel: ClientChannel,
+    session: str,
+    room: str | None = None,
+    subscriptions: Iterable[str] | None = None,
+) -> None:
+    """(Re)index a face under its session and room, and set its frame-type filter."""
+    _index_remove(_by_session, channel.session, channel)
+    _index_remove(_by_room, channel.room, channel)
+    channel.session, channel.room = session, room
+    _by_session.setdefault(session, set()).add(channel)
+    if room is not None:
+        _by_room.setdefault(room, set()).add(channel)
+    channel.subscriptions = frozenset(subscriptions) if subscriptions is not None else None
+
+
+def _targets(route: Route | None) -> Iterable[ClientChannel]:
+    """Channels a route reaches (every channel for None)."""
+    if route is None:
+        return list(_channels.values())
+    session = _by_session.get(route.session, ()) if route.session is not None else ()
+    room = _by_room.get(route.room, ()) if route.room is not None else ()
+    if not room:
+        return list(session)
+    if not session:
+        return list(room)
+    return list(set(session) | set(room))
+
+
+def register(ws) -> ClientChannel:
+    """Create the outbound channel for a newly connected face."""
+    channel = ClientChannel(ws, maxsize=BROADCAST_QUEUE_SIZE, policy=_slow_policy)
+    _channels[ws] = channel
+    return channel
+
+
+def unregister(ws) -> None:
+    """Drop the channel of a disconnected face and stop its writer."""
+    channel = _channels.pop(ws, None)
+    if channel is not None:
+        _index_remove(_by_session, channel.session, channel)
+        _index_remove(_by_room, channel.room, channel)
+        channel.stop()
+
+
+def publish(payload: dict | Frame, route: Route | None = None) -> int:
+    """
+    Queue payload for the faces route reaches (all faces without one), encoding it once
+    per encoding. Return how many faces accepted it.
+    """
+    frame = payload if isinstance(payload, Frame) else Frame(payload)
+    accepted = 0
+    for channel in _targets(route):
+        if channel.offer(frame):
+            accepted += 1
+    return accepted
+
+
+def publish_batch(payloads: list[dict | Frame], route: Route | None = None) -> int:
+    """Queue several payloads at once: one batch frame for faces that opted in. Return faces reached."""
+    if len(payloads) == 1:
+        return publish(payloads[0], route)
+    batch = BatchFrame([p if isinstance(p, Frame) else Frame(p) for p in payloads])
+    accepted = 0
+    for channel in _targets(route):
+        if channel.offer_batch(batch):
+            accepted += 1
+    return accepted
+
+
+def channel_stats() -> list[dict]:
+    """Counters for every connected face (queue depth, drops, send latency)."""
+    return [channel.stats() for channel in _channels.values()]
@@ -0,0 +1,206 @@
+"""
+Local broadcast bus for multi-process mode (--workers N).
+
+The supervisor process runs a hub on a Unix-domain socket and every worker connects to it.
+Payloads broadcast in one worker are forwarded to the hub as length-prefixed JSON
+({"to": [session, room] | null, "frames": [...]}) and relayed to all other workers, which
+deliver them to their own faces on that route. Each process owns only its own connections,
+yet broadcast() still reaches every face of the route. No external broker.
+
+A worker queues its messages for the hub in a bounded queue drained by a writer task
+(BMO_BUS_QUEUE_SIZE), and the hub does the same for each worker it relays to. A stalled
+hub, or a stalled worker, costs that side dropped messages, not unbounded memory or the
+other workers' relay.
+
+Limitation: only broadcasts cross the bus. A parked session (resume.py) lives in the
+worker that parked it, and SO_REUSEPORT picks the worker for a new connection, so a resume
+that lands on another worker finds no parked session and starts a fresh one.
+"""
+
+import asyncio
+import json
+import logging
+import struct
+from typing import Callable
+
+from bmo_brain.broadcaster import Route, publish_batch
+from bmo_brain.config import BUS_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")
+
+
+async def _read_message(reader: asyncio.StreamReader) -> bytes:
+    header = await reader.readexactly(_HEADER.size)
+    (length,) = _HEADER.unpack(header)
+    return await reader.readexactly(length)
+
+
+class _Peer:
+    """The hub's side of one worker: a bounded queue of messages drained by a writer task."""
+
+    def __init__(self, writer: asyncio.StreamWriter, maxsize: int) -> None:
+        self.writer = writer
+        self.outbox: asyncio.Queue[bytes] = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._overflowing = False
+        self.task = asyncio.create_task(self._write_loop())
+
+    def offer(self, message: bytes) -> None:
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning("Bus: worker not keeping up (%d messages queued); dropping", self.outbox.maxsize)
+            self.dropped += 1
+            return
+        self._overflowing = False
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                self.writer.write(await self.outbox.get())
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def run_hub(path: str, *, maxsize: int = BUS_QUEUE_SIZE) -> asyncio.Server:
+    """Start the hub: relay every worker's messages to all other workers."""
+    peers: dict[asyncio.StreamWriter, _Peer] = {}
+
+    async def on_worker(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = peers[writer] = _Peer(writer, maxsize)
+        logger.info("Bus: worker connected (total: %d)", len(peers))
+        try:
+            while True:
+                body = await _read_message(reader)
+                message = _HEADER.pack(len(body)) + body
+                for other in peers.values():
+                    if other is not peer:
+                        other.offer(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del peers[writer]
+            peer.task.cancel()
+            writer.close()
+            logger.info(
+                "Bus: worker disconnected (remaining: %d, %d messages dropped for it)", len(peers), peer.dropped
+            )
+
+    return await asyncio.start_unix_server(on_worker, path=path)
+
+
+class BusClient:
+    """A worker's connection to the hub."""
+
+    def __init__(
+        self, on_payloads: Callable[[list[dict], Route | None], object], *, maxsize: int = BUS_QUEUE_SIZE
+    ) -> None:
+        self._on_payloads = on_payloads
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._writer_task: asyncio.Task | None = None
+        self._outbox: asyncio.Queue[bytes] = asyncio.Queue(maxsize)
+        self.messages_forwarded = 0
+        self.messages_dropped = 0
+        self._overflowing = False
+        self.messages_received = 0
+        self.bytes_forwarded = 0
+        self.bytes_received = 0
+
+    async def connect(self, path: str, attempts: int = 50, delay: float = 0.1) -> None:
+        """Connect to the hub, retrying while the supervisor starts it."""
+        for attempt in range(attempts):
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(path)
+                break
+            except (FileNotFoundError, ConnectionError):
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(delay)
+        self._reader_task = asyncio.create_task(self._read_loop(reader))
+        self._writer_task = asyncio.create_task(self._write_loop(self._writer))
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                body = await _read_message(reader)
+                self.messages_received += 1
+                self.bytes_received += len(body)
+                try:
+                    message = json.loads(body)
+                    to = message.get("to")
+                    self._on_payloads(message["frames"], Route(*to) if to is not None else None)
+                except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+                    logger.warning("Bus: skipping malformed message (%s: %s)", type(e).__name__, e)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.warning("Bus: connection to hub lost; broadcasts stay local to this worker")
+            self._disconnected()
+
+    async def _write_loop(self, writer: asyncio.StreamWriter) -> None:
+        """Writer task: send queued messages in order, waiting whenever the hub falls behind."""
+        try:
+            while True:
+                data = await self._outbox.get()
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            logger.warning("Bus: connection to hub lost; broadcasts stay local to this worker")
+            self._disconnected()
+
+    def _disconnected(self) -> None:
+        self._writer = None
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+        while not self._outbox.empty():
+            self._outbox.get_nowait()
+
+    def forward(self, payloads: list[dict], route: Route | None = None) -> None:
+        """Queue payloads for route for the other workers (fire-and-forget, in order)."""
+        if self._writer is None:
+            return
+        message = {"to": list(route) if route is not None else None, "frames": payloads}
+        body = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        try:
+            self._outbox.put_nowait(_HEADER.pack(len(body)) + body)
+        except asyncio.QueueFull:
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning("Bus: hub not keeping up (%d messages queued); dropping", self._outbox.maxsize)
+            self.messages_dropped += 1
+            return
+        self._overflowing = False
+        self.messages_forwarded += 1
+        self.bytes_forwarded += len(body)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._writer is not None,
+            "messages_forwarded": self.messages_forwarded,
+            "messages_dropped": self.messages_dropped,
+            "queue_depth": self._outbox.qsize(),
+            "messages_received": self.messages_received,
+            "bytes_forwarded": self.bytes_forwarded,
+            "bytes_received": self.bytes_received,
+        }
+
+
+_client: BusClient | None = None
+
+
+def get_bus() -> BusClient | None:
+    """Return this worker's bus client, or None in single-process mode."""
+    return _client
+
+
+async def connect(path: str) -> BusClient:
+    """Join the bus: payloads from other workers are delivered to local faces only."""
+    global _client
+    client = BusClient(publish_batch)
+    await client.connect(path)
+    _client = client
+    return client
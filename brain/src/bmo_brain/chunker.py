@@ -0,0 +1,118 @@
+"""
+Incremental chunker: turns streamed LLM tokens into message_chunk texts.
+
+Tokens are accumulated in a list (joined only when a chunk is cut) and each token is
+searched once with a compiled boundary regex, so buffering is O(n) in reply length.
+A FlushPolicy trades frame count against time-to-first-word:
+
+- min_chars: do not cut before this many chars are buffered
+- max_latency_ms: once the buffer is this old, cut at the next boundary of any kind,
+  ignoring min_chars and sentence_only
+- sentence_only: cut only at sentence ends (. ! ? newline), not at , ; :
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from time import monotonic
+from typing import Callable
+
+from bmo_brain.config import CHUNK_MAX_LATENCY_MS, CHUNK_MIN_CHARS, CHUNK_SENTENCE_ONLY
+
+# Runs of punctuation count as one boundary ("..." or "?!" end a single chunk)
+CLAUSE_BOUNDARY_RE = re.compile(r"[.,;:!?\n]+")
+SENTENCE_BOUNDARY_RE = re.compile(r"[.!?\n]+")
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    """When the chunker may cut a chunk (see module docstring)."""
+
+    min_chars: int = 0
+    max_latency_ms: float | None = None
+    sentence_only: bool = False
+
+    @classmethod
+    def from_config(cls) -> "FlushPolicy":
+        return cls(
+            min_chars=CHUNK_MIN_CHARS,
+            max_latency_ms=CHUNK_MAX_LATENCY_MS,
+            sentence_only=CHUNK_SENTENCE_ONLY,
+        )
+
+
+class Chunker:
+    """Feed tokens, get back the chunks that are ready to send."""
+
+    def __init__(self, policy: FlushPolicy | None = None, *, clock: Callable[[], float] = monotonic) -> None:
+        self.policy = policy or FlushPolicy.from_config()
+        self._clock = clock
+        self._boundary = SENTENCE_BOUNDARY_RE if self.policy.sentence_only else CLAUSE_BOUNDARY_RE
+        self._max_age = None if self.policy.max_latency_ms is None else self.policy.max_latency_ms / 1000.0
+        self._parts: list[str] = []
+        self._size = 0
+        self._started_at = 0.0
+
+    @property
+    def buffered(self) -> int:
+        """Chars waiting in the buffer."""
+        return self._size
+
+    def _take(self, n: int) -> str:
+        """Remove and return the first n buffered chars."""
+        parts = self._parts
+        text = parts[0] if len(parts) == 1 else "".join(parts)
+        rest = text[n:]
+        self._parts = [rest] if rest else []
+        self._size = len(rest)
+        if self._max_age is not None:
+            self._started_at = self._clock()
+        return text[:n]
+
+    def feed(self, token: str) -> list[str]:
+        """Buffer one token and return the chunks it completes (usually zero or one)."""
+        if not token:
+            return []
+        # Buffered length before token[i] is `base + i`
+        base = self._size
+        self._parts.append(token)
+        self._size += len(token)
+
+        overdue = False
+        if self._max_age is not None:
+            now = self._clock()
+            if not base:
+                self._started_at = now
+            overdue = now - self._started_at >= self._max_age
+        pattern = CLAUSE_BOUNDARY_RE if overdue else self._boundary
+        match = pattern.search(token)
+        if match is None:
+            return []
+        min_chars = self.policy.min_chars
+        ready: list[str] = []
+        while match is not None:
+            end = match.end()
+            if overdue or base + end >= min_chars:
+                ready.append(self._take(base + end))
+                base = -end
+            match = pattern.search(token, end)
+        return ready
+
+    def flush_partial(self) -> str | None:
+        """
+        Cut the buffer without a boundary (the stream stalled): up to and including the last
+        space, or everything if it holds a single partial word. None if the buffer is empty.
+        """
+        if not self._size:
+            return None
+        parts = self._parts
+        text = parts[0] if len(parts) == 1 else "".join(parts)
+        cut = text.rfind(" ") + 1
+        return self._take(cut if 0 < cut else self._size)
+
+    def flush(self) -> str | None:
+        """Return whatever is left (end of stream), or None if the buffer is empty."""
+        if not self._size:
+            return None
+        return self._take(self._size)
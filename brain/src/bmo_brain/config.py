@@ -7,7 +7,174 @@ import os
 # OpenAI: set OPENAI_API_KEY to enable real model; optional OPENAI_MODEL (default below)
 OPENAI_API_KEY: str | None = os.environ.get("OPENAI_API_KEY") or None
 OPENAI_MODEL: str = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+# Optional API host override (e.g. a local proxy); default is api.openai.com
+OPENAI_BASE_URL: str | None = os.environ.get("OPENAI_BASE_URL") or None
+# Models tried after OPENAI_MODEL (hedges and fallbacks), comma-separated
+OPENAI_FALLBACK_MODELS: list[str] = [
+    m.strip() for m in os.environ.get("OPENAI_FALLBACK_MODELS", "").split(",") if m.strip()
+]
+
+# LLM backend: "openai" (real API, needs OPENAI_API_KEY), "fake" (local streaming stand-in)
+# or "replay" (token streams recorded in BMO_TRACE_REPLAY)
+LLM_BACKEND: str = os.environ.get("BMO_LLM_BACKEND", "openai").strip().lower()
+# Keep-alive pool shared by every chat model client
+LLM_POOL_MAX_KEEPALIVE: int = int(os.environ.get("BMO_LLM_POOL_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY_S: float = float(os.environ.get("BMO_LLM_KEEPALIVE_EXPIRY_S", "120"))
+# Fake backend pacing (ms) and fixed reply (default: echo the user text)
+FAKE_FIRST_TOKEN_MS: float = float(os.environ.get("BMO_FAKE_FIRST_TOKEN_MS", "300"))
+FAKE_TOKEN_DELAY_MS: float = float(os.environ.get("BMO_FAKE_TOKEN_DELAY_MS", "30"))
+FAKE_TOKEN_JITTER_MS: float = float(os.environ.get("BMO_FAKE_TOKEN_JITTER_MS", "15"))
+FAKE_REPLY: str | None = os.environ.get("BMO_FAKE_REPLY") or None
+
+# Turn traces: record every turn to this JSONL file (.gz to compress); replay backend input
+# file and timing scale (0 = no delays)
+TRACE_RECORD_PATH: str | None = os.environ.get("BMO_TRACE_RECORD") or None
+TRACE_REPLAY_PATH: str | None = os.environ.get("BMO_TRACE_REPLAY") or None
+REPLAY_SPEED: float = float(os.environ.get("BMO_REPLAY_SPEED", "1"))
+
+# Streaming call policy: first-token and inter-token deadlines (ms), retries (before any
+# token) with jittered exponential backoff, hedging to the next model after HEDGE_AFTER_MS
+# without a first token (unset = off), and a per-model circuit breaker that opens after
+# BREAKER_FAILURES consecutive failures and lets one trial call through after BREAKER_RESET_S
+LLM_FIRST_TOKEN_TIMEOUT_MS: float = float(os.environ.get("BMO_LLM_FIRST_TOKEN_TIMEOUT_MS", "8000"))
+LLM_TOKEN_TIMEOUT_MS: float = float(os.environ.get("BMO_LLM_TOKEN_TIMEOUT_MS", "5000"))
+LLM_RETRIES: int = int(os.environ.get("BMO_LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF_MS: float = float(os.environ.get("BMO_LLM_RETRY_BACKOFF_MS", "250"))
+LLM_HEDGE_AFTER_MS: float | None = (
+    float(os.environ["BMO_LLM_HEDGE_AFTER_MS"]) if os.environ.get("BMO_LLM_HEDGE_AFTER_MS") else None
+)
+LLM_BREAKER_FAILURES: int = int(os.environ.get("BMO_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_S: float = float(os.environ.get("BMO_LLM_BREAKER_RESET_S", "30"))
+# HTTP timeout of one model request (connect, and each read while streaming). The client
+# never retries on its own: retries and deadlines above are the only ones
+LLM_REQUEST_TIMEOUT_S: float = float(os.environ.get("BMO_LLM_REQUEST_TIMEOUT_S", "30"))
+
+# Bump when the prompt sent to the model changes, so cached replies are not reused
+PROMPT_VERSION: str = "1"
+
+# Reply cache for repeated inputs (off by default); optional SQLite file for a persistent tier
+REPLY_CACHE_ENABLED: bool = os.environ.get("BMO_REPLY_CACHE", "0") in ("1", "true", "yes")
+REPLY_CACHE_SIZE: int = int(os.environ.get("BMO_REPLY_CACHE_SIZE", "512"))
+REPLY_CACHE_TTL_S: float = float(os.environ.get("BMO_REPLY_CACHE_TTL_S", "3600"))
+REPLY_CACHE_DB: str | None = os.environ.get("BMO_REPLY_CACHE_DB") or None
+# Delay between replayed chunks on a cache hit (ms)
+REPLY_CACHE_PACING_MS: float = float(os.environ.get("BMO_REPLY_CACHE_PACING_MS", "40"))
+
+# Conversation memory per session: prompt token budget for history, max turns kept verbatim,
+# summary size, conversations kept in memory, summarizer (extractive | llm), optional SQLite
+MEMORY_ENABLED: bool = os.environ.get("BMO_MEMORY", "1") not in ("0", "false", "no")
+MEMORY_TOKEN_BUDGET: int = int(os.environ.get("BMO_MEMORY_TOKEN_BUDGET", "1024"))
+MEMORY_MAX_TURNS: int = int(os.environ.get("BMO_MEMORY_MAX_TURNS", "24"))
+MEMORY_SUMMARY_TOKENS: int = int(os.environ.get("BMO_MEMORY_SUMMARY_TOKENS", "256"))
+MEMORY_MAX_SESSIONS: int = int(os.environ.get("BMO_MEMORY_MAX_SESSIONS", "256"))
+MEMORY_SUMMARIZER: str = os.environ.get("BMO_MEMORY_SUMMARIZER", "extractive").strip().lower()
+MEMORY_DB: str | None = os.environ.get("BMO_MEMORY_DB") or None
+# Persisted conversations unused for this many days are deleted from MEMORY_DB (0 = keep all)
+MEMORY_TTL_DAYS: float = float(os.environ.get("BMO_MEMORY_TTL_DAYS", "30"))
+
+# Run turns through a LangGraph variant ("streaming" or "threaded") instead of the
+# built-in streaming loop; empty = built-in loop. Threads serve blocking graph nodes.
+GRAPH_VARIANT: str = os.environ.get("BMO_GRAPH", "").strip().lower()
+GRAPH_THREADS: int = int(os.environ.get("BMO_GRAPH_THREADS", "4"))
+
+# Chunking of streamed replies into message_chunk frames (see chunker.FlushPolicy)
+CHUNK_MIN_CHARS: int = int(os.environ.get("BMO_CHUNK_MIN_CHARS", "0"))
+CHUNK_MAX_LATENCY_MS: float | None = (
+    float(os.environ["BMO_CHUNK_MAX_LATENCY_MS"]) if os.environ.get("BMO_CHUNK_MAX_LATENCY_MS") else None
+)
+CHUNK_SENTENCE_ONLY: bool = os.environ.get("BMO_CHUNK_SENTENCE_ONLY", "0") in ("1", "true", "yes")
+# Flush buffered text (at the last space, or mid-word) when no boundary came for this long (ms)
+CHUNK_IDLE_FLUSH_MS: float | None = (
+    float(os.environ["BMO_CHUNK_IDLE_FLUSH_MS"]) if os.environ.get("BMO_CHUNK_IDLE_FLUSH_MS") else None
+)
+
+# Latency hiding: when the first model token misses FILLER_AFTER_MS, send a filler
+# (off | chunk: a short filler message_chunk | emotion: the thinking expression)
+FILLER_MODE: str = os.environ.get("BMO_FILLER", "off").strip().lower()
+FILLER_AFTER_MS: float = float(os.environ.get("BMO_FILLER_AFTER_MS", "600"))
+
+# Broadcast: per-face outbound queue size and policy when a face falls behind
+# (close | drop_oldest | drop_newest)
+BROADCAST_QUEUE_SIZE: int = int(os.environ.get("BMO_BROADCAST_QUEUE_SIZE", "256"))
+BROADCAST_SLOW_POLICY: str = os.environ.get("BMO_BROADCAST_SLOW_POLICY", "close").strip().lower()
+# Multi-process mode (--workers N): default worker count and optional bus socket path
+WORKERS: int = int(os.environ.get("BMO_WORKERS", "1"))
+BUS_PATH: str | None = os.environ.get("BMO_BUS_PATH") or None
+# Messages a worker may have waiting for the hub; more are dropped while the hub is stalled
+BUS_QUEUE_SIZE: int = int(os.environ.get("BMO_BUS_QUEUE_SIZE", "1024"))
+# Coalesce frames produced within this window (ms) into one batch frame; 0 disables.
+# Flushes are aligned to window boundaries (16-33 ms matches the face render frame).
+BATCH_WINDOW_MS: float = float(os.environ.get("BMO_BATCH_WINDOW_MS", "0"))
+BATCH_MAX_FRAMES: int = int(os.environ.get("BMO_BATCH_MAX_FRAMES", "64"))
+
+# Turn scheduling: global cap on in-flight LLM turns, per-session queue size, and whether
+# a new input cancels the turn still running for that session
+MAX_CONCURRENT_TURNS: int = int(os.environ.get("BMO_MAX_CONCURRENT_TURNS", "8"))
+SESSION_QUEUE_SIZE: int = int(os.environ.get("BMO_SESSION_QUEUE_SIZE", "8"))
+SUPERSEDE_TURNS: bool = os.environ.get("BMO_SUPERSEDE_TURNS", "1") not in ("0", "false", "no")
+# Who receives a turn's reply: "session" (the asking session's faces, plus its room if
+# the face joined one) or "all" (every connected face)
+REPLY_ROUTING: str = os.environ.get("BMO_REPLY_ROUTING", "session").strip().lower()
+
+# Admission control: turns/s (and burst) per face and for the whole process (0 = unlimited,
+# the default for both), a budget of estimated model tokens per minute (0 = unlimited), how long a turn may wait
+# to be admitted before it is rejected, and the emotion shown to a face that is turned away
+RATE_PER_FACE: float = float(os.environ.get("BMO_RATE_PER_FACE", "0"))
+RATE_PER_FACE_BURST: float = float(os.environ.get("BMO_RATE_PER_FACE_BURST", "3"))
+RATE_GLOBAL: float = float(os.environ.get("BMO_RATE_GLOBAL", "0"))
+RATE_GLOBAL_BURST: float = float(os.environ.get("BMO_RATE_GLOBAL_BURST", "20"))
+TOKENS_PER_MINUTE: float = float(os.environ.get("BMO_TOKENS_PER_MINUTE", "0"))
+EXPECTED_REPLY_TOKENS: int = int(os.environ.get("BMO_EXPECTED_REPLY_TOKENS", "150"))
+ADMISSION_MAX_WAIT_MS: float = float(os.environ.get("BMO_ADMISSION_MAX_WAIT_MS", "2000"))
+BUSY_EMOTION: str = os.environ.get("BMO_BUSY_EMOTION", "concerned")
+
+# Inbound frames: largest WebSocket message accepted (bytes; bigger closes the connection
+# with 1009), text frames above OFFLOAD_BYTES are decoded in a pool of INBOUND_THREADS,
+# and the longest input text accepted (chars)
+MAX_FRAME_BYTES: int = int(os.environ.get("BMO_MAX_FRAME_BYTES", str(64 * 1024)))
+INBOUND_OFFLOAD_BYTES: int = int(os.environ.get("BMO_INBOUND_OFFLOAD_BYTES", str(8 * 1024)))
+INBOUND_THREADS: int = int(os.environ.get("BMO_INBOUND_THREADS", "2"))
+MAX_INPUT_CHARS: int = int(os.environ.get("BMO_MAX_INPUT_CHARS", "4000"))
+
+# Audio input (audio.py): PCM16LE mono frames from the face, an energy VAD (level threshold
+# in dBFS, speech needed to open a segment, quiet that closes it, audio kept before it),
+# the longest segment, how long the receive loop waits for ring space before dropping
+# frames, and the speech-to-text stage ("stub" or "module:function")
+AUDIO_INGEST: bool = os.environ.get("BMO_AUDIO_INGEST", "0") in ("1", "true", "yes")
+AUDIO_SAMPLE_RATE: int = int(os.environ.get("BMO_AUDIO_SAMPLE_RATE", "16000"))
+AUDIO_FRAME_MS: int = int(os.environ.get("BMO_AUDIO_FRAME_MS", "20"))
+VAD_THRESHOLD_DB: float = float(os.environ.get("BMO_VAD_THRESHOLD_DB", "-45"))
+VAD_MIN_SPEECH_MS: float = float(os.environ.get("BMO_VAD_MIN_SPEECH_MS", "120"))
+VAD_HANGOVER_MS: float = float(os.environ.get("BMO_VAD_HANGOVER_MS", "500"))
+VAD_PREROLL_MS: float = float(os.environ.get("BMO_VAD_PREROLL_MS", "200"))
+AUDIO_MAX_SEGMENT_MS: float = float(os.environ.get("BMO_AUDIO_MAX_SEGMENT_MS", "15000"))
+AUDIO_BACKPRESSURE_MS: float = float(os.environ.get("BMO_AUDIO_BACKPRESSURE_MS", "200"))
+STT_BACKEND: str = os.environ.get("BMO_STT", "stub").strip()
+
+# Speech output (tts.py): engine ("" = off, "fake", or "module:function"), synthesis
+# threads shared by all turns, and the sample rate of the PCM sent to faces
+TTS_BACKEND: str = os.environ.get("BMO_TTS", "").strip()
+TTS_WORKERS: int = int(os.environ.get("BMO_TTS_WORKERS", "2"))
+TTS_SAMPLE_RATE: int = int(os.environ.get("BMO_TTS_SAMPLE_RATE", "16000"))
+
+# Resumable sessions (resume.py): frames kept per face for a reconnect (0 disables resume)
+# and how long a disconnected face's session (and its running turn) waits to be resumed
+RESUME_BUFFER: int = int(os.environ.get("BMO_RESUME_BUFFER", "256"))
+RESUME_TTL_S: float = float(os.environ.get("BMO_RESUME_TTL_S", "30"))
+
+# Face contract file (default: face/src/contracts/faceContract.json) and how often its
+# mtime is checked for hot reload (seconds; 0 disables)
+FACE_CONTRACT_PATH: str | None = os.environ.get("BMO_FACE_CONTRACT") or None
+CONTRACT_POLL_S: float = float(os.environ.get("BMO_CONTRACT_POLL_S", "1"))
+
+# Prometheus-style /metrics endpoint (off unless a port is set; worker i uses port + i)
+METRICS_PORT: int | None = int(os.environ["BMO_METRICS_PORT"]) if os.environ.get("BMO_METRICS_PORT") else None
+METRICS_HOST: str = os.environ.get("BMO_METRICS_HOST", "127.0.0.1")
 
 def use_openai() -> bool:
     """True if OPENAI_API_KEY is set and non-empty."""
     return bool(OPENAI_API_KEY and OPENAI_API_KEY.strip())
+
+def use_llm() -> bool:
+    """True if replies come from a model: the fake backend, or OpenAI with an API key."""
+    return LLM_BACKEND in ("fake", "replay") or use_openai()
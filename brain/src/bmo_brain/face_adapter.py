@@ -1,12 +1,24 @@
 """
-Adapter to send BrainMessage payloads to all connected face clients via WebSocket.
+Adapter to send BrainMessage payloads to the connected face clients via WebSocket.
+
+Payloads go to the route of the turn that produced them (broadcaster.reply_route: the
+asking session and its room), or to every face outside a turn.
+With BMO_BATCH_WINDOW_MS > 0, payloads produced within one window are coalesced and
+flushed together on the next window boundary (one batch frame per face that opted in).
+In multi-process mode every delivery is also forwarded to the other workers over the bus,
+with its route.
 """
 
-import json
+import asyncio
 import logging
+from time import monotonic
 
+from bmo_brain.broadcaster import Route, publish_batch, reply_route
+from bmo_brain.bus import get_bus
+from bmo_brain.config import BATCH_MAX_FRAMES, BATCH_WINDOW_MS
+from bmo_brain.face_contract import get_contract
+from bmo_brain.metrics import BROADCAST_SECONDS, BROADCASTS, trace_id
 from bmo_brain.protocol import (
-    emotion as build_emotion,
     message as build_message,
     message_chunk as build_message_chunk,
     message_end as build_message_end,
@@ -16,25 +28,117 @@ from bmo_brain.protocol import (
     to_json_dict,
 )
 from bmo_brain.protocol import StateValue
-from bmo_brain.server import get_connected
+from bmo_brain.trace import current_turn
+from bmo_brain.wire import AudioFrame, Frame
 
 logger = logging.getLogger(__name__)
 
 
-async def broadcast(payload: dict) -> None:
-    """Send a JSON payload to every connected WebSocket client. Drops dead connections."""
-    msg_type = payload.get("type", "?")
-    logger.info("Brain -> face: type=%s payload=%s", msg_type, payload)
-    text = json.dumps(payload)
-    dead = []
-    for ws in list(get_connected()):
-        try:
-            await ws.send(text)
-        except Exception as e:
-            logger.warning("Send failed for a client: %s", e)
-            dead.append(ws)
-    for ws in dead:
-        get_connected().discard(ws)
+class FrameBatcher:
+    """Collects payloads and flushes them, in order, at frame-aligned window boundaries."""
+
+    def __init__(self, window_ms: float, max_frames: int) -> None:
+        self.window = window_ms / 1000.0
+        self.max_frames = max_frames
+        self._pending: list[tuple[dict | Frame, Route | None]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self.flushes = 0
+        self.frames = 0
+
+    def add(self, payload: dict | Frame, route: Route | None = None) -> None:
+        self._pending.append((payload, route))
+        if len(self._pending) >= self.max_frames:
+            self.flush()
+        elif self._timer is None:
+            delay = self.window - (monotonic() % self.window)
+            self._timer = asyncio.get_running_loop().call_later(delay, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self.flushes += 1
+        self.frames += len(pending)
+        # One delivery per run of payloads with the same route, in order
+        group: list[dict | Frame] = []
+        group_route = pending[0][1]
+        for payload, route in pending:
+            if route != group_route:
+                _deliver(group, group_route)
+                group, group_route = [], route
+            group.append(payload)
+        _deliver(group, group_route)
+
+    def stats(self) -> dict:
+        return {
+            "flushes": self.flushes,
+            "frames": self.frames,
+            "avg_frames_per_flush": self.frames / self.flushes if self.flushes else 0.0,
+        }
+
+
+def _payload(item: dict | Frame) -> dict:
+    return item.payload if isinstance(item, Frame) else item
+
+
+def _deliver(payloads: list[dict | Frame], route: Route | None = None) -> None:
+    """Queue payloads for local faces on route and forward them to the other workers, if any."""
+    start = monotonic()
+    accepted = publish_batch(payloads, route)
+    bus = get_bus()
+    if bus is not None:
+        bus.forward([p.json_payload() if isinstance(p, Frame) else p for p in payloads], route)
+    BROADCAST_SECONDS.observe(monotonic() - start)
+    logger.debug(
+        "Brain -> face: %d frame(s) type=%s faces=%d trace=%s",
+        len(payloads),
+        _payload(payloads[0]).get("type", "?"),
+        accepted,
+        trace_id.get(),
+    )
+
+
+_batcher = FrameBatcher(BATCH_WINDOW_MS, BATCH_MAX_FRAMES) if BATCH_WINDOW_MS > 0 else None
+
+
+def get_batcher() -> FrameBatcher | None:
+    """Return the frame batcher, or None when batching is disabled."""
+    return _batcher
+
+
+async def broadcast(payload: dict | Frame) -> None:
+    """
+    Queue a payload (or a prebuilt Frame) for the faces of the current turn's route, or every
+    connected face outside a turn (encoded once, sent concurrently).
+    Never waits on a slow face: each connection drains its own bounded queue.
+    """
+    BROADCASTS.labels(_payload(payload).get("type", "?")).inc()
+    turn = current_turn.get()
+    if turn is not None:
+        turn.frame(_payload(payload))
+    route = reply_route.get()
+    if _batcher is not None:
+        _batcher.add(payload, route)
+        return
+    _deliver([payload], route)
+
+
+async def send_audio(payload: dict, pcm: bytes) -> None:
+    """
+    Send one audio frame (tts.py: payload without the PCM) to the faces of the current route
+    that enabled tts. Never batched: text already waiting in the batcher is flushed first,
+    to keep the order.
+    """
+    BROADCASTS.labels("audio").inc()
+    turn = current_turn.get()
+    if turn is not None:
+        turn.frame(payload)
+    if _batcher is not None:
+        _batcher.flush()
+    _deliver([AudioFrame(payload, pcm)], reply_route.get())
 
 
 async def send_state(value: StateValue) -> None:
@@ -63,8 +167,8 @@ async def send_message_end(id: str) -> None:
 
 
 async def send_emotion(value: str, duration_ms: int | None = None) -> None:
-    """Send eye expression to the face, optionally with duration in ms."""
-    await broadcast(to_json_dict(build_emotion(value, duration_ms)))
+    """Send eye expression to the face, optionally with duration in ms (prebuilt frame per preset)."""
+    await broadcast(get_contract().emotion_frame(value, duration_ms))
 
 
 async def send_speaking_end() -> None:
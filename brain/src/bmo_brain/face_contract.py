@@ -1,15 +1,38 @@
 """
 Shared face contract loader for brain<->face synchronization.
 
-Source of truth lives in face/src/contracts/faceContract.json.
+Source of truth lives in face/src/contracts/faceContract.json (BMO_FACE_CONTRACT overrides).
 This module keeps brain aware of available preset names/aliases.
+
+The file is compiled into a ContractIndex: a normalized alias table with interned keys
+(exact hits are one dict lookup, other spellings are normalized once and memoized) and
+emotion frames pre-encoded per preset and duration. watch() polls the file's mtime from a
+worker thread, which also reads and compiles a changed file, and swaps the new index in on
+the event loop; a file that fails to parse (e.g. caught mid-write) keeps the previous
+index. Reload listeners are called with the new index, on the loop.
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import sys
 from pathlib import Path
-from typing import TypedDict
+from typing import TYPE_CHECKING, Callable, TypedDict
+
+from bmo_brain.config import FACE_CONTRACT_PATH
+
+if TYPE_CHECKING:
+    from bmo_brain.wire import Frame
+
+logger = logging.getLogger(__name__)
+
+# Emotion durations the runner sends (tone.RESPONSE_TONE_DURATION_MS, FALLBACK_TONE_DURATION_MS)
+PREENCODED_DURATIONS_MS: tuple[int | None, ...] = (None, 1_000, 2_000)
+# Bounds for the memoized spellings and on-demand emotion frames
+_MAX_MEMO = 1024
+_MAX_FRAMES = 512
 
 
 class _FaceContract(TypedDict):
@@ -19,30 +42,176 @@ class _FaceContract(TypedDict):
 
 
 def _contract_path() -> Path:
+    if FACE_CONTRACT_PATH:
+        return Path(FACE_CONTRACT_PATH)
     repo_root = Path(__file__).resolve().parents[3]
     return repo_root / "face" / "src" / "contracts" / "faceContract.json"
 
 
-def _load_contract() -> _FaceContract:
-    path = _contract_path()
+def _load_contract(path: Path) -> _FaceContract:
     if not path.exists():
         # Minimal fallback for environments where face/ is not present.
         return {"version": "missing", "aliases": {}, "presets": {}}
     return json.loads(path.read_text(encoding="utf-8"))
 
 
-_CONTRACT = _load_contract()
-FACE_CONTRACT_VERSION: str = _CONTRACT.get("version", "unknown")
-FACE_PRESET_ALIASES: dict[str, str] = dict(_CONTRACT.get("aliases", {}))
-FACE_PRESETS: dict[str, dict] = dict(_CONTRACT.get("presets", {}))
+def _normalize_key(value: str) -> str:
+    return value.strip().lower().replace("/", "_").replace(" ", "_")
+
+
+class ContractIndex:
+    """One compiled, immutable contract version."""
+
+    def __init__(self, contract: _FaceContract) -> None:
+        self.version: str = contract.get("version", "unknown")
+        self.presets: dict[str, dict] = {sys.intern(k): v for k, v in contract.get("presets", {}).items()}
+        self.aliases: dict[str, str] = {
+            sys.intern(_normalize_key(alias)): sys.intern(canonical)
+            for alias, canonical in contract.get("aliases", {}).items()
+        }
+        # Raw spelling -> canonical key (or None); seeded with the exact alias keys
+        self._memo: dict[str, str | None] = dict(self.aliases)
+        self._frames: dict[tuple[str, int | None], Frame] = {}
+        for canonical in set(self.aliases.values()):
+            for duration_ms in PREENCODED_DURATIONS_MS:
+                frame = self._emotion_frame(canonical, duration_ms)
+                frame.encoded("json")
+                frame.encoded("compact")
+
+    def normalize(self, value: str) -> str | None:
+        """Canonical preset key for an emotion/preset name, or None if unknown."""
+        try:
+            return self._memo[value]
+        except KeyError:
+            pass
+        canonical = self.aliases.get(_normalize_key(value))
+        if len(self._memo) < _MAX_MEMO + len(self.aliases):
+            self._memo[value] = canonical
+        return canonical
+
+    def emotion_frame(self, value: str, duration_ms: int | None = None) -> Frame:
+        """Emotion frame for value, shared (with its encoded bytes) per preset and duration."""
+        canonical = self.normalize(value)
+        if canonical is None:
+            from bmo_brain.protocol import emotion as build_emotion, to_json_dict
+            from bmo_brain.wire import Frame
+
+            # Unknown value: protocol.emotion logs it and sends it raw (not cached)
+            return Frame(to_json_dict(build_emotion(value, duration_ms)))
+        return self._emotion_frame(canonical, duration_ms)
+
+    def _emotion_frame(self, canonical: str, duration_ms: int | None) -> Frame:
+        from bmo_brain.wire import Frame
+
+        key = (canonical, duration_ms)
+        frame = self._frames.get(key)
+        if frame is None:
+            # Same shape as protocol.emotion, without normalizing again
+            payload: dict = {"type": "emotion", "value": canonical}
+            if duration_ms is not None:
+                payload["duration_ms"] = duration_ms
+            frame = Frame(payload)
+            if len(self._frames) < _MAX_FRAMES:
+                self._frames[key] = frame
+        return frame
+
+
+_index: ContractIndex | None = None
+# (mtime_ns, size) of the loaded file, and of the last file that failed to load
+_loaded_sig: tuple[int, int] | None = None
+_failed_sig: tuple[int, int] | None = None
+_listeners: list[Callable[[ContractIndex], None]] = []
+
+
+def _file_sig(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def get_contract() -> ContractIndex:
+    """Return the current compiled contract (compiled on first use)."""
+    global _index, _loaded_sig
+    if _index is None:
+        path = _contract_path()
+        _loaded_sig = _file_sig(path)
+        _index = ContractIndex(_load_contract(path))
+    return _index
+
+
+def add_reload_listener(callback: Callable[[ContractIndex], None]) -> None:
+    """Call callback(new_index) after each successful hot reload."""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def _read_if_changed() -> tuple[tuple[int, int], ContractIndex | Exception] | None:
+    """
+    Blocking part of a reload: stat the contract file and, if it changed, read and compile
+    it. Return (file signature, new index or the error), or None when nothing changed.
+    """
+    get_contract()
+    path = _contract_path()
+    sig = _file_sig(path)
+    if sig is None or sig == _loaded_sig or sig == _failed_sig:
+        return None
+    try:
+        return sig, ContractIndex(_load_contract(path))
+    except (OSError, ValueError, AttributeError) as e:
+        return sig, e
+
+
+def _swap(sig: tuple[int, int], loaded: ContractIndex | Exception) -> bool:
+    """Swap in a freshly compiled index and notify the listeners (on the caller's thread)."""
+    global _index, _loaded_sig, _failed_sig
+    if isinstance(loaded, Exception):
+        _failed_sig = sig
+        logger.warning("Face contract %s not reloaded (%s); keeping v%s", _contract_path(), loaded, _index.version)
+        return False
+    previous, _index, _loaded_sig, _failed_sig = _index, loaded, sig, None
+    logger.info("Face contract reloaded: v%s -> v%s", previous.version, loaded.version)
+    for callback in list(_listeners):
+        try:
+            callback(loaded)
+        except Exception:
+            logger.exception("Face contract reload listener failed")
+    return True
+
+
+def reload_if_changed() -> bool:
+    """Recompile the contract if its file changed. Return True when a new index was swapped in."""
+    changed = _read_if_changed()
+    return changed is not None and _swap(*changed)
+
+
+async def watch(interval_s: float) -> None:
+    """Poll the contract file every interval_s and hot-reload it on change (runs until cancelled)."""
+    while True:
+        await asyncio.sleep(interval_s)
+        # stat, read and compile in a thread; the swap and its listeners stay on the loop
+        changed = await asyncio.to_thread(_read_if_changed)
+        if changed is not None:
+            _swap(*changed)
 
 
 def normalize_face_preset(value: str) -> str | None:
     """Normalize incoming emotion/preset text into canonical preset key."""
-    key = value.strip().lower().replace("/", "_").replace(" ", "_")
-    return FACE_PRESET_ALIASES.get(key)
+    return get_contract().normalize(value)
 
 
 def is_supported_emotion_value(value: str) -> bool:
     """Return True when value is known by the shared contract aliases."""
-    return normalize_face_preset(value) is not None
+    return get_contract().normalize(value) is not None
+
+
+def __getattr__(name: str):
+    """Module constants of the original loader, always reflecting the current contract."""
+    if name == "FACE_CONTRACT_VERSION":
+        return get_contract().version
+    if name == "FACE_PRESET_ALIASES":
+        return dict(get_contract().aliases)
+    if name == "FACE_PRESETS":
+        return dict(get_contract().presets)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
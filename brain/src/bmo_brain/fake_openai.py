@@ -0,0 +1,202 @@
+"""
+Local OpenAI-compatible server with injectable faults, for testing the streaming policy.
+
+    uv run python -m bmo_brain.fake_openai --port 8787 --hang-rate 0.3 --stall-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=test uv run python -m bmo_brain
+
+Serves POST /v1/chat/completions (SSE when "stream": true, one JSON completion otherwise)
+and GET /v1/models. Replies echo the last user message (or --reply) in token-sized pieces.
+Per request, with the given probabilities:
+- --error-rate: answer 500 (or 429 with --error-status 429)
+- --hang-rate: send the headers, then nothing (no first token)
+- --stall-rate: stop sending after --stall-after tokens, keeping the connection open
+Faults apply to every model, or only to those named with --faulty-model (repeatable), so
+hedging to a healthy fallback can be tried.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\s*\S{1,4}")
+# A hung or stalled response stays open this long before the connection is dropped
+_HANG_S = 600.0
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: str | None = None) -> bytes:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n"
+
+
+class FakeOpenAI:
+    """Request handler; counters are logged when the server stops."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.counts: dict[str, int] = {}
+
+    def _count(self, outcome: str) -> None:
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def _reply_for(self, body: dict) -> str:
+        if self.args.reply:
+            return self.args.reply
+        for msg in reversed(body.get("messages") or []):
+            if msg.get("role") == "user":
+                content = msg.get("content")
+                return content if isinstance(content, str) else json.dumps(content)
+        return ""
+
+    def _fault(self, model: str) -> str | None:
+        """Pick this request's fault (error, hang, stall) or None."""
+        if self.args.faulty_model and model not in self.args.faulty_model:
+            return None
+        roll = self.rng.random()
+        for fault, rate in (
+            ("error", self.args.error_rate),
+            ("hang", self.args.hang_rate),
+            ("stall", self.args.stall_rate),
+        ):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    async def _delay(self, ms: float) -> None:
+        await asyncio.sleep(max(0.0, ms + self.rng.uniform(-self.args.jitter_ms, self.args.jitter_ms)) / 1000.0)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1")
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body_bytes = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+            method, path = (request_line.split(" ") + ["", ""])[:2]
+            if method == "GET" and path.rstrip("/").endswith("/models"):
+                await self._send_json(writer, 200, {"object": "list", "data": []})
+            elif method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                await self._completion(writer, json.loads(body_bytes or b"{}"))
+            else:
+                await self._send_json(writer, 404, {"error": {"message": "not found"}})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}
+        writer.write(
+            f"HTTP/1.1 {status} {reason.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode()
+            + data
+        )
+        await writer.drain()
+
+    async def _completion(self, writer: asyncio.StreamWriter, body: dict) -> None:
+        model = str(body.get("model", "fake"))
+        fault = self._fault(model)
+        self._count(fault or "ok")
+        logger.info("%s stream=%s -> %s", model, bool(body.get("stream")), fault or "ok")
+        if fault == "error":
+            status = self.args.error_status
+            await self._send_json(writer, status, {"error": {"message": "injected fault", "type": "server_error"}})
+            return
+        text = self._reply_for(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        if not body.get("stream"):
+            if fault is not None:
+                await asyncio.sleep(_HANG_S)
+                return
+            await self._delay(self.args.first_token_ms)
+            await self._send_json(
+                writer,
+                200,
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                    ],
+                },
+            )
+            return
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        writer.write(_chunk(completion_id, model, {"role": "assistant", "content": ""}))
+        await writer.drain()
+        if fault == "hang":
+            await asyncio.sleep(_HANG_S)
+            return
+        for i, token in enumerate(_TOKEN_RE.findall(text)):
+            if fault == "stall" and i == self.args.stall_after:
+                await asyncio.sleep(_HANG_S)
+                return
+            await self._delay(self.args.first_token_ms if i == 0 else self.args.token_ms)
+            writer.write(_chunk(completion_id, model, {"content": token}))
+            await writer.drain()
+        writer.write(_chunk(completion_id, model, {}, "stop") + b"data: [DONE]\n\n")
+        await writer.drain()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    handler = FakeOpenAI(args)
+    server = await asyncio.start_server(handler.handle, args.host, args.port)
+    logger.info("Fake OpenAI API on http://%s:%d/v1", args.host, args.port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        logger.info("Requests by outcome: %s", handler.counts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="bmo_brain.fake_openai", description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--reply", help="fixed reply text (default: echo the last user message)")
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-after", type=int, default=3, help="tokens sent before a stall")
+    parser.add_argument("--faulty-model", action="append", help="inject faults only for this model")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s %(message)s")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,76 @@
 """
 LangGraph orchestrator: state schema, nodes, edges, compiled graph.
 No I/O to the face here; output is via state["pending_face_events"] (drained by runner).
+
+Nodes also push each face event through the LangGraph custom stream as it is produced,
+so an async caller can forward events while the graph runs. Variants:
+- "default": the synchronous process_input node (blocking llm.invoke).
+- "threaded": same node wrapped with run_in_thread, safe to run inside the event loop.
+- "streaming": the async stream_reply node, streaming model tokens as chunks.
+Compiled graphs are cached per variant (get_compiled_graph).
 """
 
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
 from langgraph.graph import END, START, StateGraph
 
-from bmo_brain.nodes import process_input
+from bmo_brain.config import GRAPH_THREADS
+from bmo_brain.nodes import process_input, stream_reply
 from bmo_brain.state import State
 
+# Thread pool for blocking nodes inside async graphs
+_executor = ThreadPoolExecutor(max_workers=GRAPH_THREADS, thread_name_prefix="bmo-graph")
+
+
+def run_in_thread(node: Callable[[State], dict]) -> Callable:
+    """Wrap a blocking node as an async node that runs in the graph thread pool."""
 
-def build_graph():
+    @functools.wraps(node)
+    async def wrapper(state: State) -> dict:
+        # Copy the context so LangGraph config (e.g. the stream writer) is visible in the thread
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(_executor, ctx.run, node, state)
+
+    return wrapper
+
+
+def build_graph(threaded: bool = False):
     """Build and return the compiled graph (invoke/stream entry point)."""
     builder = StateGraph(state_schema=State)
-    builder.add_node("process_input", process_input)
+    builder.add_node("process_input", run_in_thread(process_input) if threaded else process_input)
     builder.add_edge(START, "process_input")
     builder.add_edge("process_input", END)
     return builder.compile()
 
 
-# Singleton compiled graph for the runner (Paso 8)
-graph = build_graph()
+def build_streaming_graph():
+    """Build the async graph: stream_reply pushes face events while the model streams."""
+    builder = StateGraph(state_schema=State)
+    builder.add_node("stream_reply", stream_reply)
+    builder.add_edge(START, "stream_reply")
+    builder.add_edge("stream_reply", END)
+    return builder.compile()
+
+
+GRAPH_BUILDERS: dict[str, Callable] = {
+    "default": build_graph,
+    "threaded": functools.partial(build_graph, threaded=True),
+    "streaming": build_streaming_graph,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_compiled_graph(name: str = "streaming"):
+    """Return the compiled graph for a variant, compiling it once per process."""
+    return GRAPH_BUILDERS[name]()
+
+
+def __getattr__(name: str):
+    """`graph` (the LangGraph CLI entry point, see langgraph.json) is compiled on first access."""
+    if name == "graph":
+        return get_compiled_graph("default")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,143 @@
+"""
+Inbound pipeline for face -> brain frames: decode, validate, and keep the loop free.
+
+- Frames larger than BMO_MAX_FRAME_BYTES never reach Python: websockets closes the
+  connection (1009) while reading them (see server.run_server).
+- decode() parses a text frame and checks it against the known shapes (input, hello)
+  in one pass, returning an Inbound or raising InvalidFrame. Text frames above
+  BMO_INBOUND_OFFLOAD_BYTES are decoded in a small thread pool instead of on the loop.
+- Binary frames are handed to the registered binary handler (audio ingest) or dropped.
+- Logging is sampled per category: at most LOG_RATE lines per second each, with the
+  number of suppressed lines reported on the next one. Full payloads are DEBUG only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from bmo_brain.config import INBOUND_OFFLOAD_BYTES, INBOUND_THREADS, MAX_INPUT_CHARS
+
+logger = logging.getLogger(__name__)
+
+# Sampled log lines per second per category
+LOG_RATE = 5.0
+# Longest preview of a payload in log lines
+_PREVIEW_CHARS = 200
+
+
+class InvalidFrame(Exception):
+    """A frame that is not JSON or does not match the shape of its type."""
+
+
+class Inbound(NamedTuple):
+    type: str
+    data: dict
+
+
+def _check_input(data: dict) -> None:
+    text = data.get("text")
+    if not isinstance(text, str):
+        raise InvalidFrame("input.text must be a string")
+    if len(text) > MAX_INPUT_CHARS:
+        raise InvalidFrame(f"input.text longer than {MAX_INPUT_CHARS} chars")
+
+
+def _check_hello(data: dict) -> None:
+    for key in ("encoding", "session", "room", "resume"):
+        if key in data and not isinstance(data[key], (str, type(None))):
+            raise InvalidFrame(f"hello.{key} must be a string")
+    resume_from = data.get("resume_from", 0)
+    if not isinstance(resume_from, int) or isinstance(resume_from, bool) or resume_from < 0:
+        raise InvalidFrame("hello.resume_from must be a non-negative integer")
+
+
+# Shape checks of the types the brain acts on; other types pass through unchecked
+_CHECKS: dict[str, Callable[[dict], None]] = {"input": _check_input, "hello": _check_hello}
+
+
+def decode(raw: str | bytes) -> Inbound:
+    """Parse and validate one text frame (bytes are taken as UTF-8 JSON)."""
+    try:
+        data = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidFrame(f"not JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise InvalidFrame("not a JSON object")
+    msg_type = data.get("type")
+    if not isinstance(msg_type, str):
+        raise InvalidFrame("missing type")
+    check = _CHECKS.get(msg_type)
+    if check is not None:
+        check(data)
+    return Inbound(msg_type, data)
+
+
+_pool: ThreadPoolExecutor | None = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=INBOUND_THREADS, thread_name_prefix="bmo-inbound")
+    return _pool
+
+
+async def decode_text(raw: str) -> Inbound:
+    """decode(), in the thread pool for frames above BMO_INBOUND_OFFLOAD_BYTES."""
+    if len(raw) <= INBOUND_OFFLOAD_BYTES:
+        return decode(raw)
+    return await asyncio.get_running_loop().run_in_executor(_get_pool(), decode, raw)
+
+
+# Receives (data, session, channel) for binary frames; None drops them
+BinaryHandler = Callable[[bytes, Any, Any], Awaitable[None]]
+_binary_handler: BinaryHandler | None = None
+
+
+def set_binary_handler(handler: BinaryHandler | None) -> None:
+    """Route binary frames (e.g. audio) to handler."""
+    global _binary_handler
+    _binary_handler = handler
+
+
+def get_binary_handler() -> BinaryHandler | None:
+    return _binary_handler
+
+
+def offload(fn: Callable[..., Any], *args: Any) -> Awaitable[Any]:
+    """Run fn(*args) in the inbound thread pool (for heavy work on large payloads)."""
+    return asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+
+
+class SampledLog:
+    """Rate-limited logging: at most `rate` lines per second per category."""
+
+    def __init__(self, log: logging.Logger, rate: float = LOG_RATE) -> None:
+        self._log = log
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at: dict[str, float] = {}
+        self._suppressed: dict[str, int] = {}
+
+    def log(self, level: int, category: str, msg: str, *args: Any) -> None:
+        if not self._log.isEnabledFor(level):
+            return
+        now = monotonic()
+        if now < self._next_at.get(category, 0.0):
+            self._suppressed[category] = self._suppressed.get(category, 0) + 1
+            return
+        self._next_at[category] = now + self._interval
+        suppressed = self._suppressed.pop(category, 0)
+        if suppressed:
+            msg += " (%d similar suppressed)"
+            args = (*args, suppressed)
+        self._log.log(level, msg, *args)
+
+
+def preview(text: str) -> str:
+    """A payload shortened for logs."""
+    return text[:_PREVIEW_CHARS] + "..." if len(text) > _PREVIEW_CHARS else text
@@ -0,0 +1,286 @@
+"""
+LLM client registry shared by the graph nodes and the streaming runner.
+
+One chat model per model/config key, all backed by pooled keep-alive HTTP clients so a
+turn reuses warm connections instead of redoing TCP/TLS setup. warm_up() opens those
+connections at server start.
+
+BMO_LLM_BACKEND=fake swaps in FakeStreamingChatModel: a local stand-in that streams the
+reply token by token with configurable delay and jitter (no network, no API key).
+BMO_LLM_BACKEND=replay swaps in ReplayChatModel, which streams the tokens recorded for the
+same input in a trace file (see trace.py) with their recorded timing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator
+
+import httpx
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from bmo_brain.config import (
+    FAKE_FIRST_TOKEN_MS,
+    FAKE_REPLY,
+    FAKE_TOKEN_DELAY_MS,
+    FAKE_TOKEN_JITTER_MS,
+    LLM_BACKEND,
+    LLM_KEEPALIVE_EXPIRY_S,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_REQUEST_TIMEOUT_S,
+    OPENAI_BASE_URL,
+    OPENAI_FALLBACK_MODELS,
+    OPENAI_MODEL,
+    REPLAY_SPEED,
+    TRACE_REPLAY_PATH,
+    use_llm,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Roughly token-sized pieces: optional leading whitespace + up to 4 visible chars
+_FAKE_TOKEN_RE = re.compile(r"\s*\S{1,4}")
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatOpenAI. Replies with `reply` (or echoes the last human
+    message) split into token-sized pieces, sleeping first_token_ms before the first
+    piece and token_delay_ms +/- jitter_ms between pieces.
+    """
+
+    reply: str | None = None
+    first_token_ms: float = 300.0
+    token_delay_ms: float = 30.0
+    jitter_ms: float = 15.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "bmo-fake-streaming"
+
+    def _reply_for(self, messages: list[BaseMessage]) -> str:
+        if self.reply is not None:
+            return self.reply
+        for msg in reversed(messages):
+            if isinstance(msg, HumanMessage):
+                return str(msg.content)
+        return ""
+
+    def _delays(self, count: int) -> Iterator[float]:
+        """Seconds to wait before each token."""
+        for i in range(count):
+            base = self.first_token_ms if i == 0 else self.token_delay_ms
+            yield max(0.0, base + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = self._reply_for(messages)
+        time.sleep(sum(self._delays(len(_FAKE_TOKEN_RE.findall(text)))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = _FAKE_TOKEN_RE.findall(self._reply_for(messages))
+        for token, delay in zip(tokens, self._delays(len(tokens))):
+            time.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = _FAKE_TOKEN_RE.findall(self._reply_for(messages))
+        for token, delay in zip(tokens, self._delays(len(tokens))):
+            await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Streams the tokens recorded for the last human message in the trace at `path`, with
+    the recorded delays divided by `speed` (0 = no delays). Unknown inputs are echoed.
+    """
+
+    path: str
+    speed: float = 1.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "bmo-replay"
+
+    def _tokens_for(self, messages: list[BaseMessage]) -> list[tuple[float, str]]:
+        """(seconds to wait, text) per recorded token."""
+        from bmo_brain.trace import get_replay_index
+
+        text = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        recorded = get_replay_index(self.path).take(text)
+        if recorded is None:
+            logger.warning("No recorded reply for input %r; echoing it", text[:60])
+            return [(0.0, text)]
+        out, previous = [], 0.0
+        for at_ms, token in recorded:
+            out.append(((at_ms - previous) / 1000.0 / self.speed if self.speed > 0 else 0.0, token))
+            previous = at_ms
+        return out
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens_for(messages)
+        time.sleep(sum(delay for delay, _ in tokens))
+        text = "".join(token for _, token in tokens)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for delay, token in self._tokens_for(messages):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+# Shared keep-alive pools (one sync for graph nodes, one async for the streaming runner)
+_http_client: httpx.Client | None = None
+_http_async_client: httpx.AsyncClient | None = None
+_models: dict[tuple, BaseChatModel] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_S,
+    )
+
+
+def _get_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    global _http_client, _http_async_client
+    if _http_client is None:
+        _http_client = httpx.Client(limits=_limits())
+    if _http_async_client is None:
+        _http_async_client = httpx.AsyncClient(limits=_limits())
+    return _http_client, _http_async_client
+
+
+def _build(backend: str, model: str) -> BaseChatModel:
+    if backend == "fake":
+        return FakeStreamingChatModel(
+            reply=FAKE_REPLY,
+            first_token_ms=FAKE_FIRST_TOKEN_MS,
+            token_delay_ms=FAKE_TOKEN_DELAY_MS,
+            jitter_ms=FAKE_TOKEN_JITTER_MS,
+        )
+    if backend == "replay":
+        if not TRACE_REPLAY_PATH:
+            raise RuntimeError("BMO_LLM_BACKEND=replay needs BMO_TRACE_REPLAY")
+        return ReplayChatModel(path=TRACE_REPLAY_PATH, speed=REPLAY_SPEED)
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = _get_http_clients()
+    return ChatOpenAI(
+        model=model,
+        base_url=OPENAI_BASE_URL,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        # resilient_stream() owns retries and deadlines; SDK retries would run under them
+        max_retries=0,
+        timeout=LLM_REQUEST_TIMEOUT_S,
+    )  # api_key from env OPENAI_API_KEY
+
+
+def get_chat_model(model: str | None = None, *, backend: str | None = None) -> BaseChatModel:
+    """Return the shared chat model for (backend, model, base_url), creating it once."""
+    backend = backend or LLM_BACKEND
+    model = model or OPENAI_MODEL
+    key = (backend, model, OPENAI_BASE_URL)
+    llm = _models.get(key)
+    if llm is None:
+        llm = _models[key] = _build(backend, model)
+    return llm
+
+
+async def warm_up() -> None:
+    """
+    Create the default client and open pooled connections to the API host, so the first
+    turn does not pay for DNS/TCP/TLS. Does nothing in echo mode (no backend configured).
+    Failures are logged, never raised.
+    """
+    if not use_llm():
+        return
+    try:
+        get_chat_model()
+        # Hedges and fallbacks must not pay for building their client mid-turn
+        for model in OPENAI_FALLBACK_MODELS:
+            get_chat_model(model)
+    except Exception as e:
+        logger.warning("LLM client warm-up failed: %s", e)
+        return
+    if LLM_BACKEND in ("fake", "replay"):
+        return
+    from bmo_brain.config import OPENAI_API_KEY
+
+    http_client, http_async_client = _get_http_clients()
+    url = (OPENAI_BASE_URL or DEFAULT_OPENAI_BASE_URL).rstrip("/") + "/models"
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"} if OPENAI_API_KEY else {}
+    start = time.perf_counter()
+    try:
+        await http_async_client.get(url, headers=headers)
+        await asyncio.to_thread(http_client.get, url, headers=headers)
+    except Exception as e:
+        logger.warning("LLM connection warm-up failed: %s", e)
+        return
+    logger.info("LLM connections warmed in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+async def aclose() -> None:
+    """Close pooled HTTP connections (server shutdown)."""
+    global _http_client, _http_async_client
+    _models.clear()
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+        _http_async_client = None
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
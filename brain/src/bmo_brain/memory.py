@@ -0,0 +1,388 @@
+"""
+Conversation memory: bounded, token-budgeted history per session.
+
+Each session keeps its recent turns in a ring buffer (deque) with a token count per turn.
+When the history exceeds the token budget, the oldest exchanges are folded into a rolling
+summary, so the prompt sent to the model stays bounded however long the conversation is.
+Token counts are estimated (about 4 chars per token); no tokenizer is loaded.
+
+Summaries are extractive by default (first sentence of each folded turn, no extra model
+call); with BMO_MEMORY_SUMMARIZER=llm the chat model rewrites the summary instead.
+Only the most recently used conversations stay in memory. With BMO_MEMORY_DB set, the
+conversations of faces that supplied a stable session key are persisted to SQLite and
+reloaded when that key comes back (after a reconnect or restart); those unused for
+BMO_MEMORY_TTL_DAYS are pruned.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Literal
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from bmo_brain.config import (
+    MEMORY_DB,
+    MEMORY_ENABLED,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_MAX_TURNS,
+    MEMORY_SUMMARIZER,
+    MEMORY_SUMMARY_TOKENS,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_TTL_DAYS,
+)
+
+logger = logging.getLogger(__name__)
+
+Role = Literal["user", "assistant"]
+
+_SENTENCE_RE = re.compile(r"^.*?[.!?](?=\s|$)|^.+$", re.S)
+_SPEAKER_RE = re.compile(r"(?:User|BMO): ")
+_SUMMARY_PREFIX = "Summary of the conversation so far: "
+# Seconds between prunes of expired conversations (also done when the store opens)
+_PRUNE_INTERVAL_S = 3600.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 chars per token)."""
+    return (len(text) + 3) // 4
+
+
+@dataclass(frozen=True)
+class Turn:
+    role: Role
+    text: str
+    tokens: int
+
+
+Summarizer = Callable[[str, list[Turn], int], Awaitable[str]]
+
+
+def _first_sentence(text: str) -> str:
+    match = _SENTENCE_RE.match(text.strip())
+    return match.group(0).strip() if match else ""
+
+
+async def extractive_summary(previous: str, turns: list[Turn], max_tokens: int) -> str:
+    """Append the first sentence of each folded turn; drop the oldest text past max_tokens."""
+    parts = [previous] if previous else []
+    for turn in turns:
+        speaker = "User" if turn.role == "user" else "BMO"
+        parts.append(f"{speaker}: {_first_sentence(turn.text)}")
+    summary = " ".join(parts)
+    max_chars = max_tokens * 4
+    if len(summary) > max_chars:
+        # Drop whole turns from the front when possible, else cut at a word
+        start = len(summary) - max_chars
+        speaker = _SPEAKER_RE.search(summary, start)
+        if speaker is not None:
+            start = speaker.start()
+        elif (space := summary.find(" ", start)) != -1:
+            start = space + 1
+        summary = summary[start:]
+    return summary
+
+
+async def llm_summary(previous: str, turns: list[Turn], max_tokens: int) -> str:
+    """Ask the chat model to fold the turns into the running summary."""
+    from bmo_brain.llm import get_chat_model
+
+    transcript = "\n".join(f"{'User' if t.role == 'user' else 'BMO'}: {t.text}" for t in turns)
+    prompt = (
+        f"Summarize this conversation between a user and BMO in under {max_tokens * 3} characters, "
+        "in the language of the conversation, keeping the user's names, facts and preferences.\n\n"
+        f"Previous summary: {previous or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    try:
+        reply = await get_chat_model().ainvoke([HumanMessage(content=prompt)])
+    except Exception as e:
+        logger.warning("LLM summary failed (%s); falling back to extractive summary", e)
+        return await extractive_summary(previous, turns, max_tokens)
+    return str(reply.content).strip()
+
+
+SUMMARIZERS: dict[str, Summarizer] = {"extractive": extractive_summary, "llm": llm_summary}
+
+
+class _SqliteStore:
+    """Persistent turns and summaries; all calls are blocking and run in a worker thread."""
+
+    def __init__(self, path: str, ttl_s: float = 0.0) -> None:
+        self._lock = threading.Lock()
+        self._ttl_s = ttl_s
+        self._pruned_at = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS conversation_turns ("
+            " session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL,"
+            " text TEXT NOT NULL, tokens INTEGER NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (session_id, seq));"
+            "CREATE TABLE IF NOT EXISTS conversation_summary ("
+            " session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, tokens INTEGER NOT NULL,"
+            " next_seq INTEGER NOT NULL, updated_at REAL NOT NULL);"
+        )
+        self._conn.commit()
+        self.pruned = 0
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete conversations not written to for ttl_s; return how many were deleted."""
+        now = time.time()
+        self._pruned_at = now
+        if self._ttl_s <= 0:
+            return 0
+        with self._lock:
+            stale = self._conn.execute(
+                "SELECT session_id FROM ("
+                " SELECT session_id, MAX(created_at) AS at FROM conversation_turns GROUP BY session_id"
+                " UNION ALL SELECT session_id, updated_at FROM conversation_summary"
+                ") GROUP BY session_id HAVING MAX(at) < ?",
+                (now - self._ttl_s,),
+            ).fetchall()
+            self._conn.executemany("DELETE FROM conversation_turns WHERE session_id = ?", stale)
+            self._conn.executemany("DELETE FROM conversation_summary WHERE session_id = ?", stale)
+            self._conn.commit()
+        self.pruned += len(stale)
+        if stale:
+            logger.info("Pruned %d conversation(s) unused for %.0f days", len(stale), self._ttl_s / 86400)
+        return len(stale)
+
+    def load(self, session_id: str) -> tuple[str, int, list[tuple[int, Turn]]]:
+        """Return (summary, first unsummarized seq, turns in order)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, next_seq FROM conversation_summary WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT seq, role, text, tokens FROM conversation_turns WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        summary, start = row if row else ("", 0)
+        return summary, start, [(seq, Turn(role, text, tokens)) for seq, role, text, tokens in rows]
+
+    def append(self, session_id: str, turns: list[tuple[int, Turn]]) -> None:
+        now = time.time()
+        if now - self._pruned_at >= _PRUNE_INTERVAL_S:
+            self.prune()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO conversation_turns"
+                " (session_id, seq, role, text, tokens, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(session_id, seq, t.role, t.text, t.tokens, now) for seq, t in turns],
+            )
+            self._conn.commit()
+
+    def fold(self, session_id: str, summary: str, tokens: int, next_seq: int) -> None:
+        """Store the new summary and drop the turns it replaces."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversation_summary"
+                " (session_id, summary, tokens, next_seq, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, summary, tokens, next_seq, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM conversation_turns WHERE session_id = ? AND seq < ?", (session_id, next_seq)
+            )
+            self._conn.commit()
+
+
+class Conversation:
+    """History of one session: rolling summary + recent turns within a token budget."""
+
+    def __init__(self, session_id: str, store: "ConversationStore", *, persist: bool = False) -> None:
+        self.session_id = session_id
+        self._store = store
+        # Written to the store's SQLite tier (session_id is a stable key the face supplied)
+        self.persist = persist
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turns: deque[Turn] = deque()
+        self.turn_tokens = 0
+        # Sequence number of turns[0] (persistence order)
+        self._first_seq = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def tokens(self) -> int:
+        """Estimated prompt tokens of the history (summary + turns)."""
+        return self.summary_tokens + self.turn_tokens
+
+    @property
+    def empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def messages(self) -> list[BaseMessage]:
+        """History as chat messages, to be followed by the new user message."""
+        out: list[BaseMessage] = []
+        if self.summary:
+            out.append(SystemMessage(content=_SUMMARY_PREFIX + self.summary))
+        for turn in self.turns:
+            cls = HumanMessage if turn.role == "user" else AIMessage
+            out.append(cls(content=turn.text))
+        return out
+
+    def _push(self, turn: Turn) -> None:
+        self.turns.append(turn)
+        self.turn_tokens += turn.tokens
+
+    def _pop(self) -> Turn:
+        turn = self.turns.popleft()
+        self.turn_tokens -= turn.tokens
+        self._first_seq += 1
+        return turn
+
+    async def record(self, user_text: str, reply_text: str) -> None:
+        """Append a completed exchange, then fold old turns while over budget."""
+        async with self._lock:
+            new = [Turn("user", user_text, estimate_tokens(user_text))]
+            if reply_text:
+                new.append(Turn("assistant", reply_text, estimate_tokens(reply_text)))
+            seq = self._first_seq + len(self.turns)
+            for turn in new:
+                self._push(turn)
+            if self.persist:
+                await self._store._persist_append(self.session_id, list(enumerate(new, seq)))
+            await self._enforce_budget()
+
+    async def _enforce_budget(self) -> None:
+        store = self._store
+        folded: list[Turn] = []
+        # Keep the latest exchange verbatim; fold whole exchanges from the front
+        while len(self.turns) > 2 and (self.tokens > store.token_budget or len(self.turns) > store.max_turns):
+            folded.append(self._pop())
+            if self.turns and self.turns[0].role == "assistant":
+                folded.append(self._pop())
+        if not folded:
+            return
+        self.summary = await store.summarizer(self.summary, folded, store.summary_tokens)
+        self.summary_tokens = estimate_tokens(self.summary)
+        store.turns_folded += len(folded)
+        if self.persist:
+            await store._persist_fold(self.session_id, self.summary, self.summary_tokens, self._first_seq)
+
+
+class ConversationStore:
+    """Per-session conversations: LRU in memory, optionally persisted to SQLite."""
+
+    def __init__(
+        self,
+        *,
+        token_budget: int,
+        max_turns: int,
+        summary_tokens: int,
+        max_sessions: int,
+        summarizer: Summarizer = extractive_summary,
+        db_path: str | None = None,
+        ttl_days: float = 0.0,
+    ) -> None:
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.max_sessions = max_sessions
+        self.summarizer = summarizer
+        self._conversations: OrderedDict[str, Conversation] = OrderedDict()
+        self._disk = _SqliteStore(db_path, ttl_days * 86400) if db_path else None
+        self.loads = 0
+        self.evictions = 0
+        self.turns_folded = 0
+
+    async def get(self, session_id: str, *, persist: bool = False) -> Conversation:
+        """
+        Return the session's conversation. With persist (session_id is a stable key), it is
+        written to SQLite and reloaded from there when it is not in memory.
+        """
+        conv = self._conversations.get(session_id)
+        if conv is not None:
+            self._conversations.move_to_end(session_id)
+            return conv
+        conv = Conversation(session_id, self, persist=persist and self._disk is not None)
+        if conv.persist:
+            try:
+                summary, first_seq, turns = await asyncio.to_thread(self._disk.load, session_id)
+            except sqlite3.Error as e:
+                logger.warning("Conversation load failed for %s: %s", session_id[:8], e)
+            else:
+                conv.summary, conv.summary_tokens = summary, estimate_tokens(summary)
+                conv._first_seq = turns[0][0] if turns else first_seq
+                for _, turn in turns:
+                    conv._push(turn)
+                if not conv.empty:
+                    self.loads += 1
+        self._conversations[session_id] = conv
+        while len(self._conversations) > self.max_sessions:
+            self._conversations.popitem(last=False)
+            self.evictions += 1
+        return conv
+
+    async def _persist_append(self, session_id: str, turns: list[tuple[int, Turn]]) -> None:
+        if self._disk is None:
+            return
+        try:
+            await asyncio.to_thread(self._disk.append, session_id, turns)
+        except sqlite3.Error as e:
+            logger.warning("Conversation write failed: %s", e)
+
+    async def _persist_fold(self, session_id: str, summary: str, tokens: int, next_seq: int) -> None:
+        if self._disk is None:
+            return
+        try:
+            await asyncio.to_thread(self._disk.fold, session_id, summary, tokens, next_seq)
+        except sqlite3.Error as e:
+            logger.warning("Conversation summary write failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._conversations),
+            "tokens": sum(c.tokens for c in self._conversations.values()),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "turns_folded": self.turns_folded,
+            "pruned": self._disk.pruned if self._disk is not None else 0,
+        }
+
+
+_store: ConversationStore | None = None
+
+
+def memory_stats() -> dict | None:
+    """Store counters for metrics, or None when BMO_MEMORY is off (never creates the store)."""
+    if not MEMORY_ENABLED:
+        return None
+    if _store is None:
+        return {"sessions": 0, "tokens": 0, "loads": 0, "evictions": 0, "turns_folded": 0, "pruned": 0}
+    return _store.stats()
+
+
+def history_tokens(session_id: str) -> int:
+    """Estimated prompt tokens of the session's history held in memory (0 when there is none)."""
+    conv = _store._conversations.get(session_id) if _store is not None else None
+    return conv.tokens if conv is not None else 0
+
+
+def get_memory() -> ConversationStore | None:
+    """Return the shared conversation store, or None when BMO_MEMORY is off."""
+    global _store
+    if not MEMORY_ENABLED:
+        return None
+    if _store is None:
+        summarizer = SUMMARIZERS.get(MEMORY_SUMMARIZER)
+        if summarizer is None:
+            logger.warning("Unknown BMO_MEMORY_SUMMARIZER %r; using extractive", MEMORY_SUMMARIZER)
+            summarizer = extractive_summary
+        _store = ConversationStore(
+            token_budget=MEMORY_TOKEN_BUDGET,
+            max_turns=MEMORY_MAX_TURNS,
+            summary_tokens=MEMORY_SUMMARY_TOKENS,
+            max_sessions=MEMORY_MAX_SESSIONS,
+            summarizer=summarizer,
+            db_path=MEMORY_DB,
+            ttl_days=MEMORY_TTL_DAYS,
+        )
+    return _store
@@ -0,0 +1,381 @@
+"""
+In-process metrics: counters, gauges and histograms, served as Prometheus text on /metrics.
+
+Recording is a dict lookup plus a float add (histograms add a bisect over the buckets);
+names, labels and numbers are only formatted when the endpoint is scraped. Components that
+already keep their own counters (scheduler, broadcaster, reply cache, batcher, bus) are
+exported through collectors that read their stats() at scrape time.
+
+The endpoint is off unless BMO_METRICS_PORT is set. In multi-process mode worker i serves
+on BMO_METRICS_PORT + i.
+"""
+
+import asyncio
+import logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (1 ms .. 10 s)
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Id of the turn being run (the message_start id; "" outside a turn), for log correlation
+trace_id: ContextVar[str] = ContextVar("bmo_trace_id", default="")
+
+Sample = tuple[str, dict[str, str], float]
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """Base class: a named family with optional label names and one child per label set."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str):
+        """Return the child for these label values (created once, then reused)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.help)
+
+    def _own_samples(self, labels: dict[str, str]) -> list[Sample]:
+        raise NotImplementedError
+
+    def samples(self) -> list[Sample]:
+        if not self.labelnames:
+            return self._own_samples({})
+        out: list[Sample] = []
+        for values, child in self._children.items():
+            out.extend(child._own_samples(dict(zip(self.labelnames, values))))
+        return out
+
+
+class Counter(_Metric):
+    """Monotonic count (e.g. turns, frames)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _own_samples(self, labels: dict[str, str]) -> list[Sample]:
+        return [(self.name + "_total", labels, self.value)]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. connected faces)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def _own_samples(self, labels: dict[str, str]) -> list[Sample]:
+        return [(self.name, labels, self.value)]
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets (cumulated only when scraped)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus +Inf; counts are per bucket, not cumulative
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.help, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def _own_samples(self, labels: dict[str, str]) -> list[Sample]:
+        out: list[Sample] = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self._counts):
+            cumulative += n
+            out.append((self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+        out.append((self.name + "_count", labels, self.count))
+        out.append((self.name + "_sum", labels, self.sum))
+        return out
+
+
+class Registry:
+    """All metric families of this process plus stats() collectors."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, Callable[[], dict | None]] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, prefix: str, stats: Callable[[], dict | None]) -> None:
+        """Export the numeric values of stats() as gauges named <prefix>_<key> at scrape time."""
+        self._collectors[prefix] = stats
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for prefix, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", prefix, e)
+                continue
+            for key, value in (values or {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+# Turn latency (runner)
+TURNS = REGISTRY.counter("bmo_turns", "Turns run, by reply path", ["path"])
+TURN_SECONDS = REGISTRY.histogram("bmo_turn_seconds", "Turn duration from input to speaking_end")
+TTFT_SECONDS = REGISTRY.histogram("bmo_ttft_seconds", "Time from turn start to the first model token")
+FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    "bmo_first_chunk_seconds", "Time from turn start to the first message_chunk queued for the faces"
+)
+EMOTION_DECISION_SECONDS = REGISTRY.histogram(
+    "bmo_emotion_decision_seconds", "Time from turn start until the reply emotion is decided"
+)
+TURNS_ABORTED = REGISTRY.counter(
+    "bmo_turns_aborted", "Turns cancelled mid-reply (barge-in or disconnect)", ["path"]
+)
+ABORTED_TOKENS = REGISTRY.counter(
+    "bmo_aborted_tokens",
+    "Estimated model tokens of aborted turns: streamed before the abort (wasted) and not generated (saved)",
+    ["kind"],
+)
+UPSTREAM_ATTEMPTS = REGISTRY.counter(
+    "bmo_llm_attempts", "Model stream attempts by outcome (ok, error, first_token_timeout, stalled)", ["outcome"]
+)
+UPSTREAM_RETRIES = REGISTRY.counter("bmo_llm_retries", "Model calls retried before the first token")
+UPSTREAM_HEDGES = REGISTRY.counter("bmo_llm_hedges", "Hedged requests to the next model (started, won)", ["outcome"])
+LATENCY_HIDING = REGISTRY.counter(
+    "bmo_latency_hiding", "Fillers sent for a late first token and idle partial flushes", ["path"]
+)
+EMOTION_DECISIONS = REGISTRY.counter("bmo_emotion_decisions", "Closed emotion decisions, by outcome", ["outcome"])
+
+# Face traffic (server, face_adapter, broadcaster)
+AUDIO_SEGMENTS = REGISTRY.counter(
+    "bmo_audio_segments", "Speech segments sent to speech-to-text, by outcome", ["outcome"]
+)
+STT_SECONDS = REGISTRY.histogram("bmo_stt_seconds", "Speech-to-text time per speech segment")
+TTS_CHUNKS = REGISTRY.counter("bmo_tts_chunks", "Reply chunks sent to speech synthesis, by outcome", ["outcome"])
+TTS_SECONDS = REGISTRY.histogram("bmo_tts_synthesis_seconds", "Speech synthesis time per reply chunk")
+TTS_FIRST_AUDIO_SECONDS = REGISTRY.histogram(
+    "bmo_tts_first_audio_seconds", "Time from turn start to the first audio frame"
+)
+INCOMING = REGISTRY.counter("bmo_incoming_messages", "Messages received from faces, by type", ["type"])
+INCOMING_SECONDS = REGISTRY.histogram("bmo_incoming_handle_seconds", "Time spent handling one face message")
+BROADCASTS = REGISTRY.counter("bmo_broadcast_frames", "Frames handed to broadcast(), by type", ["type"])
+BROADCAST_SECONDS = REGISTRY.histogram(
+    "bmo_broadcast_seconds", "Time to encode and queue one delivery for all local faces (and the bus)"
+)
+SEND_SECONDS = REGISTRY.histogram(
+    "bmo_face_send_seconds", "Per-face time from queueing a frame to ws.send() completing"
+)
+CONNECTED_FACES = REGISTRY.gauge("bmo_connected_faces", "Faces connected to this process")
+
+
+def _channel_totals() -> dict:
+    from bmo_brain.broadcaster import channel_stats
+
+    totals = {"queue_depth": 0, "frames_sent": 0, "frames_dropped": 0, "frames_filtered": 0, "bytes_sent": 0}
+    for stats in channel_stats():
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+
+def _scheduler_stats() -> dict:
+    from bmo_brain.scheduler import get_scheduler
+
+    return get_scheduler().stats()
+
+
+def _reply_cache_stats() -> dict | None:
+    from bmo_brain.reply_cache import cache_stats
+
+    return cache_stats()
+
+
+def _batcher_stats() -> dict | None:
+    from bmo_brain.face_adapter import get_batcher
+
+    batcher = get_batcher()
+    return batcher.stats() if batcher else None
+
+
+def _memory_stats() -> dict | None:
+    from bmo_brain.memory import memory_stats
+
+    return memory_stats()
+
+
+def _admission_stats() -> dict:
+    from bmo_brain.admission import get_admission
+
+    return get_admission().stats()
+
+
+def _llm_stats() -> dict:
+    from bmo_brain.streaming import breaker_stats
+
+    return breaker_stats()
+
+
+def _audio_stats() -> dict | None:
+    from bmo_brain.audio import audio_stats
+    from bmo_brain.config import AUDIO_INGEST
+
+    return audio_stats() if AUDIO_INGEST else None
+
+
+def _tts_stats() -> dict | None:
+    from bmo_brain.tts import speech_enabled, tts_stats
+
+    return tts_stats() if speech_enabled() else None
+
+
+def _resume_stats() -> dict | None:
+    from bmo_brain.resume import enabled, resume_stats
+
+    return resume_stats() if enabled() else None
+
+
+def _bus_stats() -> dict | None:
+    from bmo_brain.bus import get_bus
+
+    client = get_bus()
+    return client.stats() if client else None
+
+
+REGISTRY.add_collector("bmo_faces", _channel_totals)
+REGISTRY.add_collector("bmo_scheduler", _scheduler_stats)
+REGISTRY.add_collector("bmo_reply_cache", _reply_cache_stats)
+REGISTRY.add_collector("bmo_batcher", _batcher_stats)
+REGISTRY.add_collector("bmo_admission", _admission_stats)
+REGISTRY.add_collector("bmo_bus", _bus_stats)
+REGISTRY.add_collector("bmo_llm", _llm_stats)
+REGISTRY.add_collector("bmo_memory", _memory_stats)
+REGISTRY.add_collector("bmo_audio", _audio_stats)
+REGISTRY.add_collector("bmo_tts", _tts_stats)
+REGISTRY.add_collector("bmo_resume", _resume_stats)
+
+
+async def _serve_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Minimal HTTP/1.0 responder: GET /metrics, 404 for anything else."""
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass  # skip headers
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", REGISTRY.render().encode("utf-8")
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (ConnectionError, UnicodeDecodeError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.Server:
+    """Serve REGISTRY on http://host:port/metrics."""
+    server = await asyncio.start_server(_serve_http, host, port)
+    logger.info("Metrics endpoint on http://%s:%d/metrics", host, port)
+    return server
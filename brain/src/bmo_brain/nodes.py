@@ -1,30 +1,57 @@
 """
 Graph nodes: pure state-in, state-out. No I/O to the face (output via pending_face_events).
-Uses OpenAI when OPENAI_API_KEY is set; otherwise echoes input.
+Uses the shared LLM client when a backend is configured; otherwise echoes input.
+
+stream_reply is the async variant: it also pushes each face event through the LangGraph
+stream writer as soon as it is produced (stream_mode="custom"), so a caller can forward
+chunks while the model is still generating. Like the runner's own path, it streams through
+streaming.resilient_stream (deadlines, retries, fallbacks) with the session's history.
 """
 
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
+import logging
+import uuid
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langgraph.config import get_stream_writer
 
-from bmo_brain.config import OPENAI_MODEL, use_openai
+from bmo_brain.chunker import Chunker
+from bmo_brain.config import use_llm
+from bmo_brain.face_contract import normalize_face_preset
+from bmo_brain.llm import get_chat_model
 from bmo_brain.protocol import (
     EyeExpression,
+    emotion as build_emotion,
     message as build_message,
+    message_chunk as build_message_chunk,
+    message_end as build_message_end,
+    message_start as build_message_start,
     speaking_end as build_speaking_end,
     state as build_state,
     to_json_dict,
 )
 from bmo_brain.state import State
+from bmo_brain.streaming import UpstreamError, resilient_stream
+from bmo_brain.tone import (
+    FALLBACK_TONE_DURATION_MS,
+    FALLBACK_TONE_EXPRESSION,
+    RESPONSE_TONE_DURATION_MS,
+    ToneTracker,
+)
 
-# Primary expression while BMO answers.
-RESPONSE_TONE_DURATION_MS = 2_000
+logger = logging.getLogger(__name__)
 
 
-def _reply_text(user_text: str) -> str:
-    """Get reply text: from OpenAI if OPENAI_API_KEY is set, else echo."""
-    if use_openai():
-        llm = ChatOpenAI(model=OPENAI_MODEL)  # api_key from env OPENAI_API_KEY
-        response = llm.invoke([HumanMessage(content=user_text)])
+def _messages(state: State) -> list[BaseMessage]:
+    """The session's history followed by the new input."""
+    return [*state.get("history", []), HumanMessage(content=state.get("last_input") or "")]
+
+
+def _reply_text(state: State) -> str:
+    """Get reply text: from the shared LLM client if configured, else echo."""
+    user_text = state.get("last_input") or ""
+    if use_llm():
+        llm = get_chat_model()
+        response = llm.invoke(_messages(state))
         return (response.content or "").strip() if response else user_text
     return user_text
 
@@ -32,32 +59,11 @@ def _reply_text(user_text: str) -> str:
 def infer_response_tone_expression(reply_text: str) -> EyeExpression:
     """
     Infer the main emotion from the assistant reply tone (phase 2).
+    One-shot wrapper over the compiled lexicon; streaming code should feed a ToneTracker.
     """
-    lower = reply_text.lower().strip()
-    if not lower:
-        return "neutral"
-    if any(w in lower for w in ("jaja", "jajaja", "😂", "🤣", "genial", "me encanta", "feliz")):
-        return "happy"
-    if any(w in lower for w in ("lo siento", "perdón", "lament", "triste")):
-        return "sad"
-    if any(w in lower for w in ("ojo", "cuidado", "error", "no deberías", "no deberia")):
-        return "angry"
-    if any(
-        w in lower
-        for w in (
-            "wow",
-            "sorprendente",
-            "increíble",
-            "increible",
-            "no puede ser",
-            "qué loco",
-            "que loco",
-        )
-    ):
-        return "surprised"
-    if "?" in lower:
-        return "thinking"
-    return "neutral"
+    tracker = ToneTracker()
+    tracker.feed(reply_text)
+    return tracker.expression()
 
 
 def process_input(state: State) -> dict:
@@ -65,17 +71,100 @@ def process_input(state: State) -> dict:
     Heavy node: LLM (or echo), then enqueue thinking, message, speaking_end.
     Response tone is inferred from reply text only.
     """
-    user_text = state.get("last_input") or ""
-    reply = _reply_text(user_text)
+    reply = _reply_text(state)
     response_tone = infer_response_tone_expression(reply)
     events = [
         to_json_dict(build_state("thinking")),
         to_json_dict(build_message(reply)),
         to_json_dict(build_speaking_end()),
     ]
+    write = get_stream_writer()
+    for event in events:
+        write(event)
     return {
         "current_phase": "thinking",
         "last_reply": reply,
         "response_tone_expression": response_tone,
         "pending_face_events": events,
     }
+
+
+async def stream_reply(state: State) -> dict:
+    """
+    Async streaming node: stream the reply and push face events as they are produced.
+    Emits the response tone as soon as it is clear (unless the face already shows it);
+    falls back to thinking at the end. If the model fails before any text, the face shows
+    the error expression and last_reply is empty.
+    """
+    write = get_stream_writer()
+    events: list[dict] = []
+
+    def emit(event: dict) -> None:
+        events.append(event)
+        write(event)
+
+    user_text = state.get("last_input") or ""
+    emit(to_json_dict(build_state("thinking")))
+    emit(to_json_dict(build_state("speaking")))
+    tone = ToneTracker()
+    tone_emitted = False
+    response_id: str | None = None
+    showing = state.get("last_emotion")
+
+    def shown(expression: str) -> bool:
+        # last_emotion is a canonical preset key; tones are expression names
+        return showing is not None and (normalize_face_preset(expression) or expression) == showing
+
+    def emit_tone_if_clear() -> None:
+        nonlocal tone_emitted
+        expression = tone.expression()
+        if not tone_emitted and expression not in {"neutral", "thinking"}:
+            if not shown(expression):
+                emit(to_json_dict(build_emotion(expression, RESPONSE_TONE_DURATION_MS)))
+            tone_emitted = True
+
+    if use_llm():
+        response_id = str(uuid.uuid4())
+        emit(to_json_dict(build_message_start(response_id)))
+        chunks: list[str] = []
+        chunker = Chunker()
+        try:
+            async for chunk in resilient_stream(_messages(state)):
+                part = (chunk.content or "") if hasattr(chunk, "content") else str(chunk)
+                tone.feed(part)
+                for text in chunker.feed(part):
+                    emit_tone_if_clear()
+                    emit(to_json_dict(build_message_chunk(response_id, len(chunks), text)))
+                    chunks.append(text)
+        except UpstreamError as e:
+            logger.warning("Model stream failed (%s); ending the reply with what was streamed", e)
+            failed = True
+        else:
+            failed = False
+        rest = chunker.flush()
+        if rest:
+            emit(to_json_dict(build_message_chunk(response_id, len(chunks), rest)))
+            chunks.append(rest)
+        if failed and not chunks:
+            # Nothing to say: show the error expression, keep the exchange out of memory
+            emit(to_json_dict(build_emotion("error", FALLBACK_TONE_DURATION_MS)))
+            tone_emitted = True
+        reply = "".join(chunks)
+    else:
+        reply = user_text
+        tone.feed(reply)
+
+    emit_tone_if_clear()
+    if not tone_emitted and not shown(FALLBACK_TONE_EXPRESSION):
+        emit(to_json_dict(build_emotion(FALLBACK_TONE_EXPRESSION, FALLBACK_TONE_DURATION_MS)))
+    if response_id is not None:
+        emit(to_json_dict(build_message_end(response_id)))
+    else:
+        emit(to_json_dict(build_message(reply)))
+    emit(to_json_dict(build_speaking_end()))
+    return {
+        "current_phase": "speaking",
+        "last_reply": reply,
+        "response_tone_expression": tone.expression(),
+        "pending_face_events": events,
+    }
@@ -7,10 +7,7 @@ Messages match the contract in face/src/services/socket.ts (BrainMessage).
 import logging
 from typing import Literal, TypedDict
 
-from bmo_brain.face_contract import (
-    FACE_CONTRACT_VERSION,
-    normalize_face_preset,
-)
+from bmo_brain.face_contract import get_contract
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +61,27 @@ class SpeakingEndPayload(TypedDict):
 class ContractInfoPayload(TypedDict):
     type: Literal["contract_info"]
     version: str
+    encodings: list[str]  # wire encodings the face may pick with "hello"
+    features: list[str]  # optional features the face may enable with "hello" (e.g. "batch")
+
+
+class BatchPayload(TypedDict):
+    type: Literal["batch"]
+    frames: list[dict]  # ordered payloads, applied by the face one by one
+
+
+class BusyPayload(TypedDict):
+    type: Literal["busy"]
+    reason: str
+    retry_after_ms: int
+
+
+class ResumePayload(TypedDict):
+    type: Literal["resume"]
+    token: str
+    seq: int  # sequence number of the frame before the next one the face receives
+    replayed: int  # frames re-sent right after this one
+    complete: bool  # False: frames after the face's resume_from were lost (redraw from scratch)
 
 
 class EmotionPayload(TypedDict, total=False):
@@ -102,9 +120,33 @@ def speaking_end() -> SpeakingEndPayload:
     return {"type": "speaking_end"}
 
 
-def contract_info(version: str) -> ContractInfoPayload:
-    """Build contract_info payload (shared contract version)."""
-    return {"type": "contract_info", "version": version}
+def contract_info(
+    version: str,
+    encodings: list[str] | None = None,
+    features: list[str] | None = None,
+) -> ContractInfoPayload:
+    """Build contract_info payload (shared contract version + wire encodings/features)."""
+    return {
+        "type": "contract_info",
+        "version": version,
+        "encodings": list(encodings or ["json"]),
+        "features": list(features or []),
+    }
+
+
+def batch(frames: list[dict]) -> BatchPayload:
+    """Build a batch payload: several frames coalesced into one WebSocket message."""
+    return {"type": "batch", "frames": frames}
+
+
+def busy(reason: str, retry_after_ms: int) -> BusyPayload:
+    """Build busy payload (the face's input was not admitted; retry after retry_after_ms)."""
+    return {"type": "busy", "reason": reason, "retry_after_ms": retry_after_ms}
+
+
+def resume(token: str, seq: int, replayed: int, complete: bool) -> ResumePayload:
+    """Build resume payload (answer to a hello with a resume token; not itself numbered)."""
+    return {"type": "resume", "token": token, "seq": seq, "replayed": replayed, "complete": complete}
 
 
 def emotion(value: str, duration_ms: int | None = None) -> EmotionPayload:
@@ -113,12 +155,13 @@ def emotion(value: str, duration_ms: int | None = None) -> EmotionPayload:
 
     If value matches shared face contract aliases, emit canonical preset key.
     """
-    canonical = normalize_face_preset(value)
+    contract = get_contract()
+    canonical = contract.normalize(value)
     if canonical is None:
         logger.warning(
             "Emotion value '%s' not present in face contract v%s; sending raw value",
             value,
-            FACE_CONTRACT_VERSION,
+            contract.version,
         )
     payload: EmotionPayload = {"type": "emotion", "value": canonical or value}
     if duration_ms is not None:
@@ -134,7 +177,10 @@ def to_json_dict(
     | StatePayload
     | SpeakingEndPayload
     | ContractInfoPayload
-    | EmotionPayload,
+    | EmotionPayload
+    | BusyPayload
+    | ResumePayload
+    | BatchPayload,
 ) -> dict:
     """Return the payload as a dict ready for json.dumps (same shape the face expects)."""
     return dict(payload)
@@ -0,0 +1,174 @@
+"""
+Reply cache for repeated face inputs ("hola", "¿cómo estás?").
+
+Keys are normalized input text + model + prompt version, so "¿Cómo estás?" and
+"como estas" share an entry. Entries are the chunk sequence sent to the face, so a hit
+can be replayed through message_start/message_chunk/message_end without calling the LLM.
+In-memory tier is LRU with TTL; an optional SQLite file adds a persistent second tier.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from bmo_brain.config import (
+    PROMPT_VERSION,
+    REPLY_CACHE_DB,
+    REPLY_CACHE_ENABLED,
+    REPLY_CACHE_SIZE,
+    REPLY_CACHE_TTL_S,
+)
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def normalize_text(text: str) -> str:
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD_RE.sub(" ", stripped).strip()
+
+
+class _SqliteTier:
+    """Persistent second tier; all calls are blocking and run in a worker thread."""
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reply_cache ("
+            " key TEXT PRIMARY KEY, chunks TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, min_created_at: float) -> tuple[list[str], float] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks, created_at FROM reply_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < min_created_at:
+                self._conn.execute("DELETE FROM reply_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, chunks: list[str], created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reply_cache (key, chunks, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(chunks, ensure_ascii=False), created_at),
+            )
+            self._conn.commit()
+
+
+class ReplyCache:
+    """LRU + TTL cache of reply chunk sequences, with an optional SQLite tier."""
+
+    def __init__(self, *, maxsize: int, ttl_s: float, db_path: str | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[list[str], float]] = OrderedDict()
+        self._disk = _SqliteTier(db_path) if db_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user_text: str, model: str) -> str | None:
+        """Cache key, or None when the input normalizes to nothing."""
+        norm = normalize_text(user_text)
+        if not norm:
+            return None
+        return f"{PROMPT_VERSION}\x1f{model}\x1f{norm}"
+
+    def _remember(self, key: str, chunks: list[str], created_at: float) -> None:
+        self._entries[key] = (chunks, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_text: str, model: str) -> list[str] | None:
+        """Return the cached chunks for this input, or None on miss/expiry."""
+        key = self.key(user_text, model)
+        if key is None:
+            return None
+        min_created_at = time.time() - self.ttl_s
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] >= min_created_at:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            del self._entries[key]
+        if self._disk is not None:
+            try:
+                found = await asyncio.to_thread(self._disk.get, key, min_created_at)
+            except sqlite3.Error as e:
+                # A locked or corrupt cache must not fail the turn: treat it as a miss
+                logger.warning("Reply cache disk read failed: %s", e)
+                found = None
+            if found is not None:
+                self._remember(key, *found)
+                self.disk_hits += 1
+                return found[0]
+        self.misses += 1
+        return None
+
+    async def put(self, user_text: str, model: str, chunks: list[str]) -> None:
+        """Store the chunk sequence of a completed reply."""
+        key = self.key(user_text, model)
+        if key is None or not chunks:
+            return
+        created_at = time.time()
+        self._remember(key, list(chunks), created_at)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.put, key, list(chunks), created_at)
+            except sqlite3.Error as e:
+                logger.warning("Reply cache disk write failed: %s", e)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and hit rate."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+_cache: ReplyCache | None = None
+
+
+def get_reply_cache() -> ReplyCache | None:
+    """Return the shared cache, or None when BMO_REPLY_CACHE is off."""
+    global _cache
+    if not REPLY_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ReplyCache(maxsize=REPLY_CACHE_SIZE, ttl_s=REPLY_CACHE_TTL_S, db_path=REPLY_CACHE_DB)
+    return _cache
+
+
+def cache_stats() -> dict | None:
+    """Cache counters for metrics, or None when BMO_REPLY_CACHE is off (never creates the cache)."""
+    if not REPLY_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        return {"entries": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "hit_rate": 0.0}
+    return _cache.stats()
@@ -0,0 +1,148 @@
+"""
+Resumable face sessions: a face that drops off (flaky Wi-Fi) reconnects where it left off.
+
+A face enables resume with a token of its own in its hello ({"resume": "<token>"}). The
+brain answers with a resume frame, and from then on numbers the frames it queues for
+the face: the face counts every WebSocket message after the resume frame, starting at
+its `seq` + 1. The last BMO_RESUME_BUFFER frames are kept in the channel's ReplayRing.
+
+When the connection drops (closed without a close frame from the face), the face's
+channel is parked (still routed, still recording) and its turn Session is kept for
+BMO_RESUME_TTL_S: a running turn goes on, and its frames land in the ring. A face that
+closes the connection itself is not parked. A hello with the same token and {"resume_from": <last seq received>}
+takes both over: the new connection gets the parked session (turn queue, rate-limit
+bucket, emotion state, audio ingest) and is sent the frames it missed, right after the
+resume frame, so the reply is not generated again. They are encoded for the new
+connection (its hello may pick another encoding). `complete` is False when some of those
+frames were already evicted from the ring, when nothing was left to resume, or when
+missed batch frames cannot be sent because the new connection did not enable batching;
+the face should then redraw from scratch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import NamedTuple
+
+from bmo_brain.broadcaster import ClientChannel, ReplayRing, join, unregister
+from bmo_brain.config import RESUME_BUFFER, RESUME_TTL_S
+from bmo_brain.protocol import resume as build_resume, to_json_dict
+from bmo_brain.scheduler import Session
+from bmo_brain.wire import BatchFrame, Frame
+
+logger = logging.getLogger(__name__)
+
+# Longest resume token accepted
+MAX_TOKEN_CHARS = 128
+
+
+class _Parked(NamedTuple):
+    ws: object
+    channel: ClientChannel
+    session: Session
+    expiry: asyncio.TimerHandle
+
+
+# Token -> channel of the connected face using it, or what a disconnected one left behind
+_live: dict[str, ClientChannel] = {}
+_parked: dict[str, _Parked] = {}
+_counts = {"resumed": 0, "resumed_incomplete": 0, "expired": 0, "frames_replayed": 0}
+
+
+def enabled() -> bool:
+    return RESUME_BUFFER > 0
+
+
+def attach(token: str, resume_from: int, channel: ClientChannel, session: Session) -> Session:
+    """
+    Enable resume for the face on channel under token. If a disconnected face left a session
+    under that token, take it over and replay what the face missed, in the channel's
+    (already negotiated) encoding. Return the session the connection uses from now on.
+    """
+    if not enabled():
+        return session
+    if not token or len(token) > MAX_TOKEN_CHARS:
+        logger.warning("Ignoring invalid resume token in hello")
+        return session
+    if channel.replay is not None:
+        # A repeated hello (e.g. renegotiating the encoding) keeps the current numbering
+        return session
+    owner = _live.get(token)
+    if owner is not None and owner is not channel:
+        logger.warning("Resume token already used by a connected face; not resuming")
+        return session
+    parked = _parked.pop(token, None)
+    if parked is None:
+        channel.replay = ReplayRing(token, RESUME_BUFFER)
+        frames, complete, seq = [], resume_from == 0, 0
+    else:
+        parked.expiry.cancel()
+        old = parked.channel
+        unregister(parked.ws)
+        join(channel, old.session, old.room, old.subscriptions)
+        channel.replay = old.replay
+        session.close()
+        session = parked.session
+        session.attach(channel.offer)
+        frames, complete = channel.replay.since(resume_from)
+        if not channel.batch and any(isinstance(frame, BatchFrame) for _, frame in frames):
+            # One batch message cannot become several without breaking the face's numbering
+            frames, complete = [], False
+        seq = resume_from if complete else (frames[0][0] - 1 if frames else channel.replay.seq)
+        _counts["resumed"] += 1
+        _counts["frames_replayed"] += len(frames)
+        if not complete:
+            _counts["resumed_incomplete"] += 1
+        logger.info(
+            "Face resumed session %s from seq %d (%d frame(s) replayed%s)",
+            session.id[:8],
+            resume_from,
+            len(frames),
+            "" if complete else ", some lost",
+        )
+    _live[token] = channel
+    channel.offer(Frame(to_json_dict(build_resume(token, seq, len(frames), complete))), record=False)
+    for _, frame in frames:
+        channel.enqueue(*frame.encoded(channel.encoding))
+    return session
+
+
+def park(ws: object, channel: ClientChannel, session: Session, *, dropped: bool = True) -> bool:
+    """
+    Keep a disconnected face's channel and session for BMO_RESUME_TTL_S. Return False when
+    the face did not enable resume, or when the connection was not dropped (the face closed
+    it itself, so it is not coming back); the caller then closes them as usual.
+    """
+    ring = channel.replay
+    if ring is None or _live.get(ring.token) is not channel:
+        return False
+    del _live[ring.token]
+    if not dropped or RESUME_TTL_S <= 0:
+        return False
+    channel.park()
+    expiry = asyncio.get_running_loop().call_later(RESUME_TTL_S, _expire, ring.token)
+    _parked[ring.token] = _Parked(ws, channel, session, expiry)
+    logger.info("Face disconnected; session %s kept %.0fs for resume", session.id[:8], RESUME_TTL_S)
+    return True
+
+
+def _expire(token: str) -> None:
+    parked = _parked.pop(token, None)
+    if parked is None:
+        return
+    parked.session.close()
+    unregister(parked.ws)
+    _counts["expired"] += 1
+    logger.info("Session %s not resumed within %.0fs; closed", parked.session.id[:8], RESUME_TTL_S)
+
+
+def resume_stats() -> dict:
+    """Resume counters (exported as bmo_resume_* gauges)."""
+    return {
+        "live": len(_live),
+        "parked": len(_parked),
+        **_counts,
+        "ring_frames": sum(len(c.replay) for c in _live.values() if c.replay is not None)
+        + sum(len(p.channel.replay) for p in _parked.values() if p.channel.replay is not None),
+    }
@@ -4,127 +4,495 @@ Emotion is decided from reply tone only (single decision source).
 If tone is still unclear by a small timeout, keep recent emotion or fallback to thinking.
 """
 
+import asyncio
+import itertools
+import logging
 import uuid
 from time import monotonic
 
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 
-from bmo_brain.config import OPENAI_MODEL, use_openai
+from bmo_brain.chunker import Chunker
+from bmo_brain.config import (
+    CHUNK_IDLE_FLUSH_MS,
+    FILLER_AFTER_MS,
+    FILLER_MODE,
+    GRAPH_VARIANT,
+    LLM_BACKEND,
+    OPENAI_MODEL,
+    REPLY_CACHE_PACING_MS,
+    use_llm,
+)
+from bmo_brain.face_contract import get_contract
 from bmo_brain.face_adapter import (
     broadcast,
+    send_emotion,
     send_message_chunk,
     send_message_end,
     send_message_start,
 )
-from bmo_brain.nodes import (
-    RESPONSE_TONE_DURATION_MS,
-    infer_response_tone_expression,
+from bmo_brain.memory import Conversation, get_memory
+from bmo_brain.metrics import (
+    ABORTED_TOKENS,
+    EMOTION_DECISION_SECONDS,
+    EMOTION_DECISIONS,
+    FIRST_CHUNK_SECONDS,
+    LATENCY_HIDING,
+    TTFT_SECONDS,
+    TURN_SECONDS,
+    TURNS,
+    TURNS_ABORTED,
+    trace_id,
 )
 from bmo_brain.protocol import (
-    emotion as build_emotion,
+    EyeExpression,
     message as build_message,
     speaking_end as build_speaking_end,
     state as build_state,
     to_json_dict,
 )
+from bmo_brain.reply_cache import get_reply_cache
+from bmo_brain.scheduler import TurnHandle, current_emotion
+from bmo_brain.streaming import END, TIMEOUT, TokenPump, UpstreamError, resilient_stream
+from bmo_brain.tone import (
+    FALLBACK_TONE_DURATION_MS,
+    FALLBACK_TONE_EXPRESSION,
+    RESPONSE_TONE_DURATION_MS,
+    ToneTracker,
+)
+from bmo_brain.trace import current_turn, record_turn
+from bmo_brain.tts import SpeechStream, speech_enabled
+
+logger = logging.getLogger(__name__)
 
-# Chunk boundaries: emit a chunk when we hit one of these (phonetic/sentence sense)
-CHUNK_BOUNDARIES = frozenset(".,;:!?\n")
 EMOTION_DECISION_TIMEOUT_MS = 450
 EMOTION_HOLD_MS = 1_500
 MIN_RESPONSE_CHARS_FOR_TONE = 24
 FALLBACK_EMOTION = "thinking"
+# Filler chunks for a late first token (BMO_FILLER=chunk), used in rotation
+FILLER_CHUNKS = ("Mmm... ", "A ver... ", "Déjame pensar... ", "Hmm, ")
+_fillers = itertools.cycle(FILLER_CHUNKS)
+# Moving average of completed model replies (tokens), to estimate what an abort saves
+_reply_tokens_avg: float | None = None
+
 
-# Memory across turns to avoid unnecessary jumps.
-_last_emotion_value: str | None = None
-_last_emotion_sent_at: float = 0.0
+def _graph_variant(name: str) -> str:
+    """BMO_GRAPH checked against graph.GRAPH_BUILDERS; "" (built-in loop) if unusable."""
+    if not name:
+        return ""
+    from bmo_brain.graph import GRAPH_BUILDERS
+
+    if name not in GRAPH_BUILDERS:
+        logger.warning(
+            "Unknown BMO_GRAPH %r (expected one of %s); using the built-in loop",
+            name,
+            ", ".join(GRAPH_BUILDERS),
+        )
+        return ""
+    if name == "default":
+        # Its process_input node calls llm.invoke, which would block the event loop
+        logger.warning("BMO_GRAPH=default blocks the event loop; using threaded")
+        return "threaded"
+    return name
+
+
+_graph = _graph_variant(GRAPH_VARIANT)
+
+# Memory across turns to avoid unnecessary jumps: the session's EmotionState
+# (scheduler.current_emotion; shared by turns run outside a session). It holds the
+# canonical preset key sent to the face, so tones are normalized before comparing.
 
 
 def _has_recent_emotion(now: float) -> bool:
-    return _last_emotion_value is not None and (now - _last_emotion_sent_at) * 1000 < EMOTION_HOLD_MS
+    state = current_emotion.get()
+    return state.value is not None and (now - state.sent_at) * 1000 < EMOTION_HOLD_MS
+
+
+def _preset(value: str) -> str:
+    """Canonical preset key for an expression (the value itself if the contract lacks it)."""
+    return get_contract().normalize(value) or value
+
+
+def _showing(value: str) -> bool:
+    """True if the session's faces already show this expression."""
+    return current_emotion.get().value == _preset(value)
 
 
 async def _emit_emotion(value: str, duration_ms: int = RESPONSE_TONE_DURATION_MS) -> None:
-    global _last_emotion_value, _last_emotion_sent_at
-    await broadcast(to_json_dict(build_emotion(value, duration_ms=duration_ms)))
-    _last_emotion_value = value
-    _last_emotion_sent_at = monotonic()
+    await send_emotion(value, duration_ms)
+    state = current_emotion.get()
+    state.value = _preset(value)
+    state.sent_at = monotonic()
 
 
 async def _decide_and_maybe_emit_response_emotion(
     *,
-    reply_text: str,
+    tone: EyeExpression,
+    reply_chars: int,
     deadline_reached: bool,
+    turn_started: float | None = None,
 ) -> bool:
     """
     Return True when emotional decision is closed for this turn.
+    tone/reply_chars come from the turn's ToneTracker (fed incrementally).
+    turn_started (monotonic) is used to record the decision latency.
     """
     now = monotonic()
-    tone = infer_response_tone_expression(reply_text)
 
     # Strong tone: emit unless it is already the current emotion.
     if tone not in {"neutral", "thinking"}:
-        if tone != _last_emotion_value:
+        if not _showing(tone):
             await _emit_emotion(tone)
-        return True
-
+        outcome = "tone"
     # Not enough semantic signal yet: keep waiting until timeout.
-    if not deadline_reached and len(reply_text) < MIN_RESPONSE_CHARS_FOR_TONE:
+    elif not deadline_reached and reply_chars < MIN_RESPONSE_CHARS_FOR_TONE:
         return False
-
     # Low-signal after timeout: keep recent expression or fallback to thinking.
-    if _has_recent_emotion(now):
-        return True
-    if _last_emotion_value != FALLBACK_EMOTION:
-        await _emit_emotion(FALLBACK_EMOTION, duration_ms=1_000)
+    elif _has_recent_emotion(now):
+        outcome = "hold"
+    else:
+        if not _showing(FALLBACK_EMOTION):
+            await _emit_emotion(FALLBACK_EMOTION, duration_ms=1_000)
+        outcome = "fallback"
+    EMOTION_DECISIONS.labels(outcome).inc()
+    if turn_started is not None:
+        EMOTION_DECISION_SECONDS.observe(now - turn_started)
     return True
 
 
-async def run_on_input(user_text: str) -> None:
+async def _send_chunk(turn: TurnHandle, index: int, text: str) -> None:
+    """Send a message_chunk and start synthesizing it when the reply is spoken (BMO_TTS)."""
+    await send_message_chunk(turn.response_id, index, text)
+    if turn.speech is not None:
+        turn.speech.say(index, text)
+
+
+async def _replay_cached(
+    turn: TurnHandle,
+    chunks: list[str],
+    tone: ToneTracker,
+    decision_deadline: float,
+    turn_started: float,
+) -> bool:
+    """
+    Send a cached reply chunk by chunk at REPLY_CACHE_PACING_MS, deciding emotion as the
+    live stream would. Return whether the emotion decision was closed.
+    """
+    emotion_decision_closed = False
+    for chunk_index, text in enumerate(chunks):
+        if chunk_index:
+            await asyncio.sleep(REPLY_CACHE_PACING_MS / 1000.0)
+        tone.feed(text)
+        if not emotion_decision_closed:
+            emotion_decision_closed = await _decide_and_maybe_emit_response_emotion(
+                tone=tone.expression(),
+                reply_chars=tone.chars,
+                deadline_reached=monotonic() >= decision_deadline,
+                turn_started=turn_started,
+            )
+        if not chunk_index:
+            FIRST_CHUNK_SECONDS.observe(monotonic() - turn_started)
+        await _send_chunk(turn, chunk_index, text)
+    return emotion_decision_closed
+
+
+class _ReplyStream:
+    """
+    Streams one model reply to the faces as message_chunk frames.
+
+    Tokens are read through a TokenPump so deadlines fire while the upstream is silent:
+    - BMO_FILLER: if the first token misses FILLER_AFTER_MS, send a filler chunk (or the
+      thinking expression) so the face is not left waiting
+    - BMO_CHUNK_IDLE_FLUSH_MS: flush buffered text when no boundary came for that long
+    Filler chunks take a message_chunk index like any other but are not part of `chunks`
+    (what gets cached and remembered). The call itself goes through resilient_stream
+    (deadlines, retries, hedging); if it still fails, `failed` holds the error and the
+    reply ends with whatever was streamed.
+    """
+
+    def __init__(
+        self,
+        response_id: str,
+        tone: ToneTracker,
+        decision_deadline: float,
+        turn_started: float,
+        turn: TurnHandle,
+    ) -> None:
+        self.response_id = response_id
+        self.turn = turn
+        self.tone = tone
+        self.decision_deadline = decision_deadline
+        self.turn_started = turn_started
+        self.chunks: list[str] = []
+        self.sent = 0
+        self.first_token_at: float | None = None
+        self.emotion_decision_closed = False
+        self.failed: UpstreamError | None = None
+        self.chunker = Chunker()
+        self._filler_at = turn_started + FILLER_AFTER_MS / 1000.0 if FILLER_MODE in ("chunk", "emotion") else None
+        self._idle_flush = CHUNK_IDLE_FLUSH_MS / 1000.0 if CHUNK_IDLE_FLUSH_MS is not None else None
+        self._buffered_since: float | None = None
+
+    async def _send(self, text: str, *, filler: bool = False) -> None:
+        if not filler:
+            if not self.emotion_decision_closed:
+                self.emotion_decision_closed = await _decide_and_maybe_emit_response_emotion(
+                    tone=self.tone.expression(),
+                    reply_chars=self.tone.chars,
+                    deadline_reached=monotonic() >= self.decision_deadline,
+                    turn_started=self.turn_started,
+                )
+            self.chunks.append(text)
+        if not self.sent:
+            FIRST_CHUNK_SECONDS.observe(monotonic() - self.turn_started)
+        await _send_chunk(self.turn, self.sent, text)
+        self.sent += 1
+
+    async def _send_filler(self) -> None:
+        self._filler_at = None
+        if FILLER_MODE == "emotion":
+            LATENCY_HIDING.labels("filler_emotion").inc()
+            if not _showing(FALLBACK_TONE_EXPRESSION):
+                await _emit_emotion(FALLBACK_TONE_EXPRESSION, FALLBACK_TONE_DURATION_MS)
+            return
+        LATENCY_HIDING.labels("filler_chunk").inc()
+        await self._send(next(_fillers), filler=True)
+
+    def _timeout(self, now: float) -> float | None:
+        """Seconds until the next deadline, or None to wait for the stream indefinitely."""
+        deadlines = []
+        if self._filler_at is not None:
+            deadlines.append(self._filler_at)
+        if self._idle_flush is not None and self._buffered_since is not None:
+            deadlines.append(self._buffered_since + self._idle_flush)
+        return min(deadlines) - now if deadlines else None
+
+    async def _on_deadline(self, now: float) -> None:
+        if self._filler_at is not None and now >= self._filler_at:
+            await self._send_filler()
+        if (
+            self._idle_flush is not None
+            and self._buffered_since is not None
+            and now - self._buffered_since >= self._idle_flush
+        ):
+            text = self.chunker.flush_partial()
+            self._buffered_since = now if self.chunker.buffered else None
+            if text:
+                LATENCY_HIDING.labels("idle_flush").inc()
+                await self._send(text)
+
+    async def run(self, messages: list) -> None:
+        """Stream the reply for messages; returns after the last chunk is sent."""
+        trace = current_turn.get()
+        if trace is not None:
+            trace.model_call()
+        pump = TokenPump(resilient_stream(messages))
+        try:
+            while True:
+                item = await pump.get(self._timeout(monotonic()))
+                if item is TIMEOUT:
+                    await self._on_deadline(monotonic())
+                    continue
+                if item is END:
+                    break
+                part = (item.content or "") if hasattr(item, "content") else str(item)
+                if not part:
+                    continue
+                self.turn.streamed_chars += len(part)
+                if trace is not None:
+                    trace.token(part)
+                now = monotonic()
+                if self.first_token_at is None:
+                    self.first_token_at = now
+                    self._filler_at = None
+                    TTFT_SECONDS.observe(now - self.turn_started)
+                self.tone.feed(part)
+                for text in self.chunker.feed(part):
+                    await self._send(text)
+                if not self.chunker.buffered:
+                    self._buffered_since = None
+                elif self._buffered_since is None:
+                    self._buffered_since = now
+        except UpstreamError as e:
+            self.failed = e
+            logger.warning("Turn %s: model call failed after %d chunk(s): %s", self.response_id, self.sent, e)
+        finally:
+            await pump.aclose()
+        rest = self.chunker.flush()
+        if rest:
+            await self._send(rest)
+
+
+async def _run_graph_turn(user_text: str, turn: TurnHandle, conversation: Conversation | None) -> str:
+    """
+    Run the turn through the compiled LangGraph variant with the session's history and
+    current expression, forwarding events as nodes emit them (on this turn's route).
+    Return the reply text ("" when there is nothing to remember).
+    """
+    from bmo_brain.graph import get_compiled_graph
+
+    graph = get_compiled_graph(_graph)
+    emotion = current_emotion.get()
+    state = {
+        "last_input": user_text,
+        "history": conversation.messages() if conversation is not None else [],
+        "last_emotion": emotion.value,
+    }
+    final: dict = {}
+    async for mode, event in graph.astream(state, stream_mode=["custom", "values"]):
+        if mode == "values":
+            final = event
+            continue
+        msg_type = event.get("type")
+        if msg_type == "message_start":
+            # Lets an aborted turn close its reply, and tags the turn's metrics
+            turn.response_id = event["id"]
+            trace_id.set(event["id"])
+        elif msg_type == "emotion":
+            emotion.value, emotion.sent_at = _preset(event["value"]), monotonic()
+        await broadcast(event)
+    return final.get("last_reply") or ""
+
+
+async def _end_aborted_turn(turn: TurnHandle, turn_started: float) -> None:
+    """Close a cancelled turn's reply on the faces and count what the abort saved."""
+    if turn.speech is not None:
+        turn.speech.cancel()
+    if turn.response_id is not None:
+        await send_message_end(turn.response_id)
+    await broadcast(to_json_dict(build_speaking_end()))
+    TURNS_ABORTED.labels(turn.path or "start").inc()
+    wasted = 0
+    if turn.path == "llm":
+        # Same ~4 chars per token estimate as the conversation memory
+        wasted = (turn.streamed_chars + 3) // 4
+        ABORTED_TOKENS.labels("wasted").inc(wasted)
+        if _reply_tokens_avg is not None:
+            ABORTED_TOKENS.labels("saved").inc(max(0, round(_reply_tokens_avg) - wasted))
+    logger.info(
+        "Turn %s aborted after %.0fms (%s, ~%d tokens streamed)",
+        turn.response_id or "-",
+        (monotonic() - turn_started) * 1000,
+        turn.path or "not started",
+        wasted,
+    )
+
+
+async def run_on_input(
+    user_text: str, session_id: str | None = None, turn: TurnHandle | None = None, *, persist: bool = False
+) -> None:
     """
     Send thinking/speaking, stream reply, and decide emotion from response tone only.
     If tone is unclear by timeout, keep recent emotion or fallback to thinking.
+    With session_id, the session's conversation history is sent with the input and the
+    completed exchange is recorded (and persisted to BMO_MEMORY_DB when persist is True,
+    i.e. session_id is a stable key the face supplied). With BMO_GRAPH set, the turn runs through the
+    LangGraph variant instead.
+
+    Cancelling the task running this turn (barge-in) closes the model stream, then sends
+    message_end/speaking_end for the aborted reply before the cancellation propagates.
     """
+    turn = turn or TurnHandle()
+    turn_started = monotonic()
+    with record_turn(user_text):
+        try:
+            await _run_turn(user_text, session_id, turn, turn_started, persist)
+        except asyncio.CancelledError:
+            # Shielded so a second cancel (e.g. the face disconnecting) cannot cut the close short
+            await asyncio.shield(_end_aborted_turn(turn, turn_started))
+            raise
+
+
+async def _run_turn(
+    user_text: str, session_id: str | None, turn: TurnHandle, turn_started: float, persist: bool = False
+) -> None:
+    global _reply_tokens_avg
+    if _graph:
+        turn.path = "graph"
+        TURNS.labels("graph").inc()
+        memory = get_memory() if session_id and use_llm() else None
+        conversation = await memory.get(session_id, persist=persist) if memory else None
+        reply = await _run_graph_turn(user_text, turn, conversation)
+        TURN_SECONDS.observe(monotonic() - turn_started)
+        if conversation is not None and reply:
+            await asyncio.shield(conversation.record(user_text, reply))
+        return
     await broadcast(to_json_dict(build_state("thinking")))
     await broadcast(to_json_dict(build_state("speaking")))
-    decision_deadline = monotonic() + (EMOTION_DECISION_TIMEOUT_MS / 1000.0)
+    decision_deadline = turn_started + (EMOTION_DECISION_TIMEOUT_MS / 1000.0)
     emotion_decision_closed = False
 
-    if use_openai():
-        response_id = str(uuid.uuid4())
+    if use_llm():
+        # The message_start id doubles as the turn's trace id (turns run in their own task,
+        # so it never leaks into the next turn)
+        response_id = turn.response_id = str(uuid.uuid4())
+        trace_id.set(response_id)
         await send_message_start(response_id)
-        chunk_index = 0
-        buffer = ""
-        full_reply = ""
-        llm = ChatOpenAI(model=OPENAI_MODEL)
-        async for chunk in llm.astream([HumanMessage(content=user_text)]):
-            part = (chunk.content or "") if hasattr(chunk, "content") else str(chunk)
-            full_reply += part
-            for char in part:
-                buffer += char
-                if char in CHUNK_BOUNDARIES and buffer:
-                    if not emotion_decision_closed:
-                        emotion_decision_closed = await _decide_and_maybe_emit_response_emotion(
-                            reply_text=full_reply,
-                            deadline_reached=monotonic() >= decision_deadline,
-                        )
-                    await send_message_chunk(response_id, chunk_index, buffer)
-                    chunk_index += 1
-                    buffer = ""
-        if buffer:
-            await send_message_chunk(response_id, chunk_index, buffer)
+        if speech_enabled():
+            turn.speech = SpeechStream(response_id, turn_started)
+        memory = get_memory() if session_id else None
+        conversation = await memory.get(session_id, persist=persist) if memory else None
+        # A cached reply ignores context, so it is only used when there is no history yet
+        cache = get_reply_cache() if conversation is None or conversation.empty else None
+        cache_model = f"{LLM_BACKEND}:{OPENAI_MODEL}"
+        cached = await cache.get(user_text, cache_model) if cache else None
+        tone = ToneTracker()
+        first_token_at: float | None = None
+        if cached is not None:
+            chunks = cached
+            turn.path = "cache"
+            TURNS.labels("cache").inc()
+            emotion_decision_closed = await _replay_cached(
+                turn, cached, tone, decision_deadline, turn_started
+            )
+        else:
+            turn.path = "llm"
+            TURNS.labels("llm").inc()
+            history = conversation.messages() if conversation is not None else []
+            stream = _ReplyStream(response_id, tone, decision_deadline, turn_started, turn)
+            await stream.run([*history, HumanMessage(content=user_text)])
+            chunks, first_token_at = stream.chunks, stream.first_token_at
+            emotion_decision_closed = stream.emotion_decision_closed
+            if stream.failed is not None:
+                if not chunks:
+                    # Nothing to say: show the error expression, keep the exchange out of memory
+                    await _emit_emotion("error", FALLBACK_TONE_DURATION_MS)
+                    emotion_decision_closed = True
+                    conversation = None
+            else:
+                tokens = (tone.chars + 3) // 4
+                _reply_tokens_avg = tokens if _reply_tokens_avg is None else 0.9 * _reply_tokens_avg + 0.1 * tokens
+                if cache:
+                    await cache.put(user_text, cache_model, chunks)
         if not emotion_decision_closed:
             emotion_decision_closed = await _decide_and_maybe_emit_response_emotion(
-                reply_text=full_reply,
+                tone=tone.expression(),
+                reply_chars=tone.chars,
                 deadline_reached=True,
+                turn_started=turn_started,
             )
+        if turn.speech is not None:
+            # The reply's audio belongs inside message_start/message_end
+            await turn.speech.finish()
         await send_message_end(response_id)
+        if first_token_at is not None:
+            logger.debug("Turn %s: ttft=%.0fms", response_id, (first_token_at - turn_started) * 1000)
     else:
+        conversation = None
+        turn.path = "echo"
+        TURNS.labels("echo").inc()
+        tone = ToneTracker()
+        tone.feed(user_text)
         emotion_decision_closed = await _decide_and_maybe_emit_response_emotion(
-            reply_text=user_text,
+            tone=tone.expression(),
+            reply_chars=tone.chars,
             deadline_reached=True,
+            turn_started=turn_started,
         )
         await broadcast(to_json_dict(build_message(user_text)))
 
     await broadcast(to_json_dict(build_speaking_end()))
+    TURN_SECONDS.observe(monotonic() - turn_started)
+    if conversation is not None:
+        # Shielded: a superseding input must not lose the exchange that was just spoken
+        await asyncio.shield(conversation.record(user_text, "".join(chunks)))
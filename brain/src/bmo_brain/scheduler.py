@@ -0,0 +1,278 @@
+"""
+Turn scheduler: runs run_on_input off the WebSocket receive loop.
+
+Each connection gets a Session with its own turn queue and worker task, so the socket
+keeps reading while a reply streams. A global semaphore caps in-flight LLM turns across
+all faces, and a new input supersedes (cancels) the turn still running for that session.
+
+Each turn is admitted first (admission.py: per-face and global rate limits, token
+budget); a face that is turned away, or whose queue is full, gets a busy frame and the
+BMO_BUSY_EMOTION expression, sent to that face only.
+
+The running turn is held as a TurnHandle. Cancelling it aborts the model stream (closing
+the upstream response) and the runner closes the aborted reply with message_end and
+speaking_end before the session starts the next turn.
+
+A Session outlives its connection while the face may resume (resume.py); what the runner
+keeps across a session's turns (the expression shown) lives in it, not in the runner.
+"""
+
+import asyncio
+import logging
+import math
+import uuid
+from contextvars import ContextVar
+from time import monotonic
+from typing import Callable
+
+from bmo_brain.admission import Rejected, get_admission
+from bmo_brain.broadcaster import Route, reply_route
+from bmo_brain.config import BUSY_EMOTION, MAX_CONCURRENT_TURNS, SESSION_QUEUE_SIZE, SUPERSEDE_TURNS
+from bmo_brain.face_contract import get_contract
+from bmo_brain.protocol import busy as build_busy, to_json_dict
+from bmo_brain.tts import SpeechStream
+from bmo_brain.wire import Frame
+
+# Duration of the BMO_BUSY_EMOTION shown to a face that was turned away (ms)
+BUSY_EMOTION_DURATION_MS = 2_000
+
+logger = logging.getLogger(__name__)
+
+
+class EmotionState:
+    """The expression last sent to a session's faces and when (the runner holds it a while)."""
+
+    __slots__ = ("value", "sent_at")
+
+    def __init__(self) -> None:
+        self.value: str | None = None
+        self.sent_at = 0.0
+
+
+# Emotion state of the session whose turn runs in this task (turns outside a session share one)
+current_emotion: ContextVar[EmotionState] = ContextVar("bmo_session_emotion", default=EmotionState())
+
+
+class TurnHandle:
+    """
+    One turn of a session. The session cancels it on barge-in; the runner fills in what the
+    abort needs to close the reply (message id, path, chars streamed from the model, speech
+    synthesis in progress).
+    """
+
+    __slots__ = ("task", "response_id", "path", "streamed_chars", "speech")
+
+    def __init__(self) -> None:
+        self.task: asyncio.Task | None = None
+        self.response_id: str | None = None
+        self.path: str | None = None
+        self.streamed_chars = 0
+        self.speech: SpeechStream | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def cancel(self) -> bool:
+        """Abort the turn if it is still running. Return True when it was."""
+        if not self.running:
+            return False
+        self.task.cancel()
+        return True
+
+
+class TurnScheduler:
+    """Global limit on concurrent turns plus backpressure counters."""
+
+    def __init__(self, max_concurrent: int) -> None:
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.sessions: set["Session"] = set()
+        self.in_flight = 0
+        self.waiting_for_slot = 0
+        self.turns_started = 0
+        self.turns_completed = 0
+        self.turns_superseded = 0
+        self.turns_failed = 0
+        self.turns_rejected = 0
+        self.inputs_rejected = 0
+        self.slot_wait_total = 0.0
+        self.slot_wait_max = 0.0
+        self._run_on_input = None
+
+    async def run_turn(
+        self,
+        user_text: str,
+        session_id: str | None = None,
+        turn: TurnHandle | None = None,
+        *,
+        persist: bool = False,
+    ) -> None:
+        """
+        Wait for a global slot, then run one turn (with the session's conversation memory,
+        persisted when persist is True).
+        """
+        run_on_input = self._run_on_input
+        if run_on_input is None:
+            # Imported on first use: the turn pipeline loads after the socket is listening
+            from bmo_brain.runner import run_on_input
+
+            self._run_on_input = run_on_input
+        self.waiting_for_slot += 1
+        start = monotonic()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting_for_slot -= 1
+        wait = monotonic() - start
+        self.slot_wait_total += wait
+        if wait > self.slot_wait_max:
+            self.slot_wait_max = wait
+        self.in_flight += 1
+        self.turns_started += 1
+        try:
+            await run_on_input(user_text, session_id, turn, persist=persist)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """Backpressure metrics: queued inputs, slot waits and turn outcomes."""
+        started = self.turns_started
+        return {
+            "sessions": len(self.sessions),
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting_for_slot": self.waiting_for_slot,
+            "queued": sum(s.queue_depth for s in self.sessions),
+            "turns_started": started,
+            "turns_completed": self.turns_completed,
+            "turns_superseded": self.turns_superseded,
+            "turns_failed": self.turns_failed,
+            "turns_rejected": self.turns_rejected,
+            "inputs_rejected": self.inputs_rejected,
+            "slot_wait_avg_ms": (self.slot_wait_total / started * 1000) if started else 0.0,
+            "slot_wait_max_ms": self.slot_wait_max * 1000,
+        }
+
+
+class Session:
+    """Per-connection turn queue, worker task and handle on the running turn."""
+
+    def __init__(self, scheduler: TurnScheduler, reply: Callable[[Frame], object] | None = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.scheduler = scheduler
+        # Sends a frame to this session's face only (busy answers)
+        self._reply = reply
+        # Where this session's replies are published (None: every face); set by the server
+        self.route: Route | None = None
+        # Stable key the face supplied (its hello "session"): its conversation memory is kept
+        # under it, across reconnects and restarts. None: memory is per connection, never persisted
+        self.memory_key: str | None = None
+        self.bucket = get_admission().face_bucket()
+        self.emotion = EmotionState()
+        # Audio ingest (audio.AudioIngest), created on the session's first audio frame
+        self.audio = None
+        self._queue: asyncio.Queue[str] = asyncio.Queue(SESSION_QUEUE_SIZE)
+        self._current: TurnHandle | None = None
+        scheduler.sessions.add(self)
+        self._worker = asyncio.create_task(self._work())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, user_text: str) -> bool:
+        """
+        Queue an input without blocking the receive loop.
+        With SUPERSEDE_TURNS, older queued inputs and the running turn are cancelled.
+        """
+        if SUPERSEDE_TURNS:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+                self.scheduler.turns_superseded += 1
+            if self._current is not None:
+                self._current.cancel()
+        try:
+            self._queue.put_nowait(user_text)
+        except asyncio.QueueFull:
+            self.scheduler.inputs_rejected += 1
+            logger.warning("Session %s turn queue full; dropping input", self.id[:8])
+            self._send_busy("queue_full", 0.0)
+            return False
+        return True
+
+    def attach(self, reply: Callable[[Frame], object]) -> None:
+        """Send this session's busy answers through reply (its face reconnected)."""
+        self._reply = reply
+
+    def interrupt(self) -> bool:
+        """Abort the running turn (barge-in). Return True when one was running."""
+        return self._current is not None and self._current.cancel()
+
+    def _send_busy(self, reason: str, retry_after_s: float) -> None:
+        """Tell this face its input was not taken: a busy frame, then the busy expression."""
+        if self._reply is None:
+            return
+        retry_ms = math.ceil(retry_after_s * 1000) if math.isfinite(retry_after_s) else -1
+        self._reply(Frame(to_json_dict(build_busy(reason, retry_ms))))
+        self._reply(get_contract().emotion_frame(BUSY_EMOTION, BUSY_EMOTION_DURATION_MS))
+
+    async def _admit_and_run(self, user_text: str, handle: TurnHandle) -> bool:
+        """Run the turn once admitted. Return False if it was rejected."""
+        reply_route.set(self.route)
+        current_emotion.set(self.emotion)
+        from bmo_brain.memory import history_tokens
+
+        memory_key = self.memory_key or self.id
+        try:
+            await get_admission().admit(user_text, self.bucket, history_tokens=history_tokens(memory_key))
+        except Rejected as e:
+            self._send_busy(e.reason, e.retry_after_s)
+            return False
+        await self.scheduler.run_turn(user_text, memory_key, handle, persist=self.memory_key is not None)
+        return True
+
+    async def _work(self) -> None:
+        """Run queued turns one at a time for this session."""
+        while True:
+            user_text = await self._queue.get()
+            handle = self._current = TurnHandle()
+            turn = handle.task = asyncio.create_task(self._admit_and_run(user_text, handle))
+            # A cancelled turn returns as soon as it has closed its reply, then the next one starts
+            await asyncio.wait({turn})
+            self._current = None
+            if turn.cancelled():
+                self.scheduler.turns_superseded += 1
+            elif turn.exception() is not None:
+                self.scheduler.turns_failed += 1
+                logger.error("Turn failed for session %s", self.id[:8], exc_info=turn.exception())
+            elif not turn.result():
+                self.scheduler.turns_rejected += 1
+            else:
+                self.scheduler.turns_completed += 1
+
+    def close(self) -> None:
+        """Cancel the worker and any running turn (connection closed)."""
+        self.scheduler.sessions.discard(self)
+        self._worker.cancel()
+        if self._current is not None:
+            self._current.cancel()
+        if self.audio is not None:
+            self.audio.close()
+
+
+_scheduler: TurnScheduler | None = None
+
+
+def get_scheduler() -> TurnScheduler:
+    """Return the process-wide scheduler (created on first use inside the event loop)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TurnScheduler(MAX_CONCURRENT_TURNS)
+    return _scheduler
+
+
+def open_session(reply: Callable[[Frame], object] | None = None) -> Session:
+    """Create the turn session for a new connection (reply sends a frame to that face only)."""
+    return Session(get_scheduler(), reply)
@@ -1,16 +1,50 @@
 """
 WebSocket server for BMO face connections.
 
-Listens on 0.0.0.0:8765, registers connected clients (no business logic yet).
+Listens on 0.0.0.0:8765. Each connection gets an outbound ClientChannel (broadcaster.py)
+and a turn Session (scheduler.py), and is sent contract_info. The face's hello then
+negotiates:
+- the wire encoding (json or compact, wire.py) and batch frames
+- tts: audio frames of spoken replies (tts.py)
+- resume: a token under which a dropped connection is parked and later resumed with the
+  frames it missed (resume.py)
+- routing: its session key and room, so replies go to the faces of the session that asked
+  (and its room), and the frame types it subscribes to
+
+Text frames are validated by inbound.py and start turns; binary frames carry microphone
+audio (audio.py, with BMO_AUDIO_INGEST). The turn pipeline is imported and warmed in the
+background once the socket is listening. With --workers N, N processes share the port and
+relay broadcasts through a local hub (bus.py).
 """
 
 import asyncio
-import json
+import functools
+import importlib
 import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+from time import monotonic
 
-from bmo_brain.face_contract import FACE_CONTRACT_VERSION
+from bmo_brain import audio, bus, face_contract, inbound, resume, startup
+from bmo_brain.broadcaster import ClientChannel, Route, join, publish, register, unregister
+from bmo_brain.config import (
+    AUDIO_INGEST,
+    BUS_PATH,
+    CONTRACT_POLL_S,
+    MAX_FRAME_BYTES,
+    METRICS_HOST,
+    METRICS_PORT,
+    REPLY_ROUTING,
+    TTS_BACKEND,
+)
+from bmo_brain.metrics import CONNECTED_FACES, INCOMING, INCOMING_SECONDS, start_metrics_server
 from bmo_brain.protocol import contract_info as build_contract_info, to_json_dict
+from bmo_brain.scheduler import Session, open_session
+from bmo_brain.wire import ENCODINGS, Frame
 from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosedError
 
 logger = logging.getLogger(__name__)
 
@@ -19,38 +53,160 @@ _connected: set = set()
 
 
 def get_connected() -> set:
-    """Return the set of connected WebSocket connections (for broadcasting in Paso 4)."""
+    """Return the set of connected WebSocket connections (for connection counts; frames go through ClientChannel)."""
     return _connected
 
 
-async def _handle_incoming(raw: str | bytes) -> None:
-    """Log and optionally respond to a message from the face (e.g. type=input -> echo)."""
-    text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+# Incoming types counted by name (anything else is "other", to bound label cardinality)
+_COUNTED_TYPES = frozenset({"input", "hello", "invalid", "binary"})
+# Face -> brain log lines, rate-limited per type so a flood cannot flood the log too
+_sampled_log = inbound.SampledLog(logger)
+
+
+async def _handle_incoming(raw: str | bytes, session: Session, channel: ClientChannel) -> Session:
+    """
+    Decode and act on a message from the face (type=input -> queue a turn). Return the
+    session for the connection's next messages (a hello may resume a parked one).
+    """
+    start = monotonic()
+    msg_type = "invalid"
     try:
-        data = json.loads(text)
-        if not isinstance(data, dict):
-            logger.info("Face -> brain: payload=%s", data)
-            return
-        msg_type = data.get("type", "?")
-        logger.info("Face -> brain: type=%s payload=%s", msg_type, data)
-        if msg_type == "input" and "text" in data:
-            from bmo_brain.runner import run_on_input
-            await run_on_input(str(data["text"]))
-    except (json.JSONDecodeError, TypeError):
-        preview = text[:200] + "..." if len(text) > 200 else text
-        logger.info("Face -> brain: (raw) %s", preview)
+        if isinstance(raw, bytes):
+            msg_type = "binary"
+            handler = inbound.get_binary_handler()
+            if handler is None:
+                _sampled_log.log(logging.INFO, "binary", "Face -> brain: %d-byte binary frame ignored", len(raw))
+            else:
+                try:
+                    await handler(raw, session, channel)
+                except inbound.InvalidFrame as e:
+                    msg_type = "invalid"
+                    _sampled_log.log(logging.INFO, "invalid", "Face -> brain: invalid binary frame (%s)", e)
+            return session
+        try:
+            msg = await inbound.decode_text(raw)
+        except inbound.InvalidFrame as e:
+            _sampled_log.log(logging.INFO, "invalid", "Face -> brain: invalid frame (%s): %s", e, inbound.preview(raw))
+            return session
+        msg_type = msg.type
+        category = msg_type if msg_type in _COUNTED_TYPES else "other"
+        _sampled_log.log(logging.INFO, category, "Face -> brain: type=%s (%d bytes)", msg_type, len(raw))
+        logger.debug("Face -> brain: %s", inbound.preview(raw))
+        if msg_type == "input":
+            session.submit(msg.data["text"])
+        elif msg_type == "hello":
+            session = _negotiate(msg.data, channel, session)
+        return session
+    finally:
+        INCOMING.labels(msg_type if msg_type in _COUNTED_TYPES else "other").inc()
+        INCOMING_SECONDS.observe(monotonic() - start)
+
+
+# Optional features a face can enable in its hello ("audio": it may stream microphone PCM,
+# "tts": it can receive the audio of replies, "resume": it can reconnect to its session)
+FEATURES = (
+    ["batch", "routing"]
+    + (["audio"] if AUDIO_INGEST else [])
+    + (["tts"] if TTS_BACKEND else [])
+    + (["resume"] if resume.enabled() else [])
+)
+# Longest session / room id accepted in a hello
+_MAX_ROUTE_KEY = 128
+
+
+def _route_key(value, default: str | None) -> str | None:
+    if value is None:
+        return default
+    if isinstance(value, str) and 0 < len(value) <= _MAX_ROUTE_KEY:
+        return value
+    logger.warning("Ignoring invalid routing key %r in hello", value)
+    return default
+
+
+def _set_route(channel: ClientChannel, session: Session, session_key: str, room: str | None, subscribe) -> None:
+    """Index the face for routing and point its turns' replies at its session (and room)."""
+    join(channel, session_key, room, subscribe)
+    session.route = Route(session_key, room) if REPLY_ROUTING == "session" else None
+
+
+def _negotiate(hello: dict, channel: ClientChannel, session: Session) -> Session:
+    """
+    Apply the face's reply to contract_info (wire encoding, optional features, resume,
+    routing). Return the connection's session (the parked one when the face resumed).
+    """
+    encoding = hello.get("encoding", "json")
+    if encoding in ENCODINGS:
+        channel.encoding = encoding
+    else:
+        logger.warning("Face asked for unknown encoding %r; keeping %s", encoding, channel.encoding)
+    channel.batch = bool(hello.get("batch", False))
+    channel.opted_in = frozenset({"audio"}) if hello.get("tts") and TTS_BACKEND else frozenset()
+    if hello.get("resume") is not None:
+        # After the encoding (missed frames are sent in it), before routing: a resumed face
+        # takes over its old routing, which the rest of the hello may change
+        session = resume.attach(hello["resume"], hello.get("resume_from", 0), channel, session)
+    # Keys the hello leaves out (or gets wrong) keep the face's current routing
+    subscribe = hello.get("subscribe")
+    if subscribe is not None and not (isinstance(subscribe, list) and all(isinstance(t, str) for t in subscribe)):
+        logger.warning("Ignoring invalid subscribe %r in hello", subscribe)
+        subscribe = None
+    if subscribe is None:
+        subscribe = channel.subscriptions
+    session_key = _route_key(hello.get("session"), None)
+    if session_key is not None:
+        # The face's own key is stable across reconnects: its conversation memory follows it
+        session.memory_key = session_key
+    room = _route_key(hello.get("room"), channel.room)
+    _set_route(channel, session, session_key or channel.session, room, subscribe)
+    logger.info(
+        "Face negotiated encoding=%s batch=%s tts=%s session=%s room=%s subscribe=%s",
+        channel.encoding,
+        channel.batch,
+        bool(channel.opted_in),
+        channel.session,
+        channel.room,
+        subscribe,
+    )
+    return session
+
+
+@functools.lru_cache(maxsize=1)
+def _contract_info_frame() -> Frame:
+    """contract_info for new faces, built and encoded once (reconnect storms reuse the bytes)."""
+    version = face_contract.get_contract().version
+    return Frame(to_json_dict(build_contract_info(version, list(ENCODINGS), FEATURES)))
+
+
+def _on_contract_reload(index: face_contract.ContractIndex) -> None:
+    """Push the new contract_info to this process's faces (each worker watches the file itself)."""
+    _contract_info_frame.cache_clear()
+    faces = publish(_contract_info_frame())
+    logger.info("Pushed contract_info v%s to %d face(s)", index.version, faces)
 
 
 async def _handler(websocket) -> None:
     """Register client on connect, unregister on disconnect."""
     _connected.add(websocket)
+    CONNECTED_FACES.inc()
+    channel = register(websocket)
     logger.info("Face connected (total: %d)", len(_connected))
-    await websocket.send(json.dumps(to_json_dict(build_contract_info(FACE_CONTRACT_VERSION))))
+    channel.offer(_contract_info_frame())
+    session = open_session(channel.offer)
+    _set_route(channel, session, session.id, None, None)
+    dropped = False
     try:
         async for raw in websocket:
-            await _handle_incoming(raw)
+            session = await _handle_incoming(raw, session, channel)
+    except ConnectionClosedError as e:
+        # Dropped without a close handshake (flaky Wi-Fi); a resumable face is parked below
+        logger.info("Face connection dropped: %s", e)
+        dropped = True
     finally:
+        if not resume.park(websocket, channel, session, dropped=dropped):
+            session.close()
+            unregister(websocket)
         _connected.discard(websocket)
+        CONNECTED_FACES.dec()
         logger.info("Face disconnected (remaining: %d)", len(_connected))
 
 
@@ -64,15 +220,94 @@ async def _demo_broadcast() -> None:
     await send_message("Hola")
 
 
-async def run_server(host: str = "0.0.0.0", port: int = 8765) -> None:
-    """Run the WebSocket server until cancelled."""
-    async with serve(_handler, host, port) as ws_server:
+async def _prewarm() -> None:
+    """
+    After the socket is listening: import the turn pipeline (langchain, model client) in a
+    thread so the loop keeps accepting faces, then warm the model connection pool.
+    """
+    try:
+        await asyncio.to_thread(importlib.import_module, "bmo_brain.runner")
+        startup.mark("turn pipeline imported")
+        from bmo_brain import llm
+
+        await llm.warm_up()
+        startup.mark("prewarm done")
+    except Exception:
+        logger.exception("Prewarm failed; the first turn will load the pipeline")
+    finally:
+        startup.report()
+
+
+async def run_server(
+    host: str = "0.0.0.0",
+    port: int = 8765,
+    *,
+    reuse_port: bool = False,
+    bus_path: str | None = None,
+    worker_id: int = 0,
+) -> None:
+    """Run the WebSocket server until cancelled. With bus_path, join the multi-process bus."""
+    if bus_path:
+        await bus.connect(bus_path)
+    if METRICS_PORT is not None:
+        await start_metrics_server(METRICS_HOST, METRICS_PORT + worker_id)
+    face_contract.get_contract()
+    if AUDIO_INGEST:
+        inbound.set_binary_handler(audio.ingest_frame)
+    if CONTRACT_POLL_S > 0:
+        face_contract.add_reload_listener(_on_contract_reload)
+        asyncio.create_task(face_contract.watch(CONTRACT_POLL_S))
+    async with serve(_handler, host, port, reuse_port=reuse_port, max_size=MAX_FRAME_BYTES) as ws_server:
         logger.info("Brain WebSocket server listening on %s:%d", host, port)
+        startup.mark("listening")
+        asyncio.create_task(_prewarm())
         asyncio.create_task(_demo_broadcast())
-        await asyncio.Future()  # run forever
+        try:
+            await asyncio.Future()  # run forever
+        finally:
+            llm = sys.modules.get("bmo_brain.llm")
+            if llm is not None:
+                await llm.aclose()
+
+
+def _worker_main(host: str, port: int, bus_path: str, worker_id: int) -> None:
+    """Entry point of one worker process (multi-process mode)."""
+    logging.basicConfig(level=logging.INFO, format=f"%(levelname)s [w{worker_id}] %(name)s %(message)s")
+    try:
+        asyncio.run(run_server(host=host, port=port, reuse_port=True, bus_path=bus_path, worker_id=worker_id))
+    except KeyboardInterrupt:
+        pass
 
 
-def run(host: str = "0.0.0.0", port: int = 8765) -> None:
-    """Entry point: run the server (blocks)."""
+async def _supervise(host: str, port: int, workers: int) -> None:
+    """Start the bus hub, then N workers sharing the port via SO_REUSEPORT; wait for them."""
+    path = BUS_PATH or os.path.join(tempfile.gettempdir(), f"bmo-bus-{os.getpid()}.sock")
+    if os.path.exists(path):
+        os.unlink(path)
+    hub = await bus.run_hub(path)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [
+        ctx.Process(target=_worker_main, args=(host, port, path, i), name=f"bmo-worker-{i}")
+        for i in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    logger.info("Started %d brain workers on %s:%d (bus: %s)", workers, host, port, path)
+    try:
+        await asyncio.gather(*(asyncio.to_thread(proc.join) for proc in procs))
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        hub.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def run(host: str = "0.0.0.0", port: int = 8765, workers: int = 1) -> None:
+    """Entry point: run the server (blocks). workers > 1 runs one process per worker."""
     logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s %(message)s")
+    if workers > 1:
+        asyncio.run(_supervise(host=host, port=port, workers=workers))
+        return
     asyncio.run(run_server(host=host, port=port))
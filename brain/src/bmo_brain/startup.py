@@ -0,0 +1,92 @@
+"""
+Startup profiling for `python -m bmo_brain --startup-profile`.
+
+Records how long each module takes to import (cumulative and self time, measured around
+the loader's exec_module, per thread: the prewarm imports in a worker thread while the
+event loop thread imports too) and named milestones (env loaded, listening, prewarm done).
+The report is logged once the background prewarm finishes. Disabled, mark() is a no-op.
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from importlib.abc import MetaPathFinder
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+_started_at = perf_counter()
+_enabled = False
+_milestones: list[tuple[str, float]] = []
+# module name -> (cumulative s, self s)
+_imports: dict[str, tuple[float, float]] = {}
+# .stack: child time accumulated by each import in progress in this thread
+_local = threading.local()
+
+
+class _TimingFinder(MetaPathFinder):
+    """Delegates to the other finders and times the exec_module of what they find."""
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                loader = spec.loader
+                # Only per-module loader instances (builtin/frozen loaders are shared classes)
+                if loader is not None and not isinstance(loader, type) and hasattr(loader, "__dict__"):
+                    loader.exec_module = _timed(name, loader.exec_module)
+                return spec
+        return None
+
+
+def _timed(name: str, exec_module):
+    def wrapper(module):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(0.0)
+        start = perf_counter()
+        try:
+            exec_module(module)
+        finally:
+            elapsed = perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            _imports[name] = (elapsed, elapsed - children)
+
+    return wrapper
+
+
+def enable() -> None:
+    """Start timing imports and recording milestones (call as early as possible)."""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    sys.meta_path.insert(0, _TimingFinder())
+
+
+def mark(label: str) -> None:
+    """Record a startup milestone (ms since this module was imported)."""
+    if _enabled:
+        _milestones.append((label, perf_counter() - _started_at))
+
+
+def report(top: int = 20) -> None:
+    """Log milestones and the slowest imports, then stop timing imports."""
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    sys.meta_path[:] = [f for f in sys.meta_path if not isinstance(f, _TimingFinder)]
+    lines = ["Startup profile (ms since start):"]
+    lines += [f"  {at * 1000:8.1f}  {label}" for label, at in _milestones]
+    slowest = sorted(_imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    lines.append(f"Slowest imports ({len(_imports)} modules; cumulative / self ms):")
+    lines += [f"  {cum * 1000:8.1f} {own * 1000:8.1f}  {name}" for name, (cum, own) in slowest]
+    logger.info("\n".join(lines))
@@ -8,6 +8,8 @@ Used by LangGraph StateGraph; nodes read/update this state.
 import operator
 from typing import Annotated, Literal, TypedDict
 
+from langchain_core.messages import BaseMessage
+
 from bmo_brain.protocol import EyeExpression
 
 # Phase of the conversation flow (aligns with protocol.StateValue)
@@ -21,6 +23,10 @@ class State(TypedDict, total=False):
     current_phase: Phase
     # Last user input from the face (type=input, text=...)
     last_input: str
+    # Conversation so far (the session's memory), sent to the model before last_input
+    history: list[BaseMessage]
+    # Preset key (canonical) the face shows when the turn starts (not emitted again)
+    last_emotion: str | None
     # Last reply text (set by process_input)
     last_reply: str
     # Main tone inferred from reply text (phase 2)
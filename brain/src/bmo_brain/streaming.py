@@ -0,0 +1,382 @@
+"""
+Streaming model calls: a token pump and a resilient stream on top of it.
+
+`async for chunk in llm.astream(...)` cannot wake up while the upstream is silent, so
+deadlines (first-token filler, idle partial flush) could only be checked when a token
+arrives. TokenPump moves the iteration into a task feeding a queue; get(timeout) returns
+the next item, END when the stream is done, or TIMEOUT. Closing the pump cancels the task,
+which closes the stream (and with it the upstream HTTP response).
+
+resilient_stream() wraps the call in a StreamPolicy:
+- first-token deadline: no content within it counts as a failed attempt
+- retries with full-jitter exponential backoff, only while nothing has been yielded
+  (a retry after the first token would repeat text the face already shows)
+- hedging: after hedge_after without a first token, the next model in
+  OPENAI_MODEL + OPENAI_FALLBACK_MODELS is started too; the first to produce content wins
+  and the other is closed. A model that errors before its first token hands over to the
+  next one right away
+- inter-token deadline: a stream that stalls mid-reply ends with UpstreamStalled
+- a circuit breaker per model skips a model after repeated failures until a trial call
+  succeeds again
+
+`python -m bmo_brain.fake_openai` serves a local OpenAI-compatible endpoint with
+injectable hangs, stalls and errors to exercise this.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import random
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, AsyncIterator
+
+from bmo_brain.config import (
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_S,
+    LLM_FIRST_TOKEN_TIMEOUT_MS,
+    LLM_HEDGE_AFTER_MS,
+    LLM_RETRIES,
+    LLM_RETRY_BACKOFF_MS,
+    LLM_TOKEN_TIMEOUT_MS,
+    OPENAI_FALLBACK_MODELS,
+    OPENAI_MODEL,
+)
+from bmo_brain.metrics import UPSTREAM_ATTEMPTS, UPSTREAM_HEDGES, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+class _Sentinel:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+END = _Sentinel("END")
+TIMEOUT = _Sentinel("TIMEOUT")
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class TokenPump:
+    """Iterates an async stream in a background task; the consumer reads with get(timeout)."""
+
+    def __init__(self, stream: AsyncIterator[Any]) -> None:
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(stream))
+
+    async def _run(self, stream: AsyncIterator[Any]) -> None:
+        try:
+            if hasattr(stream, "aclose"):
+                async with contextlib.aclosing(stream):
+                    async for item in stream:
+                        self._queue.put_nowait(item)
+            else:
+                async for item in stream:
+                    self._queue.put_nowait(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._queue.put_nowait(_Failure(e))
+            return
+        self._queue.put_nowait(END)
+
+    async def get(self, timeout: float | None = None) -> Any:
+        """Next stream item, END, or TIMEOUT after timeout seconds. Stream errors are raised here."""
+        if timeout is None:
+            item = await self._queue.get()
+        elif not self._queue.empty():
+            item = self._queue.get_nowait()
+        else:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                return TIMEOUT
+        if isinstance(item, _Failure):
+            raise item.error
+        return item
+
+    async def aclose(self) -> None:
+        """Stop reading and close the stream (no-op once it has ended)."""
+        if not self._task.done():
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class UpstreamError(Exception):
+    """The model call failed in a way the policy could not recover from."""
+
+
+class UpstreamTimeout(UpstreamError):
+    """No content before the first-token deadline, on every attempt."""
+
+
+class UpstreamStalled(UpstreamError):
+    """The stream went silent mid-reply for longer than the inter-token deadline."""
+
+
+class CircuitOpen(UpstreamError):
+    """Every candidate model's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive failures; open -> half-open after reset_s,
+    letting a single trial call through; its success closes the circuit, its failure
+    opens it again.
+    """
+
+    def __init__(self, failures: int, reset_s: float) -> None:
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through now (does not claim the trial slot)."""
+        if self.state == "closed" or self.failures <= 0:
+            return True
+        return self.state == "open" and monotonic() - self.opened_at >= self.reset_s
+
+    def allow(self) -> bool:
+        """Whether a call may go to this model now (claims the trial slot when half-open)."""
+        if not self.available():
+            return False
+        if self.state == "open":
+            self.state = "half_open"
+        return True
+
+    def release(self) -> None:
+        """Give back a trial slot whose call ended without a verdict (closed by the caller)."""
+        if self.state == "half_open":
+            self.state = "open"
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive = 0
+
+    def record_failure(self) -> None:
+        self.consecutive += 1
+        if self.failures > 0 and (self.state == "half_open" or self.consecutive >= self.failures):
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = monotonic()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """The shared circuit breaker of one model."""
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_S)
+    return breaker
+
+
+def breaker_stats() -> dict:
+    """Circuit breaker totals (exported as bmo_llm_* gauges)."""
+    return {
+        "models": len(_breakers),
+        "circuits_open": sum(b.state == "open" for b in _breakers.values()),
+        "circuits_half_open": sum(b.state == "half_open" for b in _breakers.values()),
+        "circuits_opened": sum(b.times_opened for b in _breakers.values()),
+    }
+
+
+@dataclass(frozen=True)
+class StreamPolicy:
+    """Deadlines, retries and hedging for one streaming call (see module docstring)."""
+
+    models: tuple[str, ...]
+    first_token_timeout_s: float | None = 8.0
+    token_timeout_s: float | None = 5.0
+    retries: int = 2
+    backoff_s: float = 0.25
+    hedge_after_s: float | None = None
+
+    @classmethod
+    def from_config(cls) -> "StreamPolicy":
+        def seconds(ms: float | None) -> float | None:
+            return ms / 1000.0 if ms else None
+
+        return cls(
+            models=tuple(dict.fromkeys([OPENAI_MODEL, *OPENAI_FALLBACK_MODELS])),
+            first_token_timeout_s=seconds(LLM_FIRST_TOKEN_TIMEOUT_MS),
+            token_timeout_s=seconds(LLM_TOKEN_TIMEOUT_MS),
+            retries=max(0, LLM_RETRIES),
+            backoff_s=LLM_RETRY_BACKOFF_MS / 1000.0,
+            hedge_after_s=seconds(LLM_HEDGE_AFTER_MS),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, backoff * 2^attempt]."""
+        return random.uniform(0, self.backoff_s * (2**attempt))
+
+
+def _has_content(item: Any) -> bool:
+    """Role-only and usage chunks carry no text and do not count as a first token."""
+    return bool(item.content if hasattr(item, "content") else item)
+
+
+class _Candidate:
+    __slots__ = ("model", "hedge", "pump", "getter")
+
+    def __init__(self, model: str, messages: list, *, hedge: bool = False) -> None:
+        from bmo_brain.llm import get_chat_model
+
+        self.model = model
+        self.hedge = hedge
+        self.pump = TokenPump(get_chat_model(model).astream(messages))
+        self.getter: asyncio.Task | None = None
+
+    def next_item(self) -> asyncio.Task:
+        if self.getter is None:
+            self.getter = asyncio.create_task(self.pump.get())
+        return self.getter
+
+    async def aclose(self) -> None:
+        if self.getter is not None:
+            self.getter.cancel()
+        await self.pump.aclose()
+
+
+def _start_next(queue: list[str], messages: list, *, hedge: bool = False) -> _Candidate | None:
+    """Start the next queued model its breaker lets through now, or return None."""
+    while queue:
+        model = queue.pop(0)
+        if get_breaker(model).allow():
+            return _Candidate(model, messages, hedge=hedge)
+    return None
+
+
+async def _race_first_token(messages: list, policy: StreamPolicy) -> tuple[_Candidate, Any]:
+    """
+    Start the first allowed model (and hedges) and return the first candidate to produce
+    content with that item. Losers are closed; failures are recorded on their breakers.
+    A breaker's trial slot is only claimed when its model is actually started.
+    """
+    queue = [m for m in policy.models if get_breaker(m).available()]
+    first = _start_next(queue, messages)
+    if first is None:
+        raise CircuitOpen(f"circuit open for {', '.join(policy.models)}")
+    running = [first]
+    start = monotonic()
+    deadline = start + policy.first_token_timeout_s if policy.first_token_timeout_s else None
+    hedge_at = start + policy.hedge_after_s if policy.hedge_after_s is not None else None
+    last_error: BaseException | None = None
+    winner: tuple[_Candidate, Any] | None = None
+    try:
+        while winner is None:
+            now = monotonic()
+            if deadline is not None and now >= deadline:
+                for cand in running:
+                    get_breaker(cand.model).record_failure()
+                    UPSTREAM_ATTEMPTS.labels("first_token_timeout").inc()
+                raise UpstreamTimeout(f"no first token within {policy.first_token_timeout_s:.1f}s")
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                hedge = _start_next(queue, messages, hedge=True)
+                if hedge is not None:
+                    running.append(hedge)
+                    UPSTREAM_HEDGES.labels("started").inc()
+                    logger.info("No first token after %.0fms; hedging to %s", (now - start) * 1000, running[-1].model)
+            wake = min((t for t in (deadline, hedge_at) if t is not None), default=None)
+            done, _ = await asyncio.wait(
+                {cand.next_item() for cand in running},
+                timeout=None if wake is None else max(0.0, wake - now),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for cand in [c for c in running if c.getter in done]:
+                getter, cand.getter = cand.getter, None
+                error = getter.exception()
+                if error is None and getter.result() is END:
+                    # Finished without content: an empty reply is still an answer
+                    winner = (cand, END)
+                    break
+                if error is None:
+                    item = getter.result()
+                    if _has_content(item):
+                        winner = (cand, item)
+                        break
+                    continue
+                last_error = error
+                running.remove(cand)
+                await cand.aclose()
+                get_breaker(cand.model).record_failure()
+                UPSTREAM_ATTEMPTS.labels("error").inc()
+                logger.warning("Model %s failed before its first token: %s", cand.model, error)
+                if not running:
+                    # Fall back to the next model now instead of waiting for the hedge deadline
+                    fallback = _start_next(queue, messages)
+                    if fallback is not None:
+                        running.append(fallback)
+            if not running and winner is None:
+                raise UpstreamError(f"all models failed: {last_error}") from last_error
+    finally:
+        for cand in running:
+            if winner is None or cand is not winner[0]:
+                await cand.aclose()
+                # A loser closed before any verdict (the deadline path recorded its own)
+                get_breaker(cand.model).release()
+    if winner[0].hedge:
+        UPSTREAM_HEDGES.labels("won").inc()
+    return winner
+
+
+async def resilient_stream(messages: list, policy: StreamPolicy | None = None) -> AsyncIterator[Any]:
+    """Stream the reply to messages under policy (default: from config). Raises UpstreamError."""
+    policy = policy or StreamPolicy.from_config()
+    attempt = 0
+    while True:
+        try:
+            cand, item = await _race_first_token(messages, policy)
+            break
+        except CircuitOpen:
+            raise
+        except UpstreamError as e:
+            if attempt >= policy.retries:
+                raise
+            delay = policy.backoff(attempt)
+            attempt += 1
+            UPSTREAM_RETRIES.inc()
+            logger.warning("Model call failed (%s); retry %d in %.0fms", e, attempt, delay * 1000)
+            await asyncio.sleep(delay)
+    breaker = get_breaker(cand.model)
+    try:
+        while item is not END:
+            yield item
+            item = await cand.pump.get(policy.token_timeout_s)
+            if item is TIMEOUT:
+                breaker.record_failure()
+                UPSTREAM_ATTEMPTS.labels("stalled").inc()
+                raise UpstreamStalled(f"{cand.model} silent for {policy.token_timeout_s:.1f}s mid-reply")
+    except UpstreamError:
+        raise
+    except Exception as e:
+        breaker.record_failure()
+        UPSTREAM_ATTEMPTS.labels("error").inc()
+        raise UpstreamError(f"{cand.model} failed mid-reply: {e}") from e
+    except BaseException:
+        # The consumer closed the stream or was cancelled: no verdict on the model
+        breaker.release()
+        raise
+    finally:
+        await cand.aclose()
+    breaker.record_success()
+    UPSTREAM_ATTEMPTS.labels("ok").inc()
@@ -0,0 +1,109 @@
+"""
+Incremental reply-tone classifier.
+
+The lexicon (data/tone_lexicon.json) is compiled once into an Aho-Corasick automaton with
+a full transition table, so classifying text is one dict lookup per character. A
+ToneTracker is fed only the new text of each streamed chunk and keeps running
+per-emotion scores; its automaton state carries over, so patterns split across chunks
+still match.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import deque
+from functools import lru_cache
+from importlib.resources import files
+
+from bmo_brain.protocol import EyeExpression
+
+# Primary expression while BMO answers.
+RESPONSE_TONE_DURATION_MS = 2_000
+# Expression (and duration) when the reply tone stays unclear.
+FALLBACK_TONE_EXPRESSION: EyeExpression = "thinking"
+FALLBACK_TONE_DURATION_MS = 1_000
+
+
+class ToneAutomaton:
+    """Compiled multi-pattern matcher: transitions[state][char] -> state, outputs[state] -> categories."""
+
+    def __init__(self, categories: list[tuple[EyeExpression, list[str]]]) -> None:
+        # Priority order: first category with any match wins
+        self.expressions: tuple[EyeExpression, ...] = tuple(expr for expr, _ in categories)
+        goto: list[dict[str, int]] = [{}]
+        outputs: list[set[int]] = [set()]
+        for category, (_, patterns) in enumerate(categories):
+            for pattern in patterns:
+                state = 0
+                for char in pattern.lower():
+                    nxt = goto[state].get(char)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][char] = nxt
+                        goto.append({})
+                        outputs.append(set())
+                    state = nxt
+                outputs[state].add(category)
+
+        # BFS: failure links, merged outputs, and a full transition table (no fail loop at match time)
+        fail = [0] * len(goto)
+        transitions: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] |= outputs[fail[state]]
+            row = dict(transitions[fail[state]])
+            for char, nxt in goto[state].items():
+                fail[nxt] = transitions[fail[state]].get(char, 0) if state else 0
+                row[char] = nxt
+                queue.append(nxt)
+            transitions[state] = row
+        self.transitions = transitions
+        self.outputs: list[tuple[int, ...]] = [tuple(sorted(out)) for out in outputs]
+
+    @classmethod
+    def from_lexicon(cls, data: dict) -> "ToneAutomaton":
+        return cls([(c["expression"], list(c["patterns"])) for c in data["categories"]])
+
+
+@lru_cache(maxsize=1)
+def default_automaton() -> ToneAutomaton:
+    """Automaton for the packaged lexicon (compiled once per process)."""
+    text = (files("bmo_brain") / "data" / "tone_lexicon.json").read_text(encoding="utf-8")
+    return ToneAutomaton.from_lexicon(json.loads(text))
+
+
+class ToneTracker:
+    """Running tone scores for one reply, fed chunk by chunk."""
+
+    def __init__(self, automaton: ToneAutomaton | None = None) -> None:
+        self._automaton = automaton or default_automaton()
+        self._state = 0
+        self._scores = [0] * len(self._automaton.expressions)
+        self.chars = 0
+
+    def feed(self, text: str) -> None:
+        """Scan only the new text; matches spanning previous chunks are kept."""
+        if not text:
+            return
+        self.chars += len(text)
+        transitions = self._automaton.transitions
+        outputs = self._automaton.outputs
+        scores = self._scores
+        state = self._state
+        for char in text.lower():
+            state = transitions[state].get(char, 0)
+            for category in outputs[state]:
+                scores[category] += 1
+        self._state = state
+
+    def scores(self) -> dict[EyeExpression, int]:
+        """Match count per expression so far."""
+        return dict(zip(self._automaton.expressions, self._scores))
+
+    def expression(self) -> EyeExpression:
+        """Highest-priority expression with at least one match, else neutral."""
+        for expr, score in zip(self._automaton.expressions, self._scores):
+            if score:
+                return expr
+        return "neutral"
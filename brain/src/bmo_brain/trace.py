@@ -0,0 +1,364 @@
+"""
+Turn traces: record real turns, replay them offline and diff the frames they produce.
+
+With BMO_TRACE_RECORD=path.jsonl (or .jsonl.gz) every turn appends one JSON line:
+
+    {"v": 1, "t": <wall clock>, "input": "...", "model_at": <ms>,
+     "tokens": [[<ms since model call>, "text"], ...],
+     "frames": [[<ms since turn start>, {...payload...}], ...], "aborted": false}
+
+Tokens are captured as they arrive from the model, frames as they go through
+face_adapter.broadcast. BMO_LLM_BACKEND=replay (llm.ReplayChatModel) streams the recorded
+tokens for each input back with their original timing, scaled by BMO_REPLAY_SPEED
+(0 = no delays), so chunking, emotion-decision and broadcast changes can be measured on
+production-shaped traffic without the network:
+
+    uv run python -m bmo_brain.trace replay prod.jsonl --speed 1 --output new.jsonl
+    uv run python -m bmo_brain.trace diff prod.jsonl new.jsonl
+
+replay runs every recorded input through runner.run_on_input (keeping the gaps between
+turns), records the new frames and reports the frame diff plus first-chunk latency of
+both runs; it exits 1 when frames differ. Message ids are normalized before comparing.
+Emotion decisions depend on timing, so compare runs at the same speed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import atexit
+import contextlib
+import difflib
+import gzip
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from time import monotonic
+from typing import IO, Iterator
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+# Longest a written turn may sit in the file buffer before it is flushed
+FLUSH_INTERVAL_S = 1.0
+
+
+class TurnTrace:
+    """What one turn received from the model and sent to the faces."""
+
+    __slots__ = ("input", "wall", "started", "model_started", "tokens", "frames", "aborted")
+
+    def __init__(self, user_text: str) -> None:
+        self.input = user_text
+        self.wall = time.time()
+        self.started = monotonic()
+        self.model_started: float | None = None
+        self.tokens: list[list] = []
+        self.frames: list[list] = []
+        self.aborted = False
+
+    def model_call(self) -> None:
+        """Mark the model call start (token times are relative to it)."""
+        self.model_started = monotonic()
+
+    def token(self, text: str) -> None:
+        origin = self.model_started if self.model_started is not None else self.started
+        self.tokens.append([round((monotonic() - origin) * 1000, 2), text])
+
+    def frame(self, payload: dict) -> None:
+        self.frames.append([round((monotonic() - self.started) * 1000, 2), payload])
+
+    def to_dict(self) -> dict:
+        return {
+            "v": TRACE_VERSION,
+            "t": round(self.wall, 3),
+            "input": self.input,
+            "model_at": (
+                round((self.model_started - self.started) * 1000, 2) if self.model_started is not None else None
+            ),
+            "tokens": self.tokens,
+            "frames": self.frames,
+            "aborted": self.aborted,
+        }
+
+
+# The trace of the turn running in this task (None when not recording)
+current_turn: ContextVar[TurnTrace | None] = ContextVar("bmo_trace_turn", default=None)
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TraceWriter:
+    """
+    Appends one JSON line per turn. write() only queues the turn: a writer thread
+    serializes and writes it, and flushes at most every FLUSH_INTERVAL_S (and on close),
+    so the event loop never waits on the file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = _open(path, "a")
+        self._queue: queue.SimpleQueue[TurnTrace | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="bmo-trace", daemon=True)
+        self._thread.start()
+        self._closed = False
+        self.turns = 0
+        atexit.register(self.close)
+
+    def write(self, turn: TurnTrace) -> None:
+        """Queue a finished turn (it must not change afterwards)."""
+        self._queue.put(turn)
+
+    def _run(self) -> None:
+        flush_at: float | None = None
+        while True:
+            try:
+                turn = self._queue.get(timeout=None if flush_at is None else max(0.0, flush_at - monotonic()))
+            except queue.Empty:
+                self._flush()
+                flush_at = None
+                continue
+            if turn is None:
+                self._flush()
+                return
+            self._write(turn)
+            if flush_at is None:
+                flush_at = monotonic() + FLUSH_INTERVAL_S
+            elif monotonic() >= flush_at:
+                self._flush()
+                flush_at = None
+
+    def _write(self, turn: TurnTrace) -> None:
+        try:
+            self._file.write(json.dumps(turn.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n")
+        except (OSError, TypeError, ValueError):
+            logger.exception("Could not write the trace of turn %r", turn.input[:40])
+            return
+        self.turns += 1
+
+    def _flush(self) -> None:
+        try:
+            self._file.flush()
+        except OSError:
+            logger.exception("Could not flush %s", self.path)
+
+    def close(self) -> None:
+        """Write the queued turns, then close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+_writer: TraceWriter | None = None
+_writer_checked = False
+
+
+def get_writer() -> TraceWriter | None:
+    """The BMO_TRACE_RECORD writer, or None when recording is off."""
+    global _writer, _writer_checked
+    if not _writer_checked:
+        from bmo_brain.config import TRACE_RECORD_PATH
+
+        _writer_checked = True
+        if TRACE_RECORD_PATH:
+            _writer = TraceWriter(TRACE_RECORD_PATH)
+            logger.info("Recording turn traces to %s", TRACE_RECORD_PATH)
+    return _writer
+
+
+@contextlib.contextmanager
+def record_turn(user_text: str) -> Iterator[TurnTrace | None]:
+    """Trace the turn run inside the block (no-op unless recording)."""
+    writer = get_writer()
+    if writer is None:
+        yield None
+        return
+    turn = TurnTrace(user_text)
+    token = current_turn.set(turn)
+    try:
+        yield turn
+    except BaseException:
+        turn.aborted = True
+        raise
+    finally:
+        current_turn.reset(token)
+        writer.write(turn)
+
+
+def load(path: str) -> Iterator[dict]:
+    """Recorded turns of a trace file, in order."""
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplayIndex:
+    """Recorded token streams by input text; repeated inputs replay their recordings in order."""
+
+    def __init__(self, path: str) -> None:
+        self._streams: dict[str, list[list[list]]] = {}
+        for turn in load(path):
+            if not turn.get("aborted"):
+                self._streams.setdefault(turn["input"], []).append(turn["tokens"])
+        self._next: dict[str, int] = {}
+
+    def take(self, user_text: str) -> list[list] | None:
+        """Next recorded [[ms, text], ...] for this input (the last one repeats), or None."""
+        streams = self._streams.get(user_text)
+        if not streams:
+            return None
+        i = self._next.get(user_text, 0)
+        self._next[user_text] = i + 1
+        return streams[min(i, len(streams) - 1)]
+
+
+_indexes: dict[str, ReplayIndex] = {}
+
+
+def get_replay_index(path: str) -> ReplayIndex:
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = ReplayIndex(path)
+    return index
+
+
+# --- comparing runs ---
+
+
+def normalized_frames(turn: dict) -> list[str]:
+    """A turn's frames as JSON lines with message ids replaced by their order of appearance."""
+    ids: dict[str, str] = {}
+    lines = []
+    for _, payload in turn["frames"]:
+        payload = dict(payload)
+        if "id" in payload:
+            payload["id"] = ids.setdefault(payload["id"], f"m{len(ids) + 1}")
+        lines.append(json.dumps(payload, ensure_ascii=False, sort_keys=True))
+    return lines
+
+
+def first_chunk_ms(turn: dict) -> float | None:
+    """When the turn's first message_chunk (or message) was broadcast, ms after the turn started."""
+    for at, payload in turn["frames"]:
+        if payload.get("type") in ("message_chunk", "message"):
+            return at
+    return None
+
+
+def _median(values: list[float]) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return round(ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2, 2)
+
+
+def diff(expected: list[dict], actual: list[dict], out: IO[str] = sys.stdout) -> int:
+    """Print per-turn frame diffs and a timing summary. Return the number of differing turns."""
+    differing = 0
+    for n, (a, b) in enumerate(zip(expected, actual), 1):
+        lines = list(
+            difflib.unified_diff(
+                normalized_frames(a), normalized_frames(b), f"expected turn {n}", f"actual turn {n}", lineterm="", n=1
+            )
+        )
+        if lines:
+            differing += 1
+            print(f"--- turn {n}: {a['input'][:60]!r}", file=out)
+            print("\n".join(lines), file=out)
+    if len(expected) != len(actual):
+        print(f"turn count differs: expected {len(expected)}, actual {len(actual)}", file=out)
+        differing += abs(len(expected) - len(actual))
+    a_ms = [ms for t in expected if (ms := first_chunk_ms(t)) is not None]
+    b_ms = [ms for t in actual if (ms := first_chunk_ms(t)) is not None]
+    summary = {
+        "turns": min(len(expected), len(actual)),
+        "differing_turns": differing,
+        "first_chunk_ms_p50": {"expected": _median(a_ms), "actual": _median(b_ms)},
+        "frames": {
+            "expected": sum(len(t["frames"]) for t in expected),
+            "actual": sum(len(t["frames"]) for t in actual),
+        },
+    }
+    print(json.dumps(summary, indent=2), file=out)
+    return differing
+
+
+async def _replay(turns: list[dict], speed: float) -> None:
+    from bmo_brain.llm import warm_up
+    from bmo_brain.runner import run_on_input
+
+    # Build the replay model up front so the first turn is not slower than the recording
+    await warm_up()
+    if not turns:
+        return
+    start, first_t = monotonic(), turns[0]["t"]
+    for turn in turns:
+        if speed > 0:
+            # Keep the recorded gaps between turns (emotion hold depends on them)
+            delay = (turn["t"] - first_t) / speed - (monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await run_on_input(turn["input"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="bmo_brain.trace", description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay", help="run recorded inputs through the runner and diff the frames")
+    replay.add_argument("trace")
+    replay.add_argument("--speed", type=float, default=1.0, help="timing scale (0 = no delays)")
+    replay.add_argument("--output", help="trace file for the replayed turns (default: a temp file)")
+    compare = commands.add_parser("diff", help="diff the frames of two trace files")
+    compare.add_argument("expected")
+    compare.add_argument("actual")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s %(message)s")
+
+    if args.command == "diff":
+        expected = [t for t in load(args.expected) if not t.get("aborted")]
+        actual = [t for t in load(args.actual) if not t.get("aborted")]
+        sys.exit(1 if diff(expected, actual) else 0)
+
+    turns = [t for t in load(args.trace) if not t.get("aborted")]
+    output = args.output or os.path.join(tempfile.mkdtemp(prefix="bmo-trace-"), "replay.jsonl")
+    if os.path.exists(output):
+        os.remove(output)
+    # The runner reads its config at import time
+    os.environ.update(
+        {
+            "BMO_LLM_BACKEND": "replay",
+            "BMO_TRACE_REPLAY": args.trace,
+            "BMO_REPLAY_SPEED": str(args.speed),
+            "BMO_TRACE_RECORD": output,
+            "BMO_REPLY_CACHE": "0",
+            "BMO_METRICS_PORT": "",
+        }
+    )
+    asyncio.run(_replay(turns, args.speed))
+    # Run as __main__, this module is not the bmo_brain.trace the runner recorded with
+    from bmo_brain.trace import get_writer as get_runner_writer
+
+    writer = get_runner_writer()
+    if writer is not None:
+        writer.close()
+    print(f"replayed {len(turns)} turn(s) -> {output}", file=sys.stderr)
+    sys.exit(1 if diff(turns, list(load(output))) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Speech output: synthesize reply chunks while the model is still streaming.
+
+With BMO_TTS set, every message_chunk of a streamed reply is also handed to a SpeechStream
+as soon as it is sent. Chunks are synthesized concurrently in a bounded pool of
+BMO_TTS_WORKERS threads, and their audio is sent in chunk order as audio frames, so the
+audio of sentence 1 goes out while sentence 3 is still being generated. message_end (and
+speaking_end) follow the last audio frame. Aborting the turn cancels synthesis that has
+not started and stops sending.
+
+Audio frames carry 16-bit little-endian mono PCM at BMO_TTS_SAMPLE_RATE, split into parts
+of at most PART_BYTES:
+
+    {"type": "audio", "id": <response id>, "index": <chunk index>, "seq": <part>, "last": bool,
+     "pcm": <base64>}
+
+PCM stays raw bytes up to the wire: compact faces get it in wire.py layout 0x09, and only
+JSON faces get it base64-encoded as above. Only faces that enabled "tts" in their hello
+get audio.
+
+BMO_TTS picks the engine: "fake" (offline: a quiet tone as long as the text would take to
+say, after a simulated synthesis delay) or "module:function", a blocking callable taking
+(text, sample_rate) and returning PCM bytes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import math
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Callable
+
+from bmo_brain.config import TTS_BACKEND, TTS_SAMPLE_RATE, TTS_WORKERS
+from bmo_brain.metrics import TTS_CHUNKS, TTS_FIRST_AUDIO_SECONDS, TTS_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Largest PCM part per audio frame (bytes; 0.5 s at 16 kHz)
+PART_BYTES = 16 * 1024
+# Fake engine: speech length and synthesis time per character of text
+_FAKE_MS_PER_CHAR = 60.0
+_FAKE_SYNTH_MS_PER_CHAR = 4.0
+
+Engine = Callable[[str, int], bytes]
+
+
+def _fake_engine(text: str, sample_rate: int) -> bytes:
+    chars = len(text.strip())
+    time.sleep(chars * _FAKE_SYNTH_MS_PER_CHAR / 1000.0)
+    samples = int(chars * _FAKE_MS_PER_CHAR / 1000.0 * sample_rate)
+    step = 2 * math.pi * 220.0 / sample_rate
+    return struct.pack(f"<{samples}h", *(int(2000 * math.sin(i * step)) for i in range(samples)))
+
+
+def _load_engine(spec: str) -> Engine:
+    if spec == "fake":
+        return _fake_engine
+    module, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"BMO_TTS must be 'fake' or 'module:function', got {spec!r}")
+    return getattr(importlib.import_module(module), attr)
+
+
+_engine: Engine | None = None
+_pool: ThreadPoolExecutor | None = None
+# Chunks waiting for or in synthesis, across all turns
+_pending = 0
+
+
+def speech_enabled() -> bool:
+    """Whether replies are synthesized (BMO_TTS set, or an engine installed with set_engine())."""
+    return bool(TTS_BACKEND) or _engine is not None
+
+
+def get_engine() -> Engine:
+    """The BMO_TTS engine (loaded on first use) or the one set with set_engine()."""
+    global _engine
+    if _engine is None:
+        _engine = _load_engine(TTS_BACKEND)
+    return _engine
+
+
+def set_engine(engine: Engine) -> None:
+    """Synthesize with engine (a blocking callable, run in the TTS pool)."""
+    global _engine
+    _engine = engine
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="bmo-tts")
+    return _pool
+
+
+def _synthesize(engine: Engine, text: str) -> tuple[list[bytes], float]:
+    """Run in the pool: PCM for text, split into parts, and the synthesis time."""
+    start = monotonic()
+    pcm = engine(text, TTS_SAMPLE_RATE)
+    elapsed = monotonic() - start
+    return [pcm[i : i + PART_BYTES] for i in range(0, len(pcm), PART_BYTES)], elapsed
+
+
+class SpeechStream:
+    """Synthesis jobs of one reply, sent in chunk order by a sender task."""
+
+    def __init__(self, response_id: str, turn_started: float) -> None:
+        self.response_id = response_id
+        self.turn_started = turn_started
+        self.first_audio_at: float | None = None
+        self._jobs: asyncio.Queue[tuple[int, asyncio.Future] | None] = asyncio.Queue()
+        self._futures: list[asyncio.Future] = []
+        self._sender = asyncio.create_task(self._send_in_order())
+
+    def say(self, index: int, text: str) -> None:
+        """Start synthesizing chunk index (returns at once)."""
+        global _pending
+        if not text.strip():
+            return
+        future = asyncio.get_running_loop().run_in_executor(_get_pool(), _synthesize, get_engine(), text)
+        _pending += 1
+        future.add_done_callback(_job_done)
+        self._futures.append(future)
+        self._jobs.put_nowait((index, future))
+
+    async def _send_in_order(self) -> None:
+        from bmo_brain.face_adapter import send_audio
+
+        while True:
+            job = await self._jobs.get()
+            if job is None:
+                return
+            index, future = job
+            try:
+                parts, elapsed = await future
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                TTS_CHUNKS.labels("failed").inc()
+                logger.exception("Turn %s: synthesis failed for chunk %d", self.response_id, index)
+                continue
+            TTS_CHUNKS.labels("ok").inc()
+            TTS_SECONDS.observe(elapsed)
+            for seq, pcm in enumerate(parts):
+                if self.first_audio_at is None:
+                    self.first_audio_at = monotonic()
+                    TTS_FIRST_AUDIO_SECONDS.observe(self.first_audio_at - self.turn_started)
+                await send_audio(
+                    {
+                        "type": "audio",
+                        "id": self.response_id,
+                        "index": index,
+                        "seq": seq,
+                        "last": seq == len(parts) - 1,
+                    },
+                    pcm,
+                )
+
+    async def finish(self) -> None:
+        """Wait until every chunk said so far has been sent."""
+        self._jobs.put_nowait(None)
+        await self._sender
+
+    def cancel(self) -> None:
+        """Stop sending and drop synthesis that has not started (turn aborted)."""
+        self._sender.cancel()
+        for future in self._futures:
+            if future.cancel():
+                TTS_CHUNKS.labels("cancelled").inc()
+
+
+def _job_done(future: asyncio.Future) -> None:
+    global _pending
+    _pending -= 1
+    if not future.cancelled():
+        # Retrieved here too, for jobs whose turn was aborted before the sender got to them
+        future.exception()
+
+
+def tts_stats() -> dict:
+    """Synthesis pool gauges (exported as bmo_tts_*)."""
+    return {"workers": TTS_WORKERS, "pending": _pending}
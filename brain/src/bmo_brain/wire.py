@@ -0,0 +1,206 @@
+"""
+Wire encodings for brain -> face frames.
+
+- json (default): UTF-8 JSON text frames, the payload shapes from protocol.py.
+- compact: binary frames with a 1-byte type code and a fixed little-endian header.
+  message_* frames carry an integer stream id instead of the 36-char UUID.
+
+The brain advertises its encodings in contract_info; a face opts in by replying
+{"type": "hello", "encoding": "compact"}. Frames without a compact layout (e.g.
+contract_info) are still sent as JSON text, so faces must accept both.
+
+Compact layouts (after the type code byte; text fields are the UTF-8 remainder):
+
+    0x01 message_start  u32 stream id
+    0x02 message_chunk  u32 stream id, u32 index, text
+    0x03 message_end    u32 stream id
+    0x04 message        text
+    0x05 state          u8 state code (0 idle, 1 listening, 2 thinking, 3 speaking)
+    0x06 speaking_end   -
+    0x07 emotion        i32 duration_ms (-1 = none), value
+    0x08 batch          repeated: u32 length, frame (compact layout, or JSON if it starts with "{")
+    0x09 audio          u32 stream id, u32 chunk index, u16 part, u8 last (0/1), PCM
+
+audio frames (tts.py) are AudioFrames holding the raw PCM: compact faces get it as is in
+layout 0x09, JSON faces get {"type": "audio", "id", "index", "seq", "last", "pcm": <base64>}
+(same response id as their message_start).
+"""
+
+from __future__ import annotations
+
+import base64
+import itertools
+import json
+import struct
+from collections import OrderedDict
+from typing import Literal
+
+from bmo_brain.protocol import batch as build_batch
+
+Encoding = Literal["json", "compact"]
+ENCODINGS: tuple[Encoding, ...] = ("json", "compact")
+
+TYPE_CODES: dict[str, int] = {
+    "message_start": 0x01,
+    "message_chunk": 0x02,
+    "message_end": 0x03,
+    "message": 0x04,
+    "state": 0x05,
+    "speaking_end": 0x06,
+    "emotion": 0x07,
+    "audio": 0x09,
+}
+# Batches are encoded by BatchFrame, which reuses each inner frame's bytes
+BATCH_CODE = 0x08
+STATE_CODES: dict[str, int] = {"idle": 0, "listening": 1, "thinking": 2, "speaking": 3}
+
+_ID = struct.Struct("<BI")
+_CHUNK = struct.Struct("<BII")
+_STATE = struct.Struct("<BB")
+_EMOTION = struct.Struct("<Bi")
+_AUDIO = struct.Struct("<BIIHB")
+_CODE = struct.Struct("<B")
+_LENGTH = struct.Struct("<I")
+
+# Most stream ids alive at once (older ones are forgotten if message_end never encodes)
+_MAX_LIVE_STREAMS = 1024
+
+
+def encode_json(payload: dict) -> bytes:
+    """Encode a payload as compact UTF-8 JSON (sent as a text frame)."""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class StreamIds:
+    """
+    Maps response UUIDs to small integers. Ids are allocated per brain process, so the
+    same encoded bytes are valid on every compact connection.
+    """
+
+    def __init__(self) -> None:
+        self._counter = itertools.count(1)
+        self._ids: OrderedDict[str, int] = OrderedDict()
+
+    def get(self, response_id: str) -> int:
+        sid = self._ids.get(response_id)
+        if sid is None:
+            sid = self._ids[response_id] = next(self._counter) & 0xFFFFFFFF
+            if len(self._ids) > _MAX_LIVE_STREAMS:
+                self._ids.popitem(last=False)
+        return sid
+
+    def release(self, response_id: str) -> None:
+        self._ids.pop(response_id, None)
+
+
+_stream_ids = StreamIds()
+
+
+def encode_compact(payload: dict) -> bytes | None:
+    """Encode a payload in the compact layout, or None if its type has none."""
+    msg_type = payload.get("type")
+    code = TYPE_CODES.get(msg_type)
+    if code is None:
+        return None
+    if msg_type == "message_chunk":
+        sid = _stream_ids.get(payload["id"])
+        return _CHUNK.pack(code, sid, payload["index"]) + payload["text"].encode("utf-8")
+    if msg_type == "message_start":
+        return _ID.pack(code, _stream_ids.get(payload["id"]))
+    if msg_type == "message_end":
+        data = _ID.pack(code, _stream_ids.get(payload["id"]))
+        _stream_ids.release(payload["id"])
+        return data
+    if msg_type == "message":
+        return _CODE.pack(code) + payload["text"].encode("utf-8")
+    if msg_type == "state":
+        return _STATE.pack(code, STATE_CODES[payload["value"]])
+    if msg_type == "speaking_end":
+        return _CODE.pack(code)
+    if msg_type == "audio":
+        # Audio from another worker (bus.py) arrives in its JSON form
+        return _audio_header(payload) + base64.b64decode(payload["pcm"])
+    duration = payload.get("duration_ms")
+    return _EMOTION.pack(code, -1 if duration is None else duration) + payload["value"].encode("utf-8")
+
+
+def _audio_header(payload: dict) -> bytes:
+    return _AUDIO.pack(
+        TYPE_CODES["audio"], _stream_ids.get(payload["id"]), payload["index"], payload["seq"], payload["last"]
+    )
+
+
+def encode(payload: dict, encoding: Encoding) -> tuple[bytes, bool]:
+    """Encode for one wire encoding. Return (data, is_text_frame)."""
+    if encoding == "compact":
+        data = encode_compact(payload)
+        if data is not None:
+            return data, False
+    return encode_json(payload), True
+
+
+class Frame:
+    """A payload plus its encoded bytes, computed at most once per encoding."""
+
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+        self._encoded: dict[str, tuple[bytes, bool]] = {}
+
+    def json_payload(self) -> dict:
+        """The payload as sent to JSON faces (and forwarded to other workers)."""
+        return self.payload
+
+    def _encode(self, encoding: Encoding) -> tuple[bytes, bool]:
+        return encode(self.payload, encoding)
+
+    def encoded(self, encoding: Encoding) -> tuple[bytes, bool]:
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = self._encode(encoding)
+        return data
+
+
+class AudioFrame(Frame):
+    """
+    An audio frame: payload holds the header fields, pcm the raw bytes. PCM is only
+    base64-encoded for JSON faces, never for compact ones.
+    """
+
+    __slots__ = ("pcm",)
+
+    def __init__(self, payload: dict, pcm: bytes) -> None:
+        super().__init__(payload)
+        self.pcm = pcm
+
+    def json_payload(self) -> dict:
+        return {**self.payload, "pcm": base64.b64encode(self.pcm).decode("ascii")}
+
+    def _encode(self, encoding: Encoding) -> tuple[bytes, bool]:
+        if encoding == "compact":
+            return _audio_header(self.payload) + self.pcm, False
+        return encode_json(self.json_payload()), True
+
+
+class BatchFrame(Frame):
+    """
+    Several frames sent as one {"type": "batch", "frames": [...]} frame. Inner frames keep
+    their own cache, so faces without batching get the very same per-frame bytes.
+    """
+
+    __slots__ = ("frames",)
+
+    def __init__(self, frames: list[Frame]) -> None:
+        super().__init__(dict(build_batch([f.json_payload() for f in frames])))
+        self.frames = frames
+
+    def _encode(self, encoding: Encoding) -> tuple[bytes, bool]:
+        if encoding != "compact":
+            return encode_json(self.payload), True
+        parts = [_CODE.pack(BATCH_CODE)]
+        for frame in self.frames:
+            data, _ = frame.encoded("compact")
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts), False
@@ -0,0 +1,26 @@
+import asyncio
+import math
+
+import pytest
+
+from bmo_brain.admission import AdmissionController, Rejected, estimate_turn_tokens
+
+
+def test_turn_larger_than_the_budget_costs_the_whole_budget():
+    controller = AdmissionController(rate_per_face=0, rate_global=0, tokens_per_minute=60, max_wait_ms=0)
+    text = "x" * 1000
+    assert estimate_turn_tokens(text) > 60
+
+    async def run():
+        await controller.admit(text)
+        with pytest.raises(Rejected) as rejected:
+            await controller.admit(text)
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.reason == "token_budget"
+    assert math.isfinite(rejected.retry_after_s) and 0 < rejected.retry_after_s <= 60
+
+
+def test_history_counts_towards_the_estimate():
+    assert estimate_turn_tokens("hola", history_tokens=500) == estimate_turn_tokens("hola") + 500
@@ -0,0 +1,123 @@
+import asyncio
+import struct
+
+import pytest
+
+from bmo_brain import audio, face_adapter
+from bmo_brain.audio import AudioIngest, PcmRing, frame_db
+
+FRAME_MS = 20
+SAMPLES = 16000 * FRAME_MS // 1000
+
+
+def _frame(amplitude: int) -> bytes:
+    return struct.pack(f"<{SAMPLES}h", *([amplitude] * SAMPLES))
+
+
+SILENCE = _frame(0)
+
+
+class _Session:
+    id = "0123456789abcdef"
+    route = None
+
+    def __init__(self) -> None:
+        self.submitted: list[str] = []
+
+    def submit(self, text: str) -> bool:
+        self.submitted.append(text)
+        return True
+
+    def interrupt(self) -> bool:
+        return False
+
+
+def test_ring_wraps_around_and_only_overwrites_released_bytes():
+    ring = PcmRing(10)
+    ring.write(b"abcdefgh")
+    assert ring.free == 2
+    ring.release(6)
+    assert ring.free == 8
+    ring.write(b"ijklm")
+    assert [bytes(v) for v in ring.views(6, 13)] == [b"ghij", b"klm"]
+    assert [bytes(v) for v in ring.views(10, 13)] == [b"klm"]
+    assert ring.views(13, 13) == []
+    ring.release(100)
+    assert ring.kept_from == ring.written == 13
+
+
+def test_frame_level():
+    assert frame_db(memoryview(SILENCE)) == float("-inf")
+    assert frame_db(memoryview(_frame(32767))) == pytest.approx(0.0, abs=0.01)
+    assert frame_db(memoryview(_frame(100))) < -45 < frame_db(memoryview(_frame(1000)))
+
+
+def test_vad_cuts_one_segment_per_utterance_across_ring_wraparound(monkeypatch):
+    states: list[str] = []
+    heard: list[bytes] = []
+
+    async def send_state(value: str) -> None:
+        states.append(value)
+
+    def transcribe(segments: list[memoryview], sample_rate: int) -> str:
+        heard.append(b"".join(segments))
+        return f"utterance {len(heard)}"
+
+    monkeypatch.setattr(face_adapter, "send_state", send_state)
+    monkeypatch.setattr(audio, "_transcriber", transcribe)
+    # Three 3 s utterances, each louder than the last, after 10 s of silence: 25 s of audio,
+    # more than the ring holds, so the last segment wraps around its end
+    utterances = [_frame(1000 * (n + 1)) for n in range(3)]
+    stream = [SILENCE] * 500
+    for loud in utterances:
+        stream += [loud] * 150 + [SILENCE] * 100
+
+    session = _Session()
+
+    async def run() -> AudioIngest:
+        ingest = AudioIngest(session, frame_ms=FRAME_MS)
+        for frame in stream:
+            assert await ingest.feed(frame)
+            await asyncio.sleep(0)
+        for _ in range(200):
+            if len(session.submitted) == 3:
+                break
+            await asyncio.sleep(0.01)
+        ingest.close()
+        return ingest
+
+    ingest = asyncio.run(run())
+
+    assert ingest.ring.written > ingest.ring.capacity
+    assert session.submitted == ["utterance 1", "utterance 2", "utterance 3"]
+    assert states == ["listening"] * 3
+    preroll = SILENCE * (200 // FRAME_MS)
+    assert heard == [preroll + loud * 150 for loud in utterances]
+    assert ingest.frames_dropped == 0
+
+
+def test_failed_step_does_not_stop_the_consumer(monkeypatch):
+    calls: list[str] = []
+
+    async def send_state(value: str) -> None:
+        calls.append(value)
+        if len(calls) == 1:
+            raise ConnectionError("face went away")
+
+    monkeypatch.setattr(face_adapter, "send_state", send_state)
+    monkeypatch.setattr(audio, "_transcriber", lambda segments, sample_rate: "hola")
+    loud = _frame(3000)
+    stream = ([loud] * 50 + [SILENCE] * 100) * 2
+    session = _Session()
+
+    async def run() -> AudioIngest:
+        ingest = AudioIngest(session, frame_ms=FRAME_MS)
+        for frame in stream * 4:
+            assert await ingest.feed(frame)
+            await asyncio.sleep(0)
+        ingest.close()
+        return ingest
+
+    ingest = asyncio.run(run())
+    assert len(session.submitted) == 8
+    assert ingest.frames_dropped == 0
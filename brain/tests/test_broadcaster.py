@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+from bmo_brain import broadcaster, face_adapter
+from bmo_brain.broadcaster import Route, join, register, reply_route
+
+
+class _Socket:
+    """Stand-in WebSocket: records the frames the channel's writer sends."""
+
+    remote_address = ("127.0.0.1", 0)
+
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def send(self, data, text: bool = True) -> None:
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    monkeypatch.setattr(broadcaster, "_channels", {})
+    monkeypatch.setattr(broadcaster, "_by_session", {})
+    monkeypatch.setattr(broadcaster, "_by_room", {})
+
+
+def _faces(*routing: tuple[str, str | None]) -> list[_Socket]:
+    sockets = []
+    for session, room in routing:
+        ws = _Socket()
+        join(register(ws), session, room)
+        sockets.append(ws)
+    return sockets
+
+
+def test_turn_reply_reaches_only_its_session_and_room():
+    async def run():
+        asker, same_session, same_room, elsewhere = _faces(
+            ("kitchen-face", "kitchen"), ("kitchen-face", None), ("fridge-face", "kitchen"), ("hall-face", "hall")
+        )
+        # As a turn does: broadcast() inside the session's route
+        reply_route.set(Route("kitchen-face", "kitchen"))
+        await face_adapter.send_message("hola")
+        reply_route.set(None)
+        await face_adapter.send_state("idle")
+        await asyncio.sleep(0.01)
+        return asker, same_session, same_room, elsewhere
+
+    asker, same_session, same_room, elsewhere = asyncio.run(run())
+    for ws in (asker, same_session, same_room):
+        assert [f["type"] for f in ws.sent] == ["message", "state"]
+    assert [f["type"] for f in elsewhere.sent] == ["state"]
+
+
+def test_session_route_without_a_room_skips_other_faces_in_the_room():
+    async def run():
+        asker, roommate = _faces(("kitchen-face", "kitchen"), ("fridge-face", "kitchen"))
+        assert broadcaster.publish({"type": "message", "text": "hola"}, Route("kitchen-face")) == 1
+        await asyncio.sleep(0.01)
+        return asker, roommate
+
+    asker, roommate = asyncio.run(run())
+    assert [f["text"] for f in asker.sent] == ["hola"]
+    assert roommate.sent == []
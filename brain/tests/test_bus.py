@@ -0,0 +1,105 @@
+import asyncio
+
+from bmo_brain.broadcaster import Route
+from bmo_brain.bus import _HEADER, BusClient, run_hub
+
+
+def test_stalled_hub_drops_instead_of_buffering(tmp_path):
+    path = str(tmp_path / "stalled.sock")
+    connected = asyncio.Event()
+
+    async def never_reads(reader, writer):
+        connected.set()
+        await asyncio.sleep(10)
+
+    async def run() -> BusClient:
+        server = await asyncio.start_unix_server(never_reads, path=path)
+        client = BusClient(lambda payloads, route: None, maxsize=8)
+        await client.connect(path)
+        await connected.wait()
+        frame = {"type": "message_chunk", "id": "r", "index": 0, "text": "x" * 64_000}
+        for _ in range(200):
+            client.forward([frame], Route("s"))
+            await asyncio.sleep(0)
+        stats = client.stats()
+        server.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["queue_depth"] == 8
+    assert stats["messages_dropped"] > 0
+    assert stats["messages_forwarded"] + stats["messages_dropped"] == 200
+
+
+def test_workers_relay_through_the_hub(tmp_path):
+    path = str(tmp_path / "hub.sock")
+    received: list[tuple[list[dict], Route | None]] = []
+
+    async def run() -> None:
+        hub = await run_hub(path)
+        sender = BusClient(lambda payloads, route: None)
+        receiver = BusClient(lambda payloads, route: received.append((payloads, route)))
+        await sender.connect(path)
+        await receiver.connect(path)
+        await asyncio.sleep(0.05)
+        for n in range(3):
+            sender.forward([{"type": "message", "text": f"hola {n}"}], Route("s", "kitchen"))
+        for _ in range(100):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0.01)
+        hub.close()
+
+    asyncio.run(run())
+    assert [(p[0]["text"], r) for p, r in received] == [(f"hola {n}", Route("s", "kitchen")) for n in range(3)]
+
+
+def test_stalled_worker_does_not_hold_up_the_others(tmp_path):
+    path = str(tmp_path / "hub.sock")
+    received: list[dict] = []
+
+    async def run() -> None:
+        hub = await run_hub(path, maxsize=4)
+        sender = BusClient(lambda payloads, route: None)
+        receiver = BusClient(lambda payloads, route: received.extend(payloads))
+        await sender.connect(path)
+        await receiver.connect(path)
+        # A worker that connects and never reads
+        _, stalled = await asyncio.open_unix_connection(path)
+        await asyncio.sleep(0.05)
+        frame = {"type": "message", "text": "x" * 64_000}
+        for _ in range(50):
+            sender.forward([frame])
+            await asyncio.sleep(0)
+        for _ in range(200):
+            if len(received) == 50:
+                break
+            await asyncio.sleep(0.01)
+        stalled.close()
+        hub.close()
+
+    asyncio.run(run())
+    assert len(received) == 50
+
+
+def test_malformed_message_is_skipped(tmp_path):
+    path = str(tmp_path / "hub.sock")
+    received: list[dict] = []
+
+    async def run() -> None:
+        hub = await run_hub(path)
+        receiver = BusClient(lambda payloads, route: received.extend(payloads))
+        await receiver.connect(path)
+        _, raw = await asyncio.open_unix_connection(path)
+        for body in (b"{not json", b'{"to": null}', b'{"to": null, "frames": [{"type": "message"}]}'):
+            raw.write(_HEADER.pack(len(body)) + body)
+        await raw.drain()
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        raw.close()
+        hub.close()
+
+    asyncio.run(run())
+    assert received == [{"type": "message"}]
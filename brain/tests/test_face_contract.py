@@ -0,0 +1,39 @@
+import asyncio
+import json
+import threading
+
+from bmo_brain import face_contract
+
+
+def test_watch_reloads_off_the_loop_and_notifies_on_it(tmp_path, monkeypatch):
+    path = tmp_path / "faceContract.json"
+    path.write_text(json.dumps({"version": "1", "aliases": {"happy": "happy_success"}, "presets": {}}))
+    monkeypatch.setattr(face_contract, "FACE_CONTRACT_PATH", str(path))
+    monkeypatch.setattr(face_contract, "_index", None)
+    monkeypatch.setattr(face_contract, "_listeners", [])
+    reads: list[str] = []
+    notified: list[tuple[str, str]] = []
+    load = face_contract._load_contract
+
+    def tracked_load(p):
+        reads.append(threading.current_thread().name)
+        return load(p)
+
+    monkeypatch.setattr(face_contract, "_load_contract", tracked_load)
+    face_contract.add_reload_listener(lambda index: notified.append((index.version, threading.current_thread().name)))
+    assert face_contract.get_contract().version == "1"
+
+    async def run():
+        watcher = asyncio.create_task(face_contract.watch(0.01))
+        path.write_text(json.dumps({"version": "2", "aliases": {"glad": "happy_success"}, "presets": {}}))
+        for _ in range(100):
+            if notified:
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    asyncio.run(run())
+    loop_thread = threading.current_thread().name
+    assert notified == [("2", loop_thread)]
+    assert reads[-1] != loop_thread
+    assert face_contract.get_contract().normalize("glad") == "happy_success"
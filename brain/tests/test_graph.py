@@ -0,0 +1,45 @@
+import asyncio
+
+from bmo_brain import nodes, runner
+from bmo_brain.graph import get_compiled_graph
+from bmo_brain.scheduler import EmotionState, current_emotion
+
+
+def _emotions(state: dict) -> list[str]:
+    async def run():
+        graph = get_compiled_graph("streaming")
+        return [e["value"] async for e in graph.astream(state, stream_mode="custom") if e["type"] == "emotion"]
+
+    return asyncio.run(run())
+
+
+def test_stream_reply_skips_the_expression_the_face_shows(monkeypatch):
+    monkeypatch.setattr(nodes, "use_llm", lambda: False)
+    assert _emotions({"last_input": "hmm", "last_emotion": None}) == ["thinking_processing"]
+    assert _emotions({"last_input": "hmm", "last_emotion": "thinking_processing"}) == []
+
+
+def test_runner_compares_tones_with_the_preset_the_face_shows(monkeypatch):
+    sent: list[str] = []
+
+    async def send_emotion(value, duration_ms=None):
+        sent.append(value)
+
+    monkeypatch.setattr(runner, "send_emotion", send_emotion)
+
+    async def run():
+        current_emotion.set(EmotionState())
+        # As a graph turn leaves it: the canonical key of the emotion event
+        current_emotion.get().value = "happy_success"
+        await runner._decide_and_maybe_emit_response_emotion(tone="happy", reply_chars=40, deadline_reached=False)
+        await runner._emit_emotion("sad")
+        await runner._decide_and_maybe_emit_response_emotion(tone="sad", reply_chars=40, deadline_reached=False)
+
+    asyncio.run(run())
+    assert sent == ["sad"]
+
+
+def test_unknown_graph_variant_falls_back_to_the_builtin_loop():
+    assert runner._graph_variant("bogus") == ""
+    assert runner._graph_variant("default") == "threaded"
+    assert runner._graph_variant("streaming") == "streaming"
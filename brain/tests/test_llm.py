@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from bmo_brain import llm
+
+
+@pytest.fixture(autouse=True)
+def _no_models(monkeypatch):
+    monkeypatch.setattr(llm, "_models", {})
+
+
+def test_warm_up_does_nothing_in_echo_mode(monkeypatch):
+    monkeypatch.setattr(llm, "use_llm", lambda: False)
+    monkeypatch.setattr(llm, "_build", lambda *_: pytest.fail("no client in echo mode"))
+    asyncio.run(llm.warm_up())
+    assert llm._models == {}
+
+
+def test_warm_up_logs_client_errors(monkeypatch, caplog):
+    def build(backend, model):
+        raise RuntimeError("Missing credentials")
+
+    monkeypatch.setattr(llm, "use_llm", lambda: True)
+    monkeypatch.setattr(llm, "_build", build)
+    asyncio.run(llm.warm_up())
+    assert "Missing credentials" in caplog.text
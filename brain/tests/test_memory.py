@@ -0,0 +1,51 @@
+import asyncio
+import sqlite3
+import time
+
+from bmo_brain.memory import ConversationStore
+
+
+def _store(db_path, **kwargs) -> ConversationStore:
+    return ConversationStore(
+        token_budget=1024, max_turns=24, summary_tokens=256, max_sessions=8, db_path=str(db_path), **kwargs
+    )
+
+
+def _history(store: ConversationStore, key: str, *, persist: bool) -> list[str]:
+    async def run():
+        return [m.content for m in (await store.get(key, persist=persist)).messages()]
+
+    return asyncio.run(run())
+
+
+def _record(store: ConversationStore, key: str, *, persist: bool) -> None:
+    async def run():
+        await (await store.get(key, persist=persist)).record("hola", "hola!")
+
+    asyncio.run(run())
+
+
+def test_keyed_conversation_survives_a_restart(tmp_path):
+    db = tmp_path / "memory.db"
+    _record(_store(db), "kitchen-face", persist=True)
+    _record(_store(db), "5f0c0ffee", persist=False)
+
+    restarted = _store(db)
+    assert _history(restarted, "kitchen-face", persist=True) == ["hola", "hola!"]
+    assert _history(restarted, "5f0c0ffee", persist=True) == []
+    rows = sqlite3.connect(db).execute("SELECT DISTINCT session_id FROM conversation_turns").fetchall()
+    assert rows == [("kitchen-face",)]
+
+
+def test_unused_conversations_are_pruned(tmp_path):
+    db = tmp_path / "memory.db"
+    _record(_store(db), "old", persist=True)
+    _record(_store(db), "recent", persist=True)
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE conversation_turns SET created_at = ? WHERE session_id = 'old'", (time.time() - 3 * 86400,))
+    conn.commit()
+
+    store = _store(db, ttl_days=2)
+    assert store.stats()["pruned"] == 1
+    assert _history(store, "old", persist=True) == []
+    assert _history(store, "recent", persist=True) == ["hola", "hola!"]
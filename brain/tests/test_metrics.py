@@ -0,0 +1,13 @@
+from bmo_brain import memory, metrics, reply_cache
+
+
+def test_scrape_does_not_create_the_stores(monkeypatch):
+    monkeypatch.setattr(memory, "MEMORY_ENABLED", True)
+    monkeypatch.setattr(memory, "_store", None)
+    monkeypatch.setattr(reply_cache, "REPLY_CACHE_ENABLED", True)
+    monkeypatch.setattr(reply_cache, "_cache", None)
+
+    text = metrics.REGISTRY.render()
+    assert "bmo_memory_sessions 0" in text
+    assert "bmo_reply_cache_misses 0" in text
+    assert memory._store is None and reply_cache._cache is None
@@ -0,0 +1,17 @@
+import asyncio
+
+from bmo_brain.reply_cache import ReplyCache
+
+
+def test_unreadable_disk_tier_is_a_miss(tmp_path):
+    db = tmp_path / "cache.db"
+
+    async def run():
+        await ReplyCache(maxsize=8, ttl_s=60, db_path=str(db)).put("hola", "m", ["hola!"])
+        cache = ReplyCache(maxsize=8, ttl_s=60, db_path=str(db))
+        assert await cache.get("hola", "m") == ["hola!"]
+        cache._entries.clear()
+        cache._disk._conn.execute("DROP TABLE reply_cache")
+        return await cache.get("hola", "m"), cache.stats()["misses"]
+
+    assert asyncio.run(run()) == (None, 1)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import struct
+
+import pytest
+
+from bmo_brain import broadcaster, resume
+from bmo_brain.broadcaster import ReplayRing, Route, publish, publish_batch, register
+from bmo_brain.scheduler import open_session
+from bmo_brain.wire import Frame
+
+
+class _Socket:
+    """Stand-in WebSocket: records what the channel's writer sends."""
+
+    remote_address = ("127.0.0.1", 0)
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[bytes, bool]] = []
+
+    async def send(self, data: bytes, text: bool = True) -> None:
+        self.sent.append((data, text))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+def _chunk(n: int) -> dict:
+    return {"type": "message_chunk", "id": "reply-1", "index": n, "text": f"part {n}. "}
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    monkeypatch.setattr(resume, "_live", {})
+    monkeypatch.setattr(resume, "_parked", {})
+    monkeypatch.setattr(broadcaster, "_channels", {})
+    monkeypatch.setattr(broadcaster, "_by_session", {})
+    monkeypatch.setattr(broadcaster, "_by_room", {})
+
+
+def test_ring_reports_evicted_frames():
+    ring = ReplayRing("t", 3)
+    frames = [Frame(_chunk(n)) for n in range(5)]
+    for frame in frames:
+        ring.append(frame)
+
+    missed, complete = ring.since(1)
+    assert [seq for seq, _ in missed] == [3, 4, 5] and not complete
+    missed, complete = ring.since(2)
+    assert [f for _, f in missed] == frames[2:] and complete
+    assert ring.since(5) == ([], True)
+    assert ring.since(6) == ([], False)
+
+
+def _resume_after_drop(*, missed: int, resume_from: int, encoding: str = "json", batch=False):
+    """A face receives 2 frames, drops, misses `missed` more, then resumes from resume_from."""
+
+    async def run():
+        old_ws, new_ws = _Socket(), _Socket()
+        old = register(old_ws)
+        old.batch = batch
+        session = open_session(old.offer)
+        broadcaster.join(old, "kitchen-face")
+        assert resume.attach("tok", 0, old, session) is session
+        route = Route("kitchen-face")
+        for n in range(2):
+            publish(_chunk(n), route)
+        await asyncio.sleep(0)
+        assert resume.park(old_ws, old, session)
+        if batch:
+            publish_batch([_chunk(n) for n in range(2, 2 + missed)], route)
+        else:
+            for n in range(2, 2 + missed):
+                publish(_chunk(n), route)
+
+        new = register(new_ws)
+        new.encoding = encoding
+        fresh = open_session(new.offer)
+        resumed = resume.attach("tok", resume_from, new, fresh)
+        assert resumed is session and new.session == "kitchen-face"
+        await asyncio.sleep(0)
+        resumed.close()
+        return new_ws.sent
+
+    return asyncio.run(run())
+
+
+def test_resume_replays_what_the_face_missed(monkeypatch):
+    monkeypatch.setattr(resume, "RESUME_BUFFER", 256)
+    sent = _resume_after_drop(missed=3, resume_from=2)
+    frames = [json.loads(data) for data, _ in sent]
+    assert frames[0] == {"type": "resume", "token": "tok", "seq": 2, "replayed": 3, "complete": True}
+    assert [f["index"] for f in frames[1:]] == [2, 3, 4]
+
+
+def test_resume_with_evicted_frames_is_incomplete(monkeypatch):
+    monkeypatch.setattr(resume, "RESUME_BUFFER", 4)
+    sent = _resume_after_drop(missed=5, resume_from=2)
+    frames = [json.loads(data) for data, _ in sent]
+    # Frames 3..7 were missed; the ring only kept 4..7
+    assert frames[0] == {"type": "resume", "token": "tok", "seq": 3, "replayed": 4, "complete": False}
+    assert [f["index"] for f in frames[1:]] == [3, 4, 5, 6]
+
+
+def test_resume_replays_in_the_new_encoding(monkeypatch):
+    monkeypatch.setattr(resume, "RESUME_BUFFER", 256)
+    sent = _resume_after_drop(missed=2, resume_from=2, encoding="compact")
+    assert json.loads(sent[0][0])["complete"] is True
+    replayed = [data for data, text in sent[1:]]
+    assert all(not text for _, text in sent[1:])
+    assert [struct.unpack_from("<BII", data)[2] for data in replayed] == [2, 3]
+    assert [data[9:].decode() for data in replayed] == ["part 2. ", "part 3. "]
+
+
+def test_missed_batch_is_not_replayed_to_a_face_without_batching(monkeypatch):
+    monkeypatch.setattr(resume, "RESUME_BUFFER", 256)
+    sent = _resume_after_drop(missed=3, resume_from=2, batch=True)
+    assert [json.loads(data) for data, _ in sent] == [
+        {"type": "resume", "token": "tok", "seq": 3, "replayed": 0, "complete": False}
+    ]
+
+
+def test_resumed_face_keeps_its_routing_unless_the_hello_changes_it():
+    from bmo_brain import server
+
+    async def run():
+        old_ws, new_ws = _Socket(), _Socket()
+        old = register(old_ws)
+        session = open_session(old.offer)
+        hello = {"resume": "tok", "session": "kitchen-face", "room": "kitchen", "subscribe": ["message"]}
+        server._negotiate(hello, old, session)
+        assert resume.park(old_ws, old, session)
+
+        new = register(new_ws)
+        resumed = server._negotiate({"resume": "tok", "resume_from": 0}, new, open_session(new.offer))
+        assert resumed is session
+        assert (new.session, new.room, new.subscriptions) == ("kitchen-face", "kitchen", frozenset({"message"}))
+        server._negotiate({"room": "hall"}, new, resumed)
+        assert (new.session, new.room) == ("kitchen-face", "hall")
+        resumed.close()
+
+    asyncio.run(run())
+
+
+def test_face_that_closed_its_connection_is_not_parked():
+    async def run():
+        ws = _Socket()
+        channel = register(ws)
+        session = open_session(channel.offer)
+        resume.attach("tok", 0, channel, session)
+        assert not resume.park(ws, channel, session, dropped=False)
+        session.close()
+
+    asyncio.run(run())
+    assert resume._parked == {} and resume._live == {}
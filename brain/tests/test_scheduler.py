@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from bmo_brain import scheduler
+from bmo_brain.admission import AdmissionController
+from bmo_brain.scheduler import Session, TurnScheduler
+
+
+class _Turns:
+    """run_on_input stand-in: each turn takes `seconds`; records how it ended."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.started: list[str] = []
+        self.finished: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def __call__(self, user_text, session_id=None, turn=None, *, persist=False) -> None:
+        self.started.append(user_text)
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(user_text)
+            raise
+        self.finished.append(user_text)
+
+
+def _session(turns: _Turns, replies: list[dict] | None = None) -> Session:
+    turn_scheduler = TurnScheduler(max_concurrent=4)
+    turn_scheduler._run_on_input = turns
+    return Session(turn_scheduler, (lambda frame: replies.append(frame.payload)) if replies is not None else None)
+
+
+async def _until(condition, timeout_s: float = 1.0) -> None:
+    for _ in range(int(timeout_s / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def admission(monkeypatch) -> AdmissionController:
+    controller = AdmissionController(rate_per_face=0, rate_global=0, tokens_per_minute=0)
+    monkeypatch.setattr(scheduler, "get_admission", lambda: controller)
+    return controller
+
+
+def test_new_input_supersedes_the_running_turn(monkeypatch):
+    monkeypatch.setattr(scheduler, "SUPERSEDE_TURNS", True)
+    turns = _Turns(seconds=0.2)
+
+    async def run():
+        session = _session(turns)
+        session.submit("cuéntame un cuento")
+        await _until(lambda: turns.started)
+        session.submit("mejor un chiste")
+        await _until(lambda: turns.finished)
+        stats = session.scheduler.stats()
+        session.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert turns.cancelled == ["cuéntame un cuento"]
+    assert turns.finished == ["mejor un chiste"]
+    assert stats["turns_superseded"] == 1
+
+
+def test_rejected_turn_gets_a_busy_frame_with_a_finite_retry(admission, monkeypatch):
+    admission.rate_per_face, admission.burst_per_face, admission.max_wait = 0.5, 1, 0.0
+    turns = _Turns(seconds=0)
+    replies: list[dict] = []
+
+    async def run():
+        session = _session(turns, replies)
+        session.submit("hola")
+        await _until(lambda: turns.finished)
+        session.submit("hola otra vez")
+        await _until(lambda: replies)
+        await asyncio.sleep(0.01)
+        session.close()
+
+    asyncio.run(run())
+    assert turns.started == ["hola"]
+    busy = replies[0]
+    assert busy["type"] == "busy" and busy["reason"] == "face_rate"
+    assert 0 < busy["retry_after_ms"] <= 2000
+    assert replies[1]["type"] == "emotion"
@@ -0,0 +1,110 @@
+import asyncio
+from time import monotonic
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from bmo_brain import llm, streaming
+from bmo_brain.streaming import CircuitBreaker, CircuitOpen, StreamPolicy, resilient_stream
+
+
+class _Model:
+    """astream() stand-in: sleeps, then yields tokens or raises."""
+
+    def __init__(self, tokens=("hi",), delay=0.0, error=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def astream(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        for token in self.tokens:
+            yield AIMessageChunk(content=token)
+
+
+@pytest.fixture
+def models(monkeypatch):
+    registry: dict[str, _Model] = {}
+    monkeypatch.setattr(llm, "get_chat_model", lambda model=None, **_: registry[model])
+    monkeypatch.setattr(streaming, "_breakers", {})
+    return registry
+
+
+def _open(breaker: CircuitBreaker, *, reset_passed: bool) -> None:
+    breaker.state = "open"
+    breaker.opened_at = monotonic() - (breaker.reset_s + 1 if reset_passed else 0)
+
+
+def _collect(policy: StreamPolicy) -> str:
+    async def run():
+        return "".join([chunk.content async for chunk in resilient_stream([], policy)])
+
+    return asyncio.run(run())
+
+
+def test_breaker_opens_and_recovers_after_a_trial_call():
+    breaker = CircuitBreaker(failures=2, reset_s=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    breaker.opened_at -= 0.1
+    assert breaker.available() and breaker.state == "open"
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow(), "only one trial call at a time"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+    breaker.opened_at -= 0.1
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_released_trial_slot_can_be_claimed_again():
+    breaker = CircuitBreaker(failures=1, reset_s=30)
+    _open(breaker, reset_passed=True)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "open" and breaker.allow()
+
+
+def test_half_open_fallback_never_started_keeps_its_trial_slot(models):
+    models["a"] = _Model(tokens=("hel", "lo"))
+    models["b"] = _Model()
+    fallback = streaming.get_breaker("b")
+    _open(fallback, reset_passed=True)
+
+    assert _collect(StreamPolicy(models=("a", "b"))) == "hello"
+    assert models["b"].calls == 0
+    assert fallback.state == "open" and fallback.available()
+
+    # The primary fails later: the fallback still gets its trial call, and recovers
+    models["a"] = _Model(error=RuntimeError("boom"))
+    assert _collect(StreamPolicy(models=("a", "b"), retries=0)) == "hi"
+    assert models["b"].calls == 1
+    assert fallback.state == "closed"
+
+
+def test_losing_hedge_gives_back_its_trial_slot(models):
+    models["a"] = _Model(tokens=("slow",), delay=0.05)
+    models["b"] = _Model(tokens=("never",), delay=1.0)
+    hedge = streaming.get_breaker("b")
+    _open(hedge, reset_passed=True)
+
+    assert _collect(StreamPolicy(models=("a", "b"), hedge_after_s=0.01)) == "slow"
+    assert models["b"].calls == 1
+    assert hedge.state == "open" and hedge.available()
+
+
+def test_all_circuits_open_raises(models):
+    models["a"] = _Model()
+    _open(streaming.get_breaker("a"), reset_passed=False)
+    with pytest.raises(CircuitOpen):
+        _collect(StreamPolicy(models=("a",)))
+    assert models["a"].calls == 0
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from bmo_brain.trace import TraceWriter, TurnTrace, load
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+_RECORD = """
+import asyncio
+from bmo_brain.llm import warm_up
+from bmo_brain.runner import run_on_input
+
+async def main():
+    # Like replay, so neither run pays for building the model inside its first turn
+    await warm_up()
+    for text in ("Hola BMO.", "Cuéntame algo sobre el mar, por favor.", "Hola BMO."):
+        await run_on_input(text)
+
+asyncio.run(main())
+"""
+
+
+def _run(args: list[str], **env: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(SRC), "BMO_REPLY_CACHE": "0", "BMO_METRICS_PORT": "", **env}
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, timeout=60)
+
+
+def test_writer_keeps_every_turn_in_order(tmp_path):
+    path = tmp_path / "turns.jsonl.gz"
+    writer = TraceWriter(str(path))
+    for n in range(50):
+        turn = TurnTrace(f"turn {n}")
+        turn.frame({"type": "message", "text": f"reply {n}"})
+        writer.write(turn)
+    writer.close()
+    assert [t["input"] for t in load(str(path))] == [f"turn {n}" for n in range(50)]
+    assert writer.turns == 50
+
+
+def test_replay_reproduces_the_recorded_frames(tmp_path):
+    recorded = tmp_path / "recorded.jsonl"
+    result = _run(
+        ["-c", _RECORD],
+        BMO_LLM_BACKEND="fake",
+        BMO_FAKE_FIRST_TOKEN_MS="0",
+        BMO_FAKE_TOKEN_DELAY_MS="0",
+        BMO_FAKE_TOKEN_JITTER_MS="0",
+        BMO_TRACE_RECORD=str(recorded),
+    )
+    assert result.returncode == 0, result.stderr
+    turns = list(load(str(recorded)))
+    assert [t["input"] for t in turns] == ["Hola BMO.", "Cuéntame algo sobre el mar, por favor.", "Hola BMO."]
+    assert all(t["tokens"] and t["frames"] for t in turns)
+
+    replayed = tmp_path / "replayed.jsonl"
+    result = _run(["-m", "bmo_brain.trace", "replay", str(recorded), "--speed", "0", "--output", str(replayed)])
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert '"differing_turns": 0' in result.stdout
+    assert [t["input"] for t in load(str(replayed))] == [t["input"] for t in turns]
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bmo_brain import face_adapter, tts
+from bmo_brain.tts import PART_BYTES, SpeechStream
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    frames: list[tuple[dict, bytes]] = []
+
+    async def send_audio(payload: dict, pcm: bytes) -> None:
+        frames.append((payload, pcm))
+
+    monkeypatch.setattr(face_adapter, "send_audio", send_audio)
+    monkeypatch.setattr(tts, "_pool", ThreadPoolExecutor(max_workers=4))
+    return frames
+
+
+def _engine(delays: dict[str, float], done: list[str]):
+    def engine(text: str, sample_rate: int) -> bytes:
+        time.sleep(delays[text])
+        done.append(text)
+        return text.encode() * (PART_BYTES // len(text) + 1)
+
+    return engine
+
+
+def test_audio_goes_out_in_chunk_order_when_synthesis_finishes_out_of_order(monkeypatch, sent):
+    done: list[str] = []
+    monkeypatch.setattr(tts, "_engine", _engine({"uno": 0.15, "dos": 0.0, "tres": 0.05}, done))
+
+    async def run():
+        speech = SpeechStream("r1", time.monotonic())
+        for index, text in enumerate(["uno", "dos", "tres"]):
+            speech.say(index, text)
+        await speech.finish()
+        return speech
+
+    speech = asyncio.run(run())
+
+    assert done == ["dos", "tres", "uno"]
+    assert [(p["index"], p["seq"], p["last"]) for p, _ in sent] == [
+        (0, 0, False), (0, 1, True), (1, 0, False), (1, 1, True), (2, 0, False), (2, 1, True),
+    ]
+    assert all(p["id"] == "r1" and "pcm" not in p for p, _ in sent)
+    assert b"".join(pcm for p, pcm in sent if p["index"] == 0).startswith(b"unouno")
+    assert speech.first_audio_at is not None
+
+
+def test_cancel_drops_pending_synthesis(monkeypatch, sent):
+    done: list[str] = []
+    monkeypatch.setattr(tts, "_pool", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(tts, "_engine", _engine({"uno": 0.1, "dos": 0.0}, done))
+
+    async def run():
+        speech = SpeechStream("r2", time.monotonic())
+        speech.say(0, "uno")
+        speech.say(1, "dos")
+        await asyncio.sleep(0.02)
+        speech.cancel()
+        await asyncio.sleep(0.15)
+
+    asyncio.run(run())
+    assert done == ["uno"]
+    assert sent == []
@@ -0,0 +1,31 @@
+import base64
+import json
+import struct
+
+from bmo_brain.wire import AudioFrame, Frame, encode
+
+
+def test_audio_frame_is_binary_for_compact_faces_and_json_for_json_faces():
+    header = {"type": "audio", "id": "7a6c3f0e-reply", "index": 2, "seq": 1, "last": True}
+    frame = AudioFrame(header, b"\x01\x02" * 8)
+
+    start, _ = Frame({"type": "message_start", "id": "7a6c3f0e-reply"}).encoded("compact")
+    data, is_text = frame.encoded("compact")
+    assert not is_text
+    code, sid, index, seq, last = struct.unpack_from("<BIIHB", data)
+    assert (code, index, seq, last) == (0x09, 2, 1, 1)
+    assert sid == struct.unpack_from("<BI", start)[1]
+    assert data[struct.calcsize("<BIIHB") :] == b"\x01\x02" * 8
+
+    text, is_text = frame.encoded("json")
+    assert is_text
+    payload = json.loads(text)
+    assert payload["id"] == "7a6c3f0e-reply"
+    assert base64.b64decode(payload["pcm"]) == b"\x01\x02" * 8
+
+
+def test_audio_from_another_worker_encodes_like_a_local_frame():
+    header = {"type": "audio", "id": "r", "index": 0, "seq": 0, "last": False}
+    local = AudioFrame(header, b"pcm!")
+    assert encode(local.json_payload(), "compact") == local.encoded("compact")
+    assert encode(local.json_payload(), "json") == local.encoded("json")
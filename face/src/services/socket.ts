@@ -9,8 +9,17 @@
  * - message: { type: 'message', text: string } (legacy, full text)
  * - state: { type: 'state', value: 'idle' | 'listening' | 'thinking' | 'speaking' }
  * - speaking_end: { type: 'speaking_end' }
- * - contract_info: { type: 'contract_info', version: string }
+ * - contract_info: { type: 'contract_info', version: string, encodings?: string[] }
  * - emotion: { type: 'emotion', value: string, duration_ms?: number }
+ *
+ * Wire encoding: JSON text frames by default. If REACT_APP_BRAIN_WIRE=compact and the
+ * brain lists it in contract_info.encodings, the face replies { type: 'hello', encoding }
+ * and the brain switches hot-path frames to binary (decoded back into BrainMessage here;
+ * layouts documented in brain/src/bmo_brain/wire.py).
+ *
+ * Batching: when contract_info.features includes 'batch', the hello also sets batch: true
+ * and the brain may coalesce frames into { type: 'batch', frames: BrainMessage[] }. Batches
+ * are unpacked here, so listeners still receive one message at a time, in order.
  */
 
 export type BrainMessage =
@@ -20,7 +29,7 @@ export type BrainMessage =
   | { type: 'message'; text: string }
   | { type: 'state'; value: 'idle' | 'listening' | 'thinking' | 'speaking' }
   | { type: 'speaking_end' }
-  | { type: 'contract_info'; version: string }
+  | { type: 'contract_info'; version: string; encodings?: string[]; features?: string[] }
   | { type: 'emotion'; value: string; duration_ms?: number }
   | Record<string, unknown>;
 
@@ -44,6 +53,92 @@ const listeners: {
 
 const LOG_PREFIX = '[BMO face]';
 
+const WIRE_ENCODING =
+  (typeof process !== 'undefined' && process.env?.REACT_APP_BRAIN_WIRE) || 'json';
+
+const STATE_VALUES = ['idle', 'listening', 'thinking', 'speaking'] as const;
+const textDecoder = new TextDecoder();
+
+/** Decode a compact binary frame (see brain wire.py) into BrainMessages (several for a batch). */
+function decodeCompact(buf: ArrayBuffer): BrainMessage[] {
+  const view = new DataView(buf);
+  if (view.byteLength < 1) return [];
+  if (view.getUint8(0) === 0x08) {
+    const frames: BrainMessage[] = [];
+    let offset = 1;
+    while (offset + 4 <= view.byteLength) {
+      const length = view.getUint32(offset, true);
+      const inner = buf.slice(offset + 4, offset + 4 + length);
+      offset += 4 + length;
+      if (new Uint8Array(inner)[0] === 0x7b) {
+        frames.push(JSON.parse(textDecoder.decode(inner)) as BrainMessage);
+      } else {
+        frames.push(...decodeCompact(inner));
+      }
+    }
+    return frames;
+  }
+  const single = decodeCompactFrame(buf, view);
+  return single ? [single] : [];
+}
+
+function decodeCompactFrame(buf: ArrayBuffer, view: DataView): BrainMessage | null {
+  const text = (offset: number) => textDecoder.decode(new Uint8Array(buf, offset));
+  switch (view.getUint8(0)) {
+    case 0x01:
+      return { type: 'message_start', id: String(view.getUint32(1, true)) };
+    case 0x02:
+      return {
+        type: 'message_chunk',
+        id: String(view.getUint32(1, true)),
+        index: view.getUint32(5, true),
+        text: text(9),
+      };
+    case 0x03:
+      return { type: 'message_end', id: String(view.getUint32(1, true)) };
+    case 0x04:
+      return { type: 'message', text: text(1) };
+    case 0x05:
+      return { type: 'state', value: STATE_VALUES[view.getUint8(1)] ?? 'idle' };
+    case 0x06:
+      return { type: 'speaking_end' };
+    case 0x07: {
+      const duration = view.getInt32(1, true);
+      return duration < 0
+        ? { type: 'emotion', value: text(5) }
+        : { type: 'emotion', value: text(5), duration_ms: duration };
+    }
+    default:
+      return null;
+  }
+}
+
+/** Reply to contract_info with our wire encoding and the optional features we support. */
+function negotiate(data: BrainMessage): void {
+  if (data.type !== 'contract_info') return;
+  const { encodings, features } = data as { encodings?: unknown; features?: unknown };
+  const hello: Record<string, unknown> = { type: 'hello' };
+  if (WIRE_ENCODING !== 'json' && Array.isArray(encodings) && encodings.includes(WIRE_ENCODING)) {
+    hello.encoding = WIRE_ENCODING;
+  }
+  if (Array.isArray(features) && features.includes('batch')) {
+    hello.batch = true;
+  }
+  if (Object.keys(hello).length > 1) {
+    send(hello);
+  }
+}
+
+/** Deliver a message to the listener, unpacking batches in order. */
+function dispatch(data: BrainMessage): void {
+  const frames = data.type === 'batch' ? (data as { frames?: unknown }).frames : undefined;
+  if (Array.isArray(frames)) {
+    frames.forEach((frame) => dispatch(frame as BrainMessage));
+    return;
+  }
+  listeners.onMessage?.(data);
+}
+
 function getUrl(): string {
   return DEFAULT_WS_URL;
 }
@@ -57,6 +152,7 @@ function connect(): void {
   console.log(LOG_PREFIX, 'connect: connecting to', url);
   try {
     ws = new WebSocket(url);
+    ws.binaryType = 'arraybuffer';
     ws.onopen = () => {
       console.log(LOG_PREFIX, 'connected to brain');
       listeners.onConnect?.();
@@ -66,10 +162,19 @@ function connect(): void {
       listeners.onDisconnect?.();
     };
     ws.onmessage = (event: MessageEvent) => {
+      if (event.data instanceof ArrayBuffer) {
+        const decoded = decodeCompact(event.data);
+        if (decoded.length === 0) {
+          console.log(LOG_PREFIX, 'message received (unknown binary):', event.data.byteLength, 'bytes');
+        }
+        decoded.forEach(dispatch);
+        return;
+      }
       try {
         const data = JSON.parse(event.data as string) as BrainMessage;
         console.log(LOG_PREFIX, 'message received:', data);
-        listeners.onMessage?.(data);
+        negotiate(data);
+        dispatch(data);
       } catch {
         console.log(LOG_PREFIX, 'message received (raw):', event.data);
         listeners.onMessage?.(event.data as string);